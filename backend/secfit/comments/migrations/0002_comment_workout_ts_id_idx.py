@@ -0,0 +1,17 @@
+# Generated by Django 3.1 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['workout', '-timestamp', '-id'], name='comment_workout_ts_id_idx'),
+        ),
+    ]
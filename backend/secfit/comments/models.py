@@ -9,6 +9,33 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from workouts.models import Workout
 
+class CommentQuerySet(models.QuerySet):
+    """QuerySet for comments with the visibility rules of the comment endpoints."""
+
+    def visible_to(self, user):
+        """Returns the comments the given user is allowed to see.
+
+        A comment is visible to a user if any of the following hold:
+        - The comment is on a public visibility workout
+        - The comment was written by the user
+        - The comment is on a coach visibility workout and the user is the workout
+          owner's coach
+        - The comment is on a workout owned by the user
+
+        Args:
+            user (User): The requesting user
+
+        Returns:
+            QuerySet: Comments visible to the user
+        """
+        return self.filter(
+            models.Q(workout__visibility=Workout.PUBLIC)
+            | models.Q(owner=user)
+            | models.Q(workout__visibility=Workout.COACH, workout__owner__coach=user)
+            | models.Q(workout__owner=user)
+        ).distinct()
+
+
 # Create your models here.
 class Comment(models.Model):
     """Django model for a comment left on a workout.
@@ -28,8 +55,16 @@ class Comment(models.Model):
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(
+                fields=["workout", "-timestamp", "-id"],
+                name="comment_workout_ts_id_idx",
+            ),
+        ]
 
 
 class Like(models.Model):
@@ -0,0 +1,86 @@
+"""Contains custom paginators for the comments application
+"""
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class CommentCursorPagination(CursorPagination):
+    """Keyset pagination for the comments on a single workout, newest first.
+
+    The cursor holds the (timestamp, id) of the last comment on the page, and the next
+    page is read with a range condition on both columns instead of an OFFSET. Fetching a
+    deep page therefore costs the same as fetching the first one, and comments sharing
+    a timestamp are neither skipped nor repeated while new comments are posted.
+    """
+
+    page_size = 10
+    ordering = ("-timestamp", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        if reverse:
+            queryset = queryset.order_by("timestamp", "id")
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.cursor is not None:
+            timestamp, pk = self.decode_position(self.cursor.position)
+            if reverse:
+                keyset = Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk)
+            else:
+                keyset = Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk)
+            queryset = queryset.filter(keyset)
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            position = self.encode_position(self.page[-1])
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self.encode_position(self.page[0])
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def encode_position(self, comment):
+        """Returns the cursor position of a comment."""
+        return f"{comment.timestamp.isoformat()}|{comment.pk}"
+
+    def decode_position(self, position):
+        """Returns the (timestamp, id) of a cursor position, raising NotFound if it is
+        malformed.
+        """
+        timestamp, _, pk = (position or "").rpartition("|")
+        try:
+            timestamp = parse_datetime(timestamp)
+            pk = int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if timestamp is None:
+            raise NotFound(self.invalid_cursor_message)
+        return timestamp, pk
@@ -1,5 +1,6 @@
 from rest_framework import permissions
 from workouts.models import Workout
+from django.shortcuts import get_object_or_404
 
 
 class IsCommentVisibleToUser(permissions.BasePermission):
@@ -17,10 +18,25 @@ class IsCommentVisibleToUser(permissions.BasePermission):
         return (
             obj.workout.visibility == "PU"
             or obj.owner == request.user
-            or (obj.workout.visibility == "CO" and obj.owner.coach == request.user)
+            or (obj.workout.visibility == "CO" and obj.owner.is_coached_by(request.user))
             or obj.workout.owner == request.user
         )
 
+class IsWorkoutInUrlVisibleToUser(permissions.BasePermission):
+    """
+    Custom permission to only allow the comments of the workout given in the url
+    to be listed if the workout is public, owned by the user, or has coach
+    visibility and the user is the workout owner's coach.
+    """
+
+    def has_permission(self, request, view):
+        workout = get_object_or_404(Workout, pk=view.kwargs.get("pk"))
+        return (
+            workout.visibility == "PU"
+            or (workout.visibility == "CO" and workout.owner.is_coached_by(request.user))
+            or workout.owner == request.user
+        )
+
 class CanUserCommentOnWorkout(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method == "POST":
@@ -30,7 +46,7 @@ class CanUserCommentOnWorkout(permissions.BasePermission):
                 if workout:
                     return (
                         workout.visibility == "PU"
-                        or (workout.visibility == "CO" and workout.owner.coach == request.user)
+                        or (workout.visibility == "CO" and workout.owner.is_coached_by(request.user))
                         or workout.owner == request.user
                     )
             return False
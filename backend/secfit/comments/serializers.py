@@ -2,14 +2,20 @@ from rest_framework import serializers
 from rest_framework.serializers import HyperlinkedRelatedField
 from comments.models import Comment, Like
 from workouts.models import Workout
+from secfit.serializers import TimedSerializerMixin
+from workouts.serializers import ExpandableFieldsMixin
 from django.utils.html import escape
 
 
-class CommentSerializer(serializers.HyperlinkedModelSerializer):
+class CommentSerializer(TimedSerializerMixin, ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     owner = serializers.ReadOnlyField(source="owner.username")
     workout = HyperlinkedRelatedField(
         queryset=Workout.objects.all(), view_name="workout-detail"
     )
+    expandable_fields = {
+        "owner": "users.serializers.UserSummarySerializer",
+        "workout": "workouts.serializers.WorkoutSummarySerializer",
+    }
     
     def validate_content(self,value):
         return escape(value)
@@ -19,11 +25,15 @@ class CommentSerializer(serializers.HyperlinkedModelSerializer):
         fields = ["url", "id", "owner", "workout", "content", "timestamp"]
 
 
-class LikeSerializer(serializers.HyperlinkedModelSerializer):
+class LikeSerializer(TimedSerializerMixin, ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     owner = serializers.ReadOnlyField(source="owner.username")
     comment = HyperlinkedRelatedField(
         queryset=Comment.objects.all(), view_name="comment-detail"
     )
+    expandable_fields = {
+        "owner": "users.serializers.UserSummarySerializer",
+        "comment": "comments.serializers.CommentSerializer",
+    }
 
     class Meta:
         model = Like
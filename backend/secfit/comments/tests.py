@@ -1,3 +1,128 @@
+"""
+Tests for the comments application.
+"""
+from datetime import timedelta
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from comments.models import Comment, Like
+from workouts.models import Workout
 
-# Create your tests here.
+
+class WorkoutCommentListTestCase(TestCase):
+    """The comments of a workout are paged newest first on (timestamp, id), including
+    comments that share a timestamp.
+    """
+
+    def setUp(self):
+        self.owner = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        self.workout = Workout.objects.create(
+            name="Intervals",
+            date=timezone.now(),
+            notes="",
+            owner=self.owner,
+            visibility=Workout.PUBLIC,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+        self.url = f"/api/workouts/{self.workout.id}/comments/"
+
+        # Three comments per timestamp, so pages split runs of equal timestamps
+        now = timezone.now()
+        for i in range(25):
+            comment = self.create_comment(f"Comment {i}")
+            Comment.objects.filter(pk=comment.pk).update(
+                timestamp=now - timedelta(minutes=i // 3)
+            )
+
+    def create_comment(self, content):
+        return Comment.objects.create(
+            owner=self.owner, workout=self.workout, content=content
+        )
+
+    def expected_ids(self):
+        return list(
+            Comment.objects.order_by("-timestamp", "-id").values_list("id", flat=True)
+        )
+
+    def test_pages_follow_timestamp_and_id(self):
+        ids = []
+        url = self.url
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["results"]), 10)
+            ids += [comment["id"] for comment in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(ids, self.expected_ids())
+
+    def test_next_cursor_is_stable(self):
+        first = self.client.get(self.url).data
+        expected = self.expected_ids()[10:20]
+
+        # Comments posted after the first page was read do not shift the next one
+        for i in range(5):
+            self.create_comment(f"New comment {i}")
+        second = self.client.get(first["next"]).data
+        self.assertEqual([comment["id"] for comment in second["results"]], expected)
+
+        previous = self.client.get(second["previous"]).data
+        self.assertEqual(previous["results"], first["results"])
+        self.assertIsNotNone(previous["previous"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "bm90IGEgY3Vyc29y"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_private_workout_is_hidden(self):
+        self.workout.visibility = Workout.PRIVATE
+        self.workout.save()
+        other = get_user_model().objects.create(username="other", email="o@secfit.no")
+        self.client.force_authenticate(user=other)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+
+class LikeVisibilityTestCase(TestCase):
+    """Likes, and the comments they can be expanded to, are only served while the comment
+    is visible to the requesting user.
+    """
+
+    def setUp(self):
+        self.athlete = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        self.other = get_user_model().objects.create(
+            username="other", email="other@secfit.no"
+        )
+        workout = Workout.objects.create(
+            name="Intervals",
+            date=timezone.now(),
+            notes="",
+            owner=self.athlete,
+            visibility=Workout.PUBLIC,
+        )
+        self.comment = Comment.objects.create(
+            owner=self.athlete, workout=workout, content="Felt heavy today"
+        )
+        self.like = Like.objects.create(owner=self.other, comment=self.comment)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.other)
+
+    def test_visible_comment_is_expanded(self):
+        response = self.client.get(f"/api/likes/{self.like.id}/", {"expand": "comment"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["comment"]["content"], "Felt heavy today")
+
+    def test_hidden_comment_is_not_expanded(self):
+        Workout.objects.update(visibility=Workout.PRIVATE)
+
+        response = self.client.get(f"/api/likes/{self.like.id}/", {"expand": "comment"})
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get("/api/likes/", {"expand": "comment"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"], [])
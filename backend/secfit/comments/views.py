@@ -2,10 +2,14 @@ from django.shortcuts import render
 from rest_framework import generics, mixins
 from comments.models import Comment, Like
 from rest_framework import permissions
-from comments.permissions import IsCommentVisibleToUser, CanUserCommentOnWorkout
+from comments.permissions import (
+    IsCommentVisibleToUser,
+    CanUserCommentOnWorkout,
+    IsWorkoutInUrlVisibleToUser,
+)
+from comments.pagination import CommentCursorPagination
 from workouts.permissions import IsOwner, IsReadOnly
 from comments.serializers import CommentSerializer, LikeSerializer
-from django.db.models import Q
 from rest_framework.filters import OrderingFilter
 
 # Create your views here.
@@ -32,27 +36,28 @@ class CommentList(
         qs = Comment.objects.none()
 
         if workout_pk:
-            qs = Comment.objects.filter(workout=workout_pk)
+            qs = Comment.objects.filter(workout=workout_pk).select_related("owner")
         elif self.request.user:
-            """A comment should be visible to the requesting user if any of the following hold:
-            - The comment is on a public visibility workout
-            - The comment was written by the user
-            - The comment is on a coach visibility workout and the user is the workout owner's coach
-            - The comment is on a workout owned by the user
-            """
-            qs = Comment.objects.filter(
-                Q(workout__visibility="PU")
-                | Q(owner=self.request.user)
-                | (
-                    Q(workout__visibility="CO")
-                    & Q(workout__owner__coach=self.request.user)
-                )
-                | Q(workout__owner=self.request.user)
-            ).distinct()
+            qs = Comment.objects.visible_to(self.request.user)
 
         return qs
 
 
+class WorkoutCommentList(CommentList):
+    """Lists the comments on a single workout, newest first.
+
+    The workout is taken from the url, so only its comments are read from the
+    database, and pages are served with keyset pagination on (timestamp, id).
+
+    HTTP methods: GET
+    """
+
+    permission_classes = [permissions.IsAuthenticated & IsWorkoutInUrlVisibleToUser]
+    pagination_class = CommentCursorPagination
+    filter_backends = []
+    http_method_names = ["get", "head", "options"]
+
+
 class CommentDetail(
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
@@ -89,7 +94,12 @@ class LikeList(mixins.ListModelMixin, mixins.CreateModelMixin, generics.GenericA
         serializer.save(owner=self.request.user)
 
     def get_queryset(self):
-        return Like.objects.filter(owner=self.request.user)
+        # Likes on comments the user can no longer see are left out, so expanding the
+        # comment never gives one away
+        return Like.objects.filter(
+            owner=self.request.user,
+            comment__in=Comment.objects.visible_to(self.request.user),
+        )
 
 
 class LikeDetail(
@@ -98,10 +108,16 @@ class LikeDetail(
     mixins.DestroyModelMixin,
     generics.GenericAPIView,
 ):
-    queryset = Like.objects.all()
     serializer_class = LikeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        # Likes are only found through comments the user can see, so expanding the
+        # comment never gives one away
+        return Like.objects.filter(
+            comment__in=Comment.objects.visible_to(self.request.user)
+        )
+
     def get(self, request, *args, **kwargs):
         return self.retrieve(request, *args, **kwargs)
 
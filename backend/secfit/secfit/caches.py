@@ -0,0 +1,72 @@
+"""Helpers for the caches configured in settings.CACHES
+"""
+import time
+from django.conf import settings
+from django.core.cache import caches
+
+# Backends whose entries are only visible to the process that wrote them
+PROCESS_LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def is_shared_cache(alias="default"):
+    """Returns whether a cache is shared by every process of the deployment.
+
+    Data that must be invalidated everywhere at once, such as cached users and the token
+    blacklist version, is only cached in shared caches. With a process-local cache, an
+    invalidation would only reach the process that made the change.
+
+    Args:
+        alias: Alias of the cache in settings.CACHES
+    """
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
+
+
+def _initial_version():
+    # Start from the clock rather than 1, so a version that was evicted from the cache
+    # does not restart at a value whose stale entries may still be cached.
+    return int(time.time() * 1000)
+
+
+def get_versions(alias, keys):
+    """Returns the version counters stored under the given keys of a cache, creating the
+    missing ones.
+
+    Entries that must be invalidated in every process at once are keyed by a version
+    counter, and invalidated by bumping it with bump_version() rather than by deleting
+    them. A process that read stale data before the bump then cannot store it under the
+    current version.
+
+    Args:
+        alias: Alias of the cache in settings.CACHES
+        keys: Cache keys of the counters
+    Returns:
+        list: The versions, in the order of keys
+    """
+    cache = caches[alias]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_version(alias, key):
+    """Returns the version counter stored under a key of a cache, creating it if
+    missing. See get_versions().
+    """
+    return get_versions(alias, [key])[0]
+
+
+def bump_version(alias, key):
+    """Moves the version counter stored under a key of a cache to a new value, which
+    invalidates every entry keyed by the old one.
+    """
+    cache = caches[alias]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), None)
@@ -0,0 +1,56 @@
+"""Prometheus metrics recorded for every request by secfit.middleware.MetricsMiddleware,
+the serializers in secfit.serializers and the renderers in secfit.renderers, and by the
+caches of the workouts application
+"""
+from prometheus_client import Counter, Histogram
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+REQUESTS = Counter(
+    "secfit_requests_total",
+    "Requests handled, by view, method and response status",
+    ["view", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "secfit_request_latency_seconds",
+    "Time spent handling a request, including middleware and rendering",
+    ["view", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+SQL_QUERIES = Histogram(
+    "secfit_request_sql_queries",
+    "Number of SQL queries executed per request",
+    ["view", "method"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+SQL_TIME = Histogram(
+    "secfit_request_sql_seconds",
+    "Time spent executing SQL queries per request",
+    ["view", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+SERIALIZER_TIME = Histogram(
+    "secfit_request_serializer_seconds",
+    "Time spent building serializer output per request, including the queries it triggers",
+    ["view", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+RENDER_TIME = Histogram(
+    "secfit_request_render_seconds",
+    "Time spent rendering the response data to JSON or MessagePack per request",
+    ["view", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "secfit_response_size_bytes",
+    "Size of the response body, when it is known up front",
+    ["view", "method"],
+    buckets=SIZE_BUCKETS,
+)
+FEED_CACHE = Counter(
+    "secfit_feed_cache_total",
+    "Lookups of cached first pages of the workout feed, by result (hit or miss)",
+    ["result"],
+)
@@ -0,0 +1,181 @@
+"""Contains custom middleware for the secfit project
+"""
+import gzip
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+import brotli
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from secfit import metrics
+
+# Stats of the request being handled in the current context, or None outside a request
+current_request_stats = ContextVar("current_request_stats", default=None)
+
+
+class RequestStats:
+    """Accumulates the cost of a single request while it is being handled."""
+
+    def __init__(self):
+        self.view = "unresolved"
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper that counts and times every query."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """Records latency, SQL query count and time, serializer time, render time and
+    response size per resolved view, and exposes them through the Prometheus metrics in
+    secfit.metrics.
+
+    Views are labelled with the name of their url pattern, e.g. workout-list, which also
+    tells function-based views apart. Serializer time is added by serializers using
+    secfit.serializers.TimedSerializerMixin, and render time by the renderers in
+    secfit.renderers.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            current_request_stats.reset(token)
+
+        labels = {"view": stats.view, "method": request.method}
+        metrics.REQUESTS.labels(status=response.status_code, **labels).inc()
+        metrics.REQUEST_LATENCY.labels(**labels).observe(time.perf_counter() - start)
+        metrics.SQL_QUERIES.labels(**labels).observe(stats.queries)
+        metrics.SQL_TIME.labels(**labels).observe(stats.sql_time)
+        metrics.SERIALIZER_TIME.labels(**labels).observe(stats.serializer_time)
+        metrics.RENDER_TIME.labels(**labels).observe(stats.render_time)
+        size = self.response_size(response)
+        if size is not None:
+            metrics.RESPONSE_SIZE.labels(**labels).observe(size)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.view = request.resolver_match.view_name
+
+    @staticmethod
+    def response_size(response):
+        if response.streaming:
+            length = response.get("Content-Length")
+            return int(length) if length else None
+        return len(response.content)
+
+
+# Content types worth compressing. Images, PDFs and other media are already compressed.
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/msgpack",
+    "application/x-ndjson",
+    "application/javascript",
+    "text/",
+)
+
+# Paths whose responses carry secrets, such as tokens, next to data the client controls.
+# Compressing them would let an attacker who can inject requests and observe response
+# sizes recover the secrets (BREACH).
+UNCOMPRESSED_PATHS = (
+    "/api/token",
+    "/api/remember_me/",
+    "/api/users/password-reset/",
+    "/api/users/set-new-password/",
+    "/api/users/two_factor/",
+)
+
+# Compression levels trading ratio for the CPU time spent on every response
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def accepted_encodings(header):
+    """Returns the content codings an Accept-Encoding header allows, leaving out those
+    refused with q=0.
+    """
+    encodings = set()
+    for coding in header.split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            encodings.add(name.lower())
+    return encodings
+
+
+class CompressionMiddleware:
+    """Compresses responses with brotli or gzip, whichever the client accepts, preferring
+    brotli. Only complete responses of a compressible content type and at least
+    COMPRESSION_MIN_SIZE bytes are compressed. Streaming responses, partial content, and
+    responses from the paths in UNCOMPRESSED_PATHS are sent as they are.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.is_compressible(request, response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encodings = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if "br" in encodings:
+            encoding = "br"
+            content = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        elif "gzip" in encodings:
+            encoding = "gzip"
+            content = gzip.compress(response.content, compresslevel=GZIP_LEVEL, mtime=0)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response["Content-Length"] = str(len(content))
+
+        # The bytes differ from the uncompressed representation, like GZipMiddleware
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+        return response
+
+    @staticmethod
+    def is_compressible(request, response):
+        return (
+            not response.streaming
+            and response.status_code != 206
+            and not response.has_header("Content-Range")
+            and not response.has_header("Content-Encoding")
+            and response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+            and not request.path.startswith(UNCOMPRESSED_PATHS)
+            and len(response.content) >= settings.COMPRESSION_MIN_SIZE
+        )
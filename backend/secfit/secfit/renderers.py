@@ -0,0 +1,75 @@
+"""Renderers for the REST API, selected by the Accept header of the request.
+
+OrjsonRenderer produces the same JSON as DRF's JSONRenderer, encoded with orjson.
+MessagePackRenderer produces the same document as MessagePack, for clients that ask for
+application/msgpack.
+
+Both renderers add the time they take to the render time of the current request.
+"""
+import time
+from contextlib import contextmanager
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from secfit.middleware import current_request_stats
+
+# Converts the values neither encoder supports natively the way DRF's JSONRenderer does,
+# e.g. datetimes to ECMA 262 strings with a Z suffix
+_default = JSONEncoder().default
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+@contextmanager
+def timed_render():
+    """Adds the time spent in the block to the render time of the current request,
+    recorded by secfit.middleware.MetricsMiddleware.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.render_time += time.perf_counter() - start
+
+
+class OrjsonRenderer(JSONRenderer):
+    """JSONRenderer that encodes compact responses with orjson.
+
+    Indented responses, as asked for by the browsable API or an indent media type
+    parameter, are left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        with timed_render():
+            if self.get_indent(accepted_media_type, renderer_context) is not None:
+                return super().render(data, accepted_media_type, renderer_context)
+
+            ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+            # Escape U+2028 and U+2029 like JSONRenderer, so the output is valid JavaScript
+            if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+                ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                    b"\xe2\x80\xa9", b"\\u2029"
+                )
+            return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renderer which serializes to MessagePack."""
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        with timed_render():
+            return msgpack.packb(data, default=_default, use_bin_type=True)
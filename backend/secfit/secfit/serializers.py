@@ -0,0 +1,27 @@
+"""Serializer helpers shared by the applications of the secfit project
+"""
+import time
+from secfit.middleware import current_request_stats
+
+
+class TimedSerializerMixin(object):
+    """Mixin for serializers that adds the time spent building their output, including
+    the queries it triggers, to the serializer time of the current request, recorded by
+    secfit.middleware.MetricsMiddleware.
+
+    Only the outermost timed serializer is measured, so nested serializers and the
+    children of list serializers are not counted twice.
+    """
+
+    def to_representation(self, instance):
+        stats = current_request_stats.get()
+        if stats is None or stats.serializing:
+            return super().to_representation(instance)
+
+        stats.serializing = True
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats.serializer_time += time.perf_counter() - start
+            stats.serializing = False
@@ -27,6 +27,18 @@ EMAIL_USE_TLS = False
 EMAIL_PORT = 25
 DEFAULT_FROM_EMAIL = "tdt4237-group" + groupid + " " + "<noreply@idi.ntnu.no>"
 
+# Task queue for slow side effects such as sending email
+# DatabaseBackend queues tasks for the `manage.py run_tasks` worker,
+# ImmediateBackend runs them inline during the request.
+TASK_QUEUE_BACKEND = os.environ.get(
+    "TASK_QUEUE_BACKEND", "tasks.backends.DatabaseBackend"
+)
+
+# Functions the task worker runs itself at a fixed interval, in seconds
+PERIODIC_TASKS = {
+    "users.blacklist.compact_expired_tokens": 60 * 60,
+}
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
@@ -64,10 +76,13 @@ INSTALLED_APPS = [
     "workouts.apps.WorkoutsConfig",
     "users.apps.UsersConfig",
     "comments.apps.CommentsConfig",
+    "tasks.apps.TasksConfig",
     "corsheaders",
 ]
 
 MIDDLEWARE = [
+    "secfit.middleware.MetricsMiddleware",
+    "secfit.middleware.CompressionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -108,6 +123,38 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Authenticated users are only cached when the default cache is shared by every process,
+# e.g. CACHE_BACKEND set to django.core.cache.backends.memcached.MemcachedCache or
+# django_redis.cache.RedisCache, since their invalidations must reach all processes. With
+# the local memory default they are read from the database on every request.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    },
+    # First pages of the workout feed, see workouts.feed. A shared cache, e.g.
+    # FEED_CACHE_BACKEND set to django_redis.cache.RedisCache with django-redis installed
+    # and FEED_CACHE_LOCATION set to redis://localhost:6379/1, keeps pages until a change
+    # invalidates them. The local memory default is only used while a single web process
+    # serves every request, see WEB_CONCURRENCY, and then keeps pages for a short time.
+    "feed": {
+        "BACKEND": os.environ.get(
+            "FEED_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("FEED_CACHE_LOCATION", "feed"),
+    },
+}
+
+# Number of web server processes, or None if unknown. gunicorn starts this many workers
+# when the variable is set, as the Dockerfile does.
+WEB_CONCURRENCY = (
+    int(os.environ["WEB_CONCURRENCY"]) if os.environ.get("WEB_CONCURRENCY") else None
+)
+
 is_prod = os.environ.get("IS_HEROKU", None)
 
 if is_prod:
@@ -170,12 +217,29 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
 STATIC_ROOT = os.path.join(BASE_DIR, "secfit", "staticfiles")
 STATIC_URL = "/static/"
 
+# collectstatic fingerprints static files and writes gzip and brotli copies of them,
+# which WhiteNoise serves to clients that accept them. With DEBUG off, templates and
+# admin pages fail to render until collectstatic has been run, since the manifest
+# mapping files to their fingerprinted names only exists after it.
+STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+
+# Smallest response body in bytes that CompressionMiddleware compresses
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+
 # MEDIA FILES
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"
 
+# When set, permission-checked media files are handed to nginx with X-Accel-Redirect
+# instead of being streamed by Django. Must match the internal location in nginx.conf
+# that aliases MEDIA_ROOT, e.g. "/protected-media/".
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get("MEDIA_ACCEL_REDIRECT_PREFIX", "")
+
+# JSON is encoded with orjson, and clients may ask for MessagePack with
+# "Accept: application/msgpack"
 DEFAULT_RENDERER_CLASSES = (
-    'rest_framework.renderers.JSONRenderer',
+    'secfit.renderers.OrjsonRenderer',
+    'secfit.renderers.MessagePackRenderer',
 )
 
 if DEBUG:
@@ -187,9 +251,14 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
+    ),
+    'DEFAULT_RENDERER_CLASSES': DEFAULT_RENDERER_CLASSES,
+    "DEFAULT_PARSER_CLASSES": (
+        "secfit.parsers.OrjsonParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ),
-    'DEFAULT_RENDERER_CLASSES': DEFAULT_RENDERER_CLASSES
 }
 
 AUTH_USER_MODEL = "users.User"
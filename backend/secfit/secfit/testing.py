@@ -0,0 +1,33 @@
+"""Test helpers shared by the applications of the secfit project
+"""
+import tempfile
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import override_settings
+
+
+class SharedCacheMixin:
+    """TestCase mixin pointing every cache alias at a file-based cache in a temporary
+    directory, which secfit.caches.is_shared_cache() treats as shared like memcached or
+    Redis. Two cache objects for the same alias stand in for two processes.
+    """
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            CACHES={
+                alias: {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": f"{directory.name}/{alias}",
+                }
+                for alias in settings.CACHES
+            }
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def other_process_cache(self, alias="default"):
+        """Returns a new cache object for an alias, as another process would create it."""
+        return FileBasedCache(settings.CACHES[alias]["LOCATION"], {})
@@ -0,0 +1,73 @@
+"""
+Tests for the project-level modules of secfit.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+from secfit import metrics
+from workouts.models import Exercise
+
+
+class MetricsTestCase(TestCase):
+    """Requests are recorded per url pattern name, and staff users can read the metrics
+    in the Prometheus text format.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        self.staff = get_user_model().objects.create(
+            username="staff", email="staff@secfit.no", is_staff=True
+        )
+        Exercise.objects.create(
+            name="Push-up", description="Push the floor away", unit="reps"
+        )
+        self.client = APIClient()
+
+    def sample(self, metric, **labels):
+        return metric.labels(**labels)._value.get()
+
+    def test_requests_are_labelled_by_view_name(self):
+        self.client.force_authenticate(user=self.user)
+        labels = {"view": "exercise-list", "method": "GET"}
+        requests = self.sample(metrics.REQUESTS, status=200, **labels)
+        root_labels = {"view": "workouts.views.api_root", "method": "GET", "status": 200}
+        root_requests = self.sample(metrics.REQUESTS, **root_labels)
+        serializer_time = metrics.SERIALIZER_TIME.labels(**labels)._sum.get()
+        render_time = metrics.RENDER_TIME.labels(**labels)._sum.get()
+
+        self.assertEqual(self.client.get("/api/exercises/").status_code, 200)
+        self.assertEqual(self.client.get("/").status_code, 200)
+
+        self.assertEqual(self.sample(metrics.REQUESTS, status=200, **labels), requests + 1)
+        # Function-based views are told apart as well, by their dotted path if unnamed
+        self.assertEqual(self.sample(metrics.REQUESTS, **root_labels), root_requests + 1)
+        self.assertGreater(
+            metrics.SERIALIZER_TIME.labels(**labels)._sum.get(), serializer_time
+        )
+        self.assertGreater(metrics.RENDER_TIME.labels(**labels)._sum.get(), render_time)
+
+    def test_metrics_endpoint(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.get("/api/exercises/")
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn(
+            'secfit_requests_total{method="GET",status="200",view="exercise-list"}', body
+        )
+        self.assertIn(
+            'secfit_request_sql_queries_count{method="GET",view="exercise-list"}', body
+        )
+        self.assertIn(
+            'secfit_request_serializer_seconds_count{method="GET",view="exercise-list"}',
+            body,
+        )
+        self.assertIn(
+            'secfit_request_render_seconds_count{method="GET",view="exercise-list"}', body
+        )
@@ -17,12 +17,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from secfit.views import Metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("workouts.urls")),
     path("", include("users.urls")),
     path("", include("comments.urls")),
+    path("metrics", Metrics.as_view(), name="metrics"),
 ]
 
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -0,0 +1,27 @@
+"""Contains project-wide views that do not belong to a single application
+"""
+import os
+from django.http import HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+
+class Metrics(APIView):
+    """Exposes the request metrics in the Prometheus text format to staff users.
+
+    When gunicorn runs several worker processes, set the prometheus_multiproc_dir
+    environment variable so the metrics of every worker are aggregated.
+
+    HTTP methods: GET
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        registry = REGISTRY
+        if os.environ.get("prometheus_multiproc_dir"):
+            registry = CollectorRegistry()
+            MultiProcessCollector(registry)
+        return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,8 @@
+"""Module for registering models from tasks app to admin page so that they appear
+"""
+from django.contrib import admin
+
+# Register your models here.
+from .models import Task
+
+admin.site.register(Task)
@@ -0,0 +1,13 @@
+"""AppConfig for tasks app
+"""
+from django.apps import AppConfig
+
+
+class TasksConfig(AppConfig):
+    """AppConfig for tasks app
+
+    Attributes:
+        name (str): The name of the application
+    """
+
+    name = "tasks"
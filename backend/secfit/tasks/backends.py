@@ -0,0 +1,29 @@
+"""Task queue backends. The backend in use is chosen with settings.TASK_QUEUE_BACKEND, in
+the same way as settings.EMAIL_BACKEND chooses the email backend.
+"""
+from tasks.models import Task
+
+
+class DatabaseBackend:
+    """Stores tasks in the Task table, to be run by `manage.py run_tasks`.
+
+    The task row is written in the caller's transaction, so a task enqueued by a request
+    that is rolled back is never run.
+    """
+
+    def enqueue(self, task, args, kwargs):
+        return Task.objects.create(
+            name=task.name,
+            args=list(args),
+            kwargs=kwargs,
+            max_attempts=task.max_attempts,
+        )
+
+
+class ImmediateBackend:
+    """Runs tasks inline, as if they were called directly. Useful for development and tests,
+    where no worker is running.
+    """
+
+    def enqueue(self, task, args, kwargs):
+        task(*args, **kwargs)
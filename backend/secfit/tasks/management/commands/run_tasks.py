@@ -0,0 +1,36 @@
+"""Management command running the worker of the database-backed task queue
+"""
+import time
+from django.core.management.base import BaseCommand
+from tasks.queue import run_batch
+from tasks.scheduler import Scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued background tasks (e.g. emails) in batches until stopped, and the "
+        "periodic maintenance in settings.PERIODIC_TASKS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=50, help="Tasks claimed at a time"
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=2, help="Seconds to wait when idle"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Exit when no task is due"
+        )
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler()
+        while True:
+            scheduler.run_due()
+            succeeded, failed = run_batch(options["batch_size"])
+            if succeeded or failed:
+                self.stdout.write(f"Ran {succeeded + failed} tasks, {failed} failed")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["sleep"])
@@ -0,0 +1,54 @@
+"""Contains the models for the tasks Django application, a small database-backed queue
+for work that should not run inside the request/response cycle (e.g. sending email).
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Django model for a queued call to a background task.
+
+    Tasks are deleted once they have run successfully, so the table only holds pending,
+    running and failed tasks.
+
+    Attributes:
+        name:         Dotted path of the task function, e.g. users.util.deliver_reset_password_mail
+        args:         Positional arguments of the call (JSON)
+        kwargs:       Keyword arguments of the call (JSON)
+        status:       Pending, Running, or Failed
+        attempts:     How many times the task has been claimed by a worker
+        max_attempts: How many attempts are allowed before the task is given up
+        run_after:    The task is not run before this time (used to back off retries)
+        locked_at:    When a worker claimed the task
+        last_error:   Traceback of the last failed attempt
+        created:      When the task was enqueued
+    """
+
+    PENDING = "p"
+    RUNNING = "r"
+    FAILED = "f"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (FAILED, "Failed"),
+    )
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["run_after", "id"]
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="task_status_run_after_idx"),
+        ]
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,129 @@
+"""Defining, enqueueing and running background tasks.
+
+A task is a plain function decorated with @task. Calling it runs it directly, while
+`.delay(*args, **kwargs)` hands it to the configured backend. The arguments must be JSON
+serializable, so pass primary keys rather than model instances.
+"""
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from tasks.models import Task
+
+# Delay before the first retry of a failed task, doubled for every further attempt
+RETRY_DELAY = timedelta(seconds=30)
+
+# A running task whose worker has not finished it within this time is handed out again
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+
+class BackgroundTask:
+    """A function that can be run in the background. Created with the @task decorator.
+
+    Attributes:
+        func:         The wrapped function
+        name:         Dotted path of the function, used to find it again in the worker
+        max_attempts: How many times the task is tried before it is marked as failed
+    """
+
+    def __init__(self, func, max_attempts):
+        self.func = func
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Enqueues a call of the task with the given arguments."""
+        return get_backend().enqueue(self, args, kwargs)
+
+
+def task(max_attempts=5):
+    """Decorator turning a module-level function into a BackgroundTask."""
+
+    def decorator(func):
+        return BackgroundTask(func, max_attempts)
+
+    return decorator
+
+
+def get_backend():
+    return import_string(settings.TASK_QUEUE_BACKEND)()
+
+
+def claim_tasks(batch_size):
+    """Marks up to batch_size due tasks as running, counts the attempt, and returns them.
+
+    Rows are locked with SKIP LOCKED where the database supports it, so several workers can
+    claim batches at the same time without getting the same tasks. The attempt is counted
+    when the task is claimed rather than when it fails, so a task that crashes its worker
+    is given up after max_attempts as well: once its lock has timed out on the last
+    attempt, it is marked as failed instead of being handed out again.
+
+    Args:
+        batch_size (int): Maximum number of tasks to claim
+
+    Returns:
+        list: The claimed tasks
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=Task.PENDING, run_after__lte=now)
+                | Q(status=Task.RUNNING, locked_at__lt=now - LOCK_TIMEOUT)
+            )
+            .values_list("id", flat=True)[:batch_size]
+        )
+        Task.objects.filter(
+            id__in=ids, status=Task.RUNNING, attempts__gte=F("max_attempts")
+        ).update(
+            status=Task.FAILED,
+            locked_at=None,
+            last_error="The worker did not finish the task within the lock timeout",
+        )
+        Task.objects.filter(id__in=ids).exclude(status=Task.FAILED).update(
+            status=Task.RUNNING, locked_at=now, attempts=F("attempts") + 1
+        )
+    return list(Task.objects.filter(id__in=ids, status=Task.RUNNING, locked_at=now))
+
+
+def run_batch(batch_size=50):
+    """Claims and runs one batch of due tasks. Successful tasks are deleted with a single
+    query, failed ones are scheduled for a retry with exponential back-off or, after
+    max_attempts, marked as failed.
+
+    Args:
+        batch_size (int): Maximum number of tasks to run
+
+    Returns:
+        tuple: Number of tasks that succeeded and number that failed
+    """
+    succeeded = []
+    failed = 0
+    for queued_task in claim_tasks(batch_size):
+        try:
+            import_string(queued_task.name)(*queued_task.args, **queued_task.kwargs)
+        except Exception:
+            failed += 1
+            queued_task.last_error = traceback.format_exc()
+            queued_task.locked_at = None
+            if queued_task.attempts >= queued_task.max_attempts:
+                queued_task.status = Task.FAILED
+            else:
+                queued_task.status = Task.PENDING
+                queued_task.run_after = timezone.now() + RETRY_DELAY * 2 ** (
+                    queued_task.attempts - 1
+                )
+            queued_task.save()
+        else:
+            succeeded.append(queued_task.id)
+
+    Task.objects.filter(id__in=succeeded).delete()
+    return len(succeeded), failed
@@ -0,0 +1,41 @@
+"""Runs maintenance functions at fixed intervals inside the task worker.
+
+The schedule is settings.PERIODIC_TASKS, a dict from the dotted path of a function to the
+number of seconds between runs. Every worker process keeps its own schedule, so scheduled
+functions must be safe to run from several workers at once.
+"""
+import logging
+import time
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Keeps track of when each periodic function last ran in this process."""
+
+    def __init__(self, schedule=None):
+        self.schedule = settings.PERIODIC_TASKS if schedule is None else schedule
+        self.last_run = {}
+
+    def run_due(self):
+        """Calls every function whose interval has passed. Errors are logged and the
+        function is tried again after its next interval.
+
+        Returns:
+            int: Number of functions that were run
+        """
+        ran = 0
+        for path, interval in self.schedule.items():
+            now = time.monotonic()
+            if path in self.last_run and now - self.last_run[path] < interval:
+                continue
+            self.last_run[path] = now
+            ran += 1
+            try:
+                result = import_string(path)()
+                logger.info("Ran periodic task %s: %s", path, result)
+            except Exception:
+                logger.exception("Periodic task %s failed", path)
+        return ran
@@ -0,0 +1,147 @@
+"""
+Tests for the tasks application.
+"""
+import time
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from tasks.models import Task
+from tasks.queue import LOCK_TIMEOUT, RETRY_DELAY, claim_tasks, run_batch, task
+from tasks.scheduler import Scheduler
+
+calls = []
+
+
+@task()
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def fail():
+    raise RuntimeError("failed")
+
+
+def periodic():
+    calls.append("periodic")
+    raise RuntimeError("failed")
+
+
+@override_settings(TASK_QUEUE_BACKEND="tasks.backends.DatabaseBackend")
+class DatabaseBackendTestCase(TestCase):
+    """Tasks are claimed once, retried with back-off, and given up after max_attempts,
+    including tasks whose worker died while running them.
+    """
+
+    def setUp(self):
+        calls.clear()
+
+    def test_task_is_run_and_deleted(self):
+        record.delay("value")
+        self.assertEqual(calls, [])
+        self.assertEqual(run_batch(), (1, 0))
+        self.assertEqual(calls, ["value"])
+        self.assertFalse(Task.objects.exists())
+
+    def test_claim(self):
+        due = record.delay(1)
+        later = record.delay(2)
+        Task.objects.filter(id=later.id).update(
+            run_after=timezone.now() + timedelta(minutes=1)
+        )
+
+        (claimed,) = claim_tasks(10)
+        self.assertEqual(claimed.id, due.id)
+        self.assertEqual(claimed.status, Task.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+
+        # A running task is not handed out again until its lock has timed out
+        self.assertEqual(claim_tasks(10), [])
+        Task.objects.filter(id=due.id).update(
+            locked_at=timezone.now() - LOCK_TIMEOUT - timedelta(seconds=1)
+        )
+        (reclaimed,) = claim_tasks(10)
+        self.assertEqual(reclaimed.id, due.id)
+        self.assertEqual(reclaimed.attempts, 2)
+
+    def test_retry_backs_off(self):
+        queued_task = fail.delay()
+        for attempt in [1, 2]:
+            Task.objects.filter(id=queued_task.id).update(run_after=timezone.now())
+            start = timezone.now()
+            self.assertEqual(run_batch(), (0, 1))
+            queued_task.refresh_from_db()
+            self.assertEqual(queued_task.attempts, attempt)
+            self.assertIn("RuntimeError", queued_task.last_error)
+            if attempt == 1:
+                self.assertEqual(queued_task.status, Task.PENDING)
+                self.assertGreaterEqual(queued_task.run_after, start + RETRY_DELAY)
+                self.assertEqual(run_batch(), (0, 0))
+
+        # max_attempts of fail is 2
+        self.assertEqual(queued_task.status, Task.FAILED)
+        Task.objects.filter(id=queued_task.id).update(run_after=timezone.now())
+        self.assertEqual(run_batch(), (0, 0))
+
+    def test_crashed_task_is_given_up(self):
+        queued_task = fail.delay()
+        for _ in range(2):
+            self.assertEqual(len(claim_tasks(10)), 1)
+            # The worker dies without reporting back
+            Task.objects.filter(id=queued_task.id).update(
+                locked_at=timezone.now() - LOCK_TIMEOUT - timedelta(seconds=1)
+            )
+
+        self.assertEqual(claim_tasks(10), [])
+        queued_task.refresh_from_db()
+        self.assertEqual(queued_task.status, Task.FAILED)
+        self.assertEqual(queued_task.attempts, 2)
+
+
+@override_settings(TASK_QUEUE_BACKEND="tasks.backends.ImmediateBackend")
+class ImmediateBackendTestCase(TestCase):
+    """The immediate backend runs tasks inline without storing them."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_task_is_run_inline(self):
+        record.delay("value")
+        self.assertEqual(calls, ["value"])
+        self.assertFalse(Task.objects.exists())
+
+        with self.assertRaises(RuntimeError):
+            fail.delay()
+
+
+class SchedulerTestCase(TestCase):
+    """Periodic functions run once per interval, and a failing one is logged and tried
+    again after its interval. The worker schedules the token compaction.
+    """
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_due(self):
+        scheduler = Scheduler({"tasks.tests.periodic": 60})
+        with self.assertLogs("tasks.scheduler", "ERROR"):
+            self.assertEqual(scheduler.run_due(), 1)
+        self.assertEqual(scheduler.run_due(), 0)
+        self.assertEqual(calls, ["periodic"])
+
+        later = time.monotonic() + 61
+        with mock.patch("tasks.scheduler.time.monotonic", return_value=later):
+            with self.assertLogs("tasks.scheduler", "ERROR"):
+                self.assertEqual(scheduler.run_due(), 1)
+        self.assertEqual(calls, ["periodic", "periodic"])
+
+    def test_token_compaction_is_scheduled(self):
+        scheduler = Scheduler()
+        self.assertIn("users.blacklist.compact_expired_tokens", scheduler.schedule)
+        with mock.patch(
+            "users.blacklist.compact_expired_tokens", return_value=(0, 0)
+        ) as compact:
+            scheduler.run_due()
+            scheduler.run_due()
+        compact.assert_called_once_with()
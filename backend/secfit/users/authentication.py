@@ -0,0 +1,59 @@
+"""Contains custom authentication classes for the users application
+"""
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from secfit.caches import bump_version, get_version, is_shared_cache
+
+# Seconds an authenticated user is kept in the cache between invalidations
+USER_CACHE_TIMEOUT = 60 * 15
+
+
+def _version_key(user_id):
+    return f"auth-user-version:{user_id}"
+
+
+def get_user_cache_version(user_id):
+    """Returns the current cache version of a user, creating one if there is none.
+
+    Args:
+        user_id: Primary key of the user
+    Returns:
+        A version number that changes whenever the user is invalidated
+    """
+    return get_version("default", _version_key(user_id))
+
+
+def invalidate_cached_user(user_id):
+    """Moves a user to a new cache version so every process stops using the cached copy.
+
+    Bumping the version rather than deleting the entry means a request that read the
+    user from the database before the change cannot put the stale copy back.
+
+    Args:
+        user_id: Primary key of the user
+    """
+    bump_version("default", _version_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that resolves the token's user from the cache, so
+    authenticating a request costs no queries once the user has been cached.
+
+    The user decides what the request may do, e.g. through is_active and the coach link,
+    so it is only cached when the default cache is shared by every process. Otherwise a
+    deactivated user would stay authenticated in the processes that did not make the
+    change, and the user is read from the database on every request instead.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or not is_shared_cache():
+            return super().get_user(validated_token)
+
+        key = f"auth-user:{user_id}:{get_user_cache_version(user_id)}"
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user
@@ -0,0 +1,160 @@
+"""In-process Bloom filter of blacklisted token ids, kept in sync through the shared cache.
+
+Checking a token that is not blacklisted normally costs no database query: the Bloom
+filter can answer "definitely not blacklisted" by itself, and only a possible hit is
+confirmed against the BlacklistedToken table. Every blacklisting bumps a version
+counter in the shared cache once it is committed, which tells every process to rebuild
+its filter from the table before trusting it again. The filter is rebuilt rather than
+topped up with the rows added since the last sync, since rows are not committed in the
+order of their ids.
+
+The filter is only trusted when the default cache is shared by every process. With a
+process-local cache the other processes would never see the version change, so every
+token is checked against the table instead.
+"""
+import hashlib
+import math
+import threading
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import BlacklistMixin
+from secfit.caches import bump_version, get_version, is_shared_cache
+
+VERSION_KEY = "token-blacklist-version"
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter of strings.
+
+    Args:
+        capacity: Number of items the filter is sized for
+        error_rate: False positive rate at full capacity
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position // 8] |= 1 << (position % 8)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position // 8] & (1 << (position % 8))
+            for position in self._positions(item)
+        )
+
+
+class BlacklistFilter:
+    """The process-wide Bloom filter of blacklisted JTIs and its sync state."""
+
+    min_capacity = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.version = None
+
+    def rebuild(self):
+        """Loads every blacklisted JTI of an unexpired token into a new filter."""
+        jtis = list(
+            BlacklistedToken.objects.filter(
+                token__expires_at__gt=timezone.now()
+            ).values_list("token__jti", flat=True)
+        )
+        bloom = BloomFilter(max(self.min_capacity, 2 * len(jtis)))
+        for jti in jtis:
+            bloom.add(jti)
+        self.bloom = bloom
+
+    def sync(self):
+        """Rebuilds the filter if a token was blacklisted since it was last built."""
+        version = get_version("default", VERSION_KEY)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            # The version is read before the table, so a blacklisting committed while
+            # rebuilding changes the version again and triggers another rebuild
+            self.rebuild()
+            self.version = version
+
+    def add(self, jti):
+        """Adds a JTI blacklisted by this process without waiting for the next sync."""
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def might_contain(self, jti):
+        self.sync()
+        return jti in self.bloom
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def bump_blacklist_version():
+    """Tells every process that a token was blacklisted once the row is committed."""
+    transaction.on_commit(lambda: bump_version("default", VERSION_KEY))
+
+
+class CachedBlacklistMixin(BlacklistMixin):
+    """BlacklistMixin that consults the Bloom filter before the blacklist tables."""
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if is_shared_cache() and not blacklist_filter.might_contain(jti):
+            return
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        bump_blacklist_version()
+        return result
+
+
+def compact_expired_tokens(batch_size=1000, max_batches=None):
+    """Deletes expired outstanding tokens, and their blacklist entries, in bounded batches.
+
+    Each batch is deleted in its own short statement, so the tables are never locked for
+    long. Expired tokens fail verification on their own, so their rows are no longer needed.
+
+    Args:
+        batch_size (int): Maximum number of outstanding tokens deleted per batch
+        max_batches (int): Stop after this many batches, or None to delete everything expired
+    Returns:
+        tuple: Number of outstanding tokens and blacklisted tokens deleted
+    """
+    now = timezone.now()
+    outstanding = blacklisted = batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now)
+            .order_by("expires_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        _, deleted = OutstandingToken.objects.filter(id__in=ids).delete()
+        outstanding += deleted.get(OutstandingToken._meta.label, 0)
+        blacklisted += deleted.get(BlacklistedToken._meta.label, 0)
+        batches += 1
+    return outstanding, blacklisted
@@ -0,0 +1,28 @@
+"""Management command deleting expired rows from the token blacklist tables
+"""
+from django.core.management.base import BaseCommand
+from users.blacklist import compact_expired_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes expired outstanding tokens and their blacklist entries in bounded batches. "
+        "The task worker also runs this periodically, see settings.PERIODIC_TASKS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Rows deleted per batch"
+        )
+        parser.add_argument(
+            "--max-batches", type=int, default=None, help="Stop after this many batches"
+        )
+
+    def handle(self, *args, **options):
+        outstanding, blacklisted = compact_expired_tokens(
+            options["batch_size"], options["max_batches"]
+        )
+        self.stdout.write(
+            f"Reclaimed {outstanding + blacklisted} rows: {outstanding} outstanding "
+            f"tokens and {blacklisted} blacklisted tokens"
+        )
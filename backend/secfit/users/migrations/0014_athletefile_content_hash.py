@@ -0,0 +1,35 @@
+# Generated by Django 3.1 on 2026-10-18 10:09
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_existing_files(apps, schema_editor):
+    AthleteFile = apps.get_model("users", "AthleteFile")
+    for athlete_file in AthleteFile.objects.exclude(file=""):
+        try:
+            with athlete_file.file.open("rb") as file:
+                sha256 = hashlib.sha256()
+                for chunk in file.chunks():
+                    sha256.update(chunk)
+        except FileNotFoundError:
+            continue
+        athlete_file.content_hash = sha256.hexdigest()
+        athlete_file.save(update_fields=["content_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_user_is_verified_2fa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='athletefile',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(hash_existing_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Indexes the expiry of simplejwt's outstanding tokens, which compact_expired_tokens
+    filters and orders by. The table belongs to a third-party app, so the index is
+    created with SQL from here instead of from a model Meta.
+    """
+
+    dependencies = [
+        ("token_blacklist", "0007_auto_20171017_2214"),
+        ("users", "0014_athletefile_content_hash"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS outstandingtoken_expires_at_idx "
+            "ON token_blacklist_outstandingtoken (expires_at)",
+            "DROP INDEX IF EXISTS outstandingtoken_expires_at_idx",
+        ),
+    ]
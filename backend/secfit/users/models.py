@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth import get_user_model
+from workouts.mixins import ContentHashMixin
 from .validators import PDFValidator
 
 
@@ -20,6 +21,16 @@ class User(AbstractUser):
         "self", on_delete=models.CASCADE, related_name="athletes", blank=True, null=True
     )
 
+    def is_coached_by(self, user):
+        """Checks whether the given user is this user's coach without loading the coach.
+
+        Args:
+            user: The user to check, may be anonymous
+        Returns:
+            True if this user has a coach and it is the given user
+        """
+        return self.coach_id is not None and self.coach_id == user.pk
+
 
 def athlete_directory_path(instance, filename):
     """
@@ -31,10 +42,10 @@ def athlete_directory_path(instance, filename):
     return f"users/{instance.athlete.id}/{filename}"
 
 
-class AthleteFile(models.Model):
+class AthleteFile(ContentHashMixin, models.Model):
     """
     Model for an athlete's file. Contains fields for the athlete for whom this file was uploaded,
-    the coach owner, and the file itself.
+    the coach owner, the file itself, and a SHA-256 hash of the file used as its ETag.
     """
 
     athlete = models.ForeignKey(
@@ -45,6 +56,7 @@ class AthleteFile(models.Model):
     )
     file = models.FileField(
         upload_to=athlete_directory_path, validators=[PDFValidator])
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
 
 
 class Offer(models.Model):
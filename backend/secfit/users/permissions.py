@@ -34,13 +34,13 @@ class IsCoach(permissions.BasePermission):
             if request.data.get("athlete"):
                 athlete_id = request.data["athlete"].split("/")[-2]
                 athlete = get_user_model().objects.get(pk=athlete_id)
-                return athlete.coach == request.user
+                return athlete.is_coached_by(request.user)
             return False
 
         return True
 
     def has_object_permission(self, request, view, obj):
-        return request.user == obj.athlete.coach
+        return obj.athlete.is_coached_by(request.user)
 
 
 class IsOfferOwnerOrRecipient(permissions.BasePermission):
@@ -1,18 +1,27 @@
 from rest_framework import serializers, exceptions
 from django.contrib.auth import get_user_model, password_validation
+from django.db.models import Count, Max, OuterRef, Prefetch, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from datetime import timedelta
 from users.models import Offer, AthleteFile, RememberMe, User
+from workouts.models import Workout, VolumeRollup
+from workouts.rollups import rollup_periods
+from secfit.serializers import TimedSerializerMixin
+from workouts.serializers import ExpandableFieldsMixin, RelatedCountField
 from django import forms
-from rest_framework_simplejwt.serializers import TokenObtainSerializer
+from rest_framework_simplejwt.serializers import TokenObtainSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
-from .util import send_email_verification_mail, TOTPVerificationToken, ResetPasswordToken
+from .util import send_email_verification_mail, TOTPVerificationToken, ResetPasswordToken, CachedRefreshToken
 from django.core.validators import validate_email
 import pyotp
 from rest_framework_simplejwt.exceptions import TokenError
 
 
 
-class UserSerializer(serializers.HyperlinkedModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.HyperlinkedModelSerializer):
     password = serializers.CharField(
         style={"input_type": "password"}, write_only=True)
     password1 = serializers.CharField(
@@ -27,11 +36,7 @@ class UserSerializer(serializers.HyperlinkedModelSerializer):
             "username",
             "password",
             "password1",
-            "athletes",
             "coach",
-            "workouts",
-            "coach_files",
-            "athlete_files",
         ]
 
     def validate_email(self, value):
@@ -77,7 +82,57 @@ class UserSerializer(serializers.HyperlinkedModelSerializer):
         return user_obj
 
 
-class UserGetSerializer(serializers.HyperlinkedModelSerializer):
+def _count_subquery(model, field, *filters):
+    """Counts the rows of model whose field points at the outer user and that match the
+    given filters, as a subquery.
+
+    Separate subqueries keep the counts exact, where joining several reverse relations
+    in one query would multiply them.
+    """
+    return Coalesce(
+        Subquery(
+            model.objects.filter(*filters, **{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+class UserSummarySerializer(TimedSerializerMixin, serializers.HyperlinkedModelSerializer):
+    """Serializer for a user expanded inline in another object.
+
+    Serialized fields: url, id, username
+    """
+
+    class Meta:
+        model = get_user_model()
+        fields = ["url", "id", "username"]
+
+
+class UserGetSerializer(TimedSerializerMixin, ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
+    """Serializer for reading a user. Relations that grow with the user's history are
+    given as counts and hyperlinks to paginated lists instead of one hyperlink per object.
+
+    Serialized fields: url, id, email, username, coach, athlete_count, athletes_url,
+    workout_count, workouts_url, coach_file_count, coach_files_url, athlete_file_count,
+    athlete_files_url
+    """
+
+    athlete_count = RelatedCountField("athletes")
+    athletes_url = serializers.HyperlinkedIdentityField(view_name="user-athletes")
+    workout_count = RelatedCountField("workouts")
+    workouts_url = serializers.HyperlinkedIdentityField(view_name="user-workouts")
+    coach_file_count = RelatedCountField("coach_files")
+    coach_files_url = serializers.HyperlinkedIdentityField(view_name="user-coach-files")
+    athlete_file_count = RelatedCountField("athlete_files")
+    athlete_files_url = serializers.HyperlinkedIdentityField(
+        view_name="user-athlete-files"
+    )
+    expandable_fields = {"coach": "users.serializers.UserSummarySerializer"}
+
     class Meta:
         model = get_user_model()
         fields = [
@@ -85,28 +140,195 @@ class UserGetSerializer(serializers.HyperlinkedModelSerializer):
             "id",
             "email",
             "username",
-            "athletes",
             "coach",
-            "workouts",
-            "coach_files",
-            "athlete_files",
+            "athlete_count",
+            "athletes_url",
+            "workout_count",
+            "workouts_url",
+            "coach_file_count",
+            "coach_files_url",
+            "athlete_file_count",
+            "athlete_files_url",
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset, user):
+        """Annotates the queryset with the counts used by RelatedCountField.
+
+        Workouts and files are counted the way the lists behind workouts_url,
+        coach_files_url and athlete_files_url filter them for the requesting user, so a
+        count never gives away objects the user cannot see.
+        """
+        visible_workouts = (
+            Q(visibility=Workout.PUBLIC)
+            | Q(owner=user)
+            | Q(visibility=Workout.COACH, owner__coach=user)
+        )
+        visible_files = Q(athlete=user) | Q(owner=user)
+        return queryset.annotate(
+            athlete_count=_count_subquery(get_user_model(), "coach"),
+            workout_count=_count_subquery(Workout, "owner", visible_workouts),
+            coach_file_count=_count_subquery(AthleteFile, "athlete", visible_files),
+            athlete_file_count=_count_subquery(AthleteFile, "owner", visible_files),
+        )
+
+
+class CoachDashboardFileSerializer(serializers.HyperlinkedModelSerializer):
+    """Serializer for a file a coach uploaded for an athlete, on the coach dashboard.
+
+    Serialized fields: url, id, file
+    """
+
+    class Meta:
+        model = AthleteFile
+        fields = ["url", "id", "file"]
+
+
+def _dashboard_files(coach):
+    return Prefetch(
+        "coach_files",
+        queryset=AthleteFile.objects.filter(owner=coach).order_by("id"),
+        to_attr="dashboard_files",
+    )
+
+
+class CoachDashboardAthleteSerializer(TimedSerializerMixin, serializers.HyperlinkedModelSerializer):
+    """Serializer for the summary of one athlete on the coach dashboard. Only workouts the
+    coach may see, public and coach visibility, count towards it.
+
+    Serialized fields: url, id, username, last_workout_date, week_volume, files
+    """
+
+    last_workout_date = serializers.DateTimeField(read_only=True)
+    week_volume = serializers.IntegerField(read_only=True)
+    files = CoachDashboardFileSerializer(source="dashboard_files", many=True, read_only=True)
 
-class UserPutSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = get_user_model()
+        fields = ["url", "id", "username", "last_workout_date", "week_volume", "files"]
+
+    @staticmethod
+    def setup_eager_loading(queryset, coach):
+        """Annotates the athletes with their summary and prefetches the coach's files for
+        them, so the dashboard costs the same number of queries however large the roster.
+
+        Args:
+            queryset (QuerySet): Athletes of the coach
+            coach (User): The coach viewing the dashboard
+
+        Returns:
+            QuerySet: The athletes with last_workout_date, week_volume and dashboard_files
+        """
+        visibilities = [Workout.PUBLIC, Workout.COACH]
+        _, week_start = rollup_periods(timezone.now())[1]
+        return queryset.annotate(
+            last_workout_date=Subquery(
+                Workout.objects.filter(owner=OuterRef("pk"), visibility__in=visibilities)
+                .order_by()
+                .values("owner")
+                .annotate(last=Max("date"))
+                .values("last")
+            ),
+            week_volume=Coalesce(
+                Subquery(
+                    VolumeRollup.objects.filter(
+                        owner=OuterRef("pk"),
+                        period=VolumeRollup.WEEK,
+                        start=week_start,
+                        visibility__in=visibilities,
+                    )
+                    .order_by()
+                    .values("owner")
+                    .annotate(total=Sum("volume"))
+                    .values("total")
+                ),
+                0,
+            ),
+        ).prefetch_related(_dashboard_files(coach))
+
+
+class CoachDashboardFormerAthleteSerializer(TimedSerializerMixin, serializers.HyperlinkedModelSerializer):
+    """Serializer for a user the coach no longer coaches but uploaded files for, on the
+    coach dashboard. Their training is not summarized, since the coach may no longer see
+    it.
+
+    Serialized fields: url, id, username, files
+    """
+
+    files = CoachDashboardFileSerializer(source="dashboard_files", many=True, read_only=True)
+
+    class Meta:
+        model = get_user_model()
+        fields = ["url", "id", "username", "files"]
+
+    @staticmethod
+    def setup_eager_loading(queryset, coach):
+        """Prefetches the files the coach uploaded for the users.
+
+        Args:
+            queryset (QuerySet): Former athletes of the coach
+            coach (User): The coach viewing the dashboard
+        """
+        return queryset.prefetch_related(_dashboard_files(coach))
+
+
+class CoachDashboardOfferSerializer(TimedSerializerMixin, serializers.HyperlinkedModelSerializer):
+    """Serializer for a pending offer sent by the coach, on the coach dashboard.
+
+    Serialized fields: url, id, recipient, recipient_username, timestamp
+    """
+
+    recipient_username = serializers.ReadOnlyField(source="recipient.username")
+
+    class Meta:
+        model = Offer
+        fields = ["url", "id", "recipient", "recipient_username", "timestamp"]
+
+
+class UserStatsQuerySerializer(serializers.Serializer):
+    """Validates the query parameters of the training volume statistics of a user.
+
+    Serialized fields: period, from, to, exercise
+    """
+
+    period = serializers.ChoiceField(choices=["day", "week"], default="week")
+    exercise = serializers.IntegerField(required=False)
+
+    def get_fields(self):
+        # "from" is a keyword, so the date range fields are declared here
+        fields = super().get_fields()
+        fields["from"] = serializers.DateField(required=False)
+        fields["to"] = serializers.DateField(required=False)
+        return fields
+
+    def validate(self, attrs):
+        attrs.setdefault("to", timezone.localdate())
+        attrs.setdefault("from", attrs["to"] - timedelta(weeks=12))
+        if attrs["from"] > attrs["to"]:
+            raise serializers.ValidationError("from must not be after to")
+        return attrs
+
+
+class UserPutSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
         fields = ["athletes"]
 
     def update(self, instance, validated_data):
         athletes_data = validated_data["athletes"]
-        instance.athletes.set(athletes_data)
+        # Save each athlete, so the signals invalidating caches that depend on the
+        # coach are sent
+        instance.athletes.set(athletes_data, bulk=False)
 
         return instance
 
 
-class AthleteFileSerializer(serializers.HyperlinkedModelSerializer):
+class AthleteFileSerializer(TimedSerializerMixin, ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     owner = serializers.ReadOnlyField(source="owner.username")
+    expandable_fields = {
+        "owner": "users.serializers.UserSummarySerializer",
+        "athlete": "users.serializers.UserSummarySerializer",
+    }
 
     class Meta:
         model = AthleteFile
@@ -116,8 +338,12 @@ class AthleteFileSerializer(serializers.HyperlinkedModelSerializer):
         return AthleteFile.objects.create(**validated_data)
 
 
-class OfferSerializer(serializers.HyperlinkedModelSerializer):
+class OfferSerializer(TimedSerializerMixin, ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     owner = serializers.ReadOnlyField(source="owner.username")
+    expandable_fields = {
+        "owner": "users.serializers.UserSummarySerializer",
+        "recipient": "users.serializers.UserSummarySerializer",
+    }
 
     class Meta:
         model = Offer
@@ -206,7 +432,24 @@ class LoginWithTOTPSerializer(serializers.Serializer):
         return data
 
 
-class RememberMeSerializer(serializers.HyperlinkedModelSerializer):
+class RefreshSerializer(TokenRefreshSerializer):
+    """TokenRefreshSerializer that checks the refresh token against the cached blacklist."""
+
+    def validate(self, attrs):
+        refresh = CachedRefreshToken(attrs["refresh"])
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            data["refresh"] = str(refresh)
+
+        return data
+
+
+class RememberMeSerializer(TimedSerializerMixin, serializers.HyperlinkedModelSerializer):
     """Serializer for an RememberMe. Hyperlinks are used for relationships by default.
 
     Serialized fields: remember_me
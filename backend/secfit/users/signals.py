@@ -0,0 +1,15 @@
+"""Contains signal receivers for the users application
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .authentication import invalidate_cached_user
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Drops the cached copy used by CachedJWTAuthentication whenever a user is saved
+    or deleted, which covers changes to the coach link and the 2FA fields.
+    """
+    invalidate_cached_user(instance.pk)
@@ -1,3 +1,501 @@
-from django.test import TestCase
+"""
+Tests for the users application.
+"""
+import io
+import uuid
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+from secfit.testing import SharedCacheMixin
+from users.authentication import CachedJWTAuthentication
+from users.blacklist import VERSION_KEY, compact_expired_tokens
+from users.models import AthleteFile, Offer
+from users.util import CachedRefreshToken
+from workouts.models import Exercise, PersonalRecord, VolumeRollup, Workout
+from workouts.rollups import rollup_periods
 
-# Create your tests here.
+
+class CachedJWTAuthenticationTestCase(SharedCacheMixin, TestCase):
+    """Authenticating with a JWT must not query the user once it is cached, and
+    must see changes to the user as soon as they are saved.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def test_cached_user_costs_no_queries(self):
+        response = self.client.get("/api/exercises/")
+        self.assertEqual(response.status_code, 200)
+
+        # only the count of the (empty) exercise list, no user lookup
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/exercises/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_saving_user_invalidates_cache(self):
+        self.client.get("/api/exercises/")
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get("/api/exercises/")
+        self.assertEqual(response.status_code, 401)
+
+    def test_roster_change_invalidates_cache(self):
+        token = AccessToken.for_user(self.user)
+        self.assertIsNone(CachedJWTAuthentication().get_user(token).coach_id)
+
+        coach = get_user_model().objects.create(username="coach", email="coach@secfit.no")
+        self.client.force_authenticate(user=coach)
+        response = self.client.put(
+            f"/api/users/{coach.id}/", {"athletes": [self.user.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CachedJWTAuthentication().get_user(token).coach_id, coach.id)
+
+        response = self.client.put(
+            f"/api/users/{coach.id}/", {"athletes": []}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(CachedJWTAuthentication().get_user(token).coach_id)
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_process_local_cache_is_not_used(self):
+        self.client.get("/api/exercises/")
+        # the user and the count of the (empty) exercise list
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/exercises/")
+        self.assertEqual(response.status_code, 200)
+
+
+class CachedBlacklistTestCase(SharedCacheMixin, TestCase):
+    """Refreshing with a token that is not blacklisted must not query the blacklist, and
+    tokens blacklisted by any process must be rejected.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post("/api/token/refresh/", {"refresh": str(token)})
+
+    def blacklist_in_other_process(self, token, row_id=None):
+        """Blacklists a token the way another process would, without touching the Bloom
+        filter of this one.
+        """
+        outstanding = OutstandingToken.objects.get(jti=token["jti"])
+        BlacklistedToken.objects.create(id=row_id, token=outstanding)
+        other_process_cache = self.other_process_cache()
+        version = other_process_cache.get(VERSION_KEY, 0)
+        other_process_cache.set(VERSION_KEY, version + 1, None)
+
+    def test_refresh_skips_blacklist_query(self):
+        refresh = CachedRefreshToken.for_user(self.user)
+        self.refresh(refresh)
+
+        with self.assertNumQueries(0):
+            response = self.refresh(refresh)
+        self.assertEqual(response.status_code, 200)
+
+    def test_blacklisted_token_is_rejected(self):
+        refresh = CachedRefreshToken.for_user(self.user)
+        self.refresh(refresh)
+
+        refresh.blacklist()
+        self.assertEqual(self.refresh(refresh).status_code, 401)
+
+    def test_token_blacklisted_by_other_process_is_rejected(self):
+        first = CachedRefreshToken.for_user(self.user)
+        second = CachedRefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(first).status_code, 200)
+
+        # Rows may be committed out of id order, so a lower id can show up later
+        self.blacklist_in_other_process(first, row_id=100)
+        self.assertEqual(self.refresh(first).status_code, 401)
+        self.blacklist_in_other_process(second, row_id=50)
+        self.assertEqual(self.refresh(second).status_code, 401)
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_process_local_cache_checks_table(self):
+        refresh = CachedRefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(refresh).status_code, 200)
+
+        # Another process cannot reach this cache, so the table decides
+        BlacklistedToken.objects.create(
+            token=OutstandingToken.objects.get(jti=refresh["jti"])
+        )
+        self.assertEqual(self.refresh(refresh).status_code, 401)
+
+
+class CompactExpiredTokensTestCase(TestCase):
+    """Expired outstanding tokens and their blacklist entries are deleted, live ones kept."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        now = timezone.now()
+        self.expired = [self.create_token(now - timedelta(days=1)) for _ in range(3)]
+        self.live = [self.create_token(now + timedelta(days=1)) for _ in range(2)]
+        for token in [self.expired[0], self.expired[1], self.live[0]]:
+            BlacklistedToken.objects.create(token=token)
+
+    def create_token(self, expires_at):
+        return OutstandingToken.objects.create(
+            user=self.user,
+            jti=uuid.uuid4().hex,
+            token="token",
+            created_at=expires_at - timedelta(days=1),
+            expires_at=expires_at,
+        )
+
+    def assertOnlyLiveTokensRemain(self):
+        self.assertEqual(
+            set(OutstandingToken.objects.values_list("id", flat=True)),
+            {token.id for token in self.live},
+        )
+        self.assertEqual(
+            list(BlacklistedToken.objects.values_list("token_id", flat=True)),
+            [self.live[0].id],
+        )
+
+    def test_compact_in_batches(self):
+        self.assertEqual(compact_expired_tokens(batch_size=2, max_batches=1), (2, 2))
+        self.assertEqual(compact_expired_tokens(batch_size=2), (1, 0))
+        self.assertOnlyLiveTokensRemain()
+        self.assertEqual(compact_expired_tokens(), (0, 0))
+
+    def test_command(self):
+        output = io.StringIO()
+        call_command("compact_tokens", stdout=output)
+        self.assertIn("Reclaimed 5 rows", output.getvalue())
+        self.assertOnlyLiveTokensRemain()
+
+
+class CoachDashboardTestCase(TestCase):
+    """The coach dashboard must cost a fixed number of queries however many athletes,
+    files and offers the coach has, and only summarize workouts visible to the coach.
+    """
+
+    def setUp(self):
+        self.coach = get_user_model().objects.create(username="coach", email="coach@secfit.no")
+        self.exercise = Exercise.objects.create(name="Push-up", description="", unit="reps")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.coach)
+        self.count = 0
+
+    def create_athlete(self):
+        self.count += 1
+        athlete = get_user_model().objects.create(
+            username=f"athlete{self.count}",
+            email=f"athlete{self.count}@secfit.no",
+            coach=self.coach,
+        )
+        now = timezone.now()
+        _, week_start = rollup_periods(now)[1]
+        for visibility, volume in [(Workout.COACH, 30), (Workout.PRIVATE, 100)]:
+            Workout.objects.create(
+                name="Workout", date=now, notes="", owner=athlete, visibility=visibility
+            )
+            VolumeRollup.objects.create(
+                owner=athlete,
+                exercise=self.exercise,
+                period=VolumeRollup.WEEK,
+                start=week_start,
+                visibility=visibility,
+                sets=3,
+                volume=volume,
+                instance_count=1,
+            )
+        AthleteFile.objects.create(
+            athlete=athlete, owner=self.coach, file=f"users/{athlete.id}/plan.pdf"
+        )
+        recipient = get_user_model().objects.create(
+            username=f"recipient{self.count}", email=f"recipient{self.count}@secfit.no"
+        )
+        Offer.objects.create(owner=self.coach, recipient=recipient)
+        return athlete
+
+    def test_dashboard_query_count_is_constant(self):
+        self.create_athlete()
+        # athletes with their summaries, their files, former athletes, pending offers
+        # with recipients
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/coach/dashboard/")
+        self.assertEqual(response.status_code, 200)
+
+        for _ in range(4):
+            self.create_athlete()
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/coach/dashboard/")
+        self.assertEqual(len(response.data["athletes"]), 5)
+        self.assertEqual(len(response.data["pending_offers"]), 5)
+
+        athlete = response.data["athletes"][0]
+        self.assertEqual(athlete["username"], "athlete1")
+        self.assertEqual(athlete["week_volume"], 30)
+        self.assertIsNotNone(athlete["last_workout_date"])
+        self.assertEqual(len(athlete["files"]), 1)
+        self.assertEqual(response.data["former_athletes"], [])
+
+    def test_former_athletes_keep_their_files(self):
+        for _ in range(3):
+            self.create_athlete()
+        get_user_model().objects.filter(username__in=["athlete1", "athlete3"]).update(coach=None)
+
+        # former athletes add the query for their files
+        with self.assertNumQueries(5):
+            response = self.client.get("/api/coach/dashboard/")
+        self.assertEqual(
+            [athlete["username"] for athlete in response.data["athletes"]], ["athlete2"]
+        )
+        self.assertEqual(
+            [athlete["username"] for athlete in response.data["former_athletes"]],
+            ["athlete1", "athlete3"],
+        )
+        former = response.data["former_athletes"][0]
+        self.assertEqual(len(former["files"]), 1)
+        self.assertNotIn("week_volume", former)
+
+
+class UserSubResourceTestCase(TestCase):
+    """The relations of a user are read from paginated sub-resources, limited to the
+    objects the requesting user may see, instead of being listed on the user itself.
+    """
+
+    def setUp(self):
+        self.coach = get_user_model().objects.create(username="coach", email="coach@secfit.no")
+        self.athlete = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no", coach=self.coach
+        )
+        self.other = get_user_model().objects.create(username="other", email="other@secfit.no")
+        self.workouts = {
+            visibility: Workout.objects.create(
+                name=visibility,
+                date=timezone.now(),
+                notes="",
+                owner=self.athlete,
+                visibility=visibility,
+            )
+            for visibility in [Workout.PUBLIC, Workout.COACH, Workout.PRIVATE]
+        }
+        self.file = AthleteFile.objects.create(
+            athlete=self.athlete, owner=self.coach, file=f"users/{self.athlete.id}/plan.pdf"
+        )
+        self.client = APIClient()
+
+    def get_ids(self, user, url):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [obj["id"] for obj in response.data["results"]]
+
+    def test_athletes(self):
+        url = f"/api/users/{self.coach.id}/athletes/"
+        self.assertEqual(self.get_ids(self.coach, url), [self.athlete.id])
+        self.assertEqual(self.get_ids(self.other, url), [self.athlete.id])
+        self.assertEqual(self.get_ids(self.coach, f"/api/users/{self.other.id}/athletes/"), [])
+
+    def test_workouts_are_limited_to_visible_ones(self):
+        url = f"/api/users/{self.athlete.id}/workouts/"
+        expected = {
+            self.athlete: [Workout.PUBLIC, Workout.COACH, Workout.PRIVATE],
+            self.coach: [Workout.PUBLIC, Workout.COACH],
+            self.other: [Workout.PUBLIC],
+        }
+        for user, visibilities in expected.items():
+            self.assertCountEqual(
+                self.get_ids(user, url),
+                [self.workouts[visibility].id for visibility in visibilities],
+            )
+
+    def test_counts_match_the_linked_lists(self):
+        for user in [self.athlete, self.coach, self.other]:
+            self.client.force_authenticate(user=user)
+            athlete = self.client.get(f"/api/users/{self.athlete.id}/").data
+            coach = self.client.get(f"/api/users/{self.coach.id}/").data
+            self.assertEqual(
+                athlete["workout_count"],
+                len(self.get_ids(user, athlete["workouts_url"])),
+            )
+            self.assertEqual(
+                athlete["coach_file_count"],
+                len(self.get_ids(user, athlete["coach_files_url"])),
+            )
+            self.assertEqual(
+                coach["athlete_file_count"],
+                len(self.get_ids(user, coach["athlete_files_url"])),
+            )
+
+    def test_files_are_limited_to_athlete_and_owner(self):
+        coach_files = f"/api/users/{self.athlete.id}/coach-files/"
+        athlete_files = f"/api/users/{self.coach.id}/athlete-files/"
+        for user in [self.athlete, self.coach]:
+            self.assertEqual(self.get_ids(user, coach_files), [self.file.id])
+            self.assertEqual(self.get_ids(user, athlete_files), [self.file.id])
+        self.assertEqual(self.get_ids(self.other, coach_files), [])
+        self.assertEqual(self.get_ids(self.other, athlete_files), [])
+
+    def test_anonymous_users_are_rejected(self):
+        for path in ["athletes", "workouts", "coach-files", "athlete-files"]:
+            response = self.client.get(f"/api/users/{self.athlete.id}/{path}/")
+            self.assertEqual(response.status_code, 401)
+
+    def test_user_links_to_sub_resources(self):
+        self.client.force_authenticate(user=self.coach)
+        response = self.client.get(f"/api/users/{self.athlete.id}/")
+        self.assertEqual(response.data["workout_count"], 2)
+        self.assertEqual(response.data["coach_file_count"], 1)
+        self.assertTrue(
+            response.data["workouts_url"].endswith(f"/api/users/{self.athlete.id}/workouts/")
+        )
+        self.assertNotIn("workouts", response.data)
+
+        self.client.force_authenticate(user=None)
+        response = self.client.post(
+            "/api/users/",
+            {
+                "email": "new@secfit.no",
+                "username": "newuser",
+                "password": "Unusual-passphrase-42",
+                "password1": "Unusual-passphrase-42",
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        for field in ["athletes", "workouts", "coach_files", "athlete_files"]:
+            self.assertNotIn(field, response.data)
+
+
+class UserStatsTestCase(TestCase):
+    """The training volume statistics sum the rollups in the requested range, counting
+    only the visibilities the requesting user may see.
+    """
+
+    def setUp(self):
+        self.coach = get_user_model().objects.create(username="coach", email="coach@secfit.no")
+        self.athlete = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no", coach=self.coach
+        )
+        self.other = get_user_model().objects.create(username="other", email="other@secfit.no")
+        self.push_up = Exercise.objects.create(name="Push-up", description="", unit="reps")
+        self.squat = Exercise.objects.create(name="Squat", description="", unit="reps")
+        self.week = timezone.localdate() - timedelta(days=timezone.localdate().weekday())
+        for exercise in [self.push_up, self.squat]:
+            for visibility, volume in [
+                (Workout.PUBLIC, 10),
+                (Workout.COACH, 20),
+                (Workout.PRIVATE, 40),
+            ]:
+                for period, start in [
+                    (VolumeRollup.DAY, self.week),
+                    (VolumeRollup.WEEK, self.week),
+                    (VolumeRollup.WEEK, self.week - timedelta(weeks=20)),
+                ]:
+                    VolumeRollup.objects.create(
+                        owner=self.athlete,
+                        exercise=exercise,
+                        period=period,
+                        start=start,
+                        visibility=visibility,
+                        sets=1,
+                        volume=volume,
+                        instance_count=1,
+                    )
+        self.client = APIClient()
+        self.url = f"/api/users/{self.athlete.id}/stats/"
+
+    def get_stats(self, user, **params):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_volume_is_limited_to_visible_workouts(self):
+        for user, volume in [(self.athlete, 70), (self.coach, 30), (self.other, 10)]:
+            stats = self.get_stats(user, exercise=self.push_up.id)
+            self.assertEqual(stats["period"], "week")
+            # The week 20 weeks ago is outside the default range
+            (row,) = stats["results"]
+            self.assertEqual(row["start"], self.week)
+            self.assertEqual(row["exercise_name"], "Push-up")
+            self.assertEqual(row["volume"], volume)
+
+    def test_period_and_range(self):
+        stats = self.get_stats(self.athlete, period="day")
+        self.assertEqual(
+            [row["exercise_name"] for row in stats["results"]], ["Push-up", "Squat"]
+        )
+
+        start = self.week - timedelta(weeks=30)
+        stats = self.get_stats(self.athlete, **{"from": start, "to": self.week})
+        self.assertEqual(len(stats["results"]), 4)
+        self.assertEqual(stats["results"][0]["start"], self.week - timedelta(weeks=20))
+
+    def test_invalid_query(self):
+        self.client.force_authenticate(user=self.athlete)
+        response = self.client.get(
+            self.url, {"from": self.week, "to": self.week - timedelta(days=1)}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {"period": "year"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/users/0/stats/")
+        self.assertEqual(response.status_code, 404)
+
+
+class UserRecordListTestCase(TestCase):
+    """Users list their own personal records by exercise name, and nobody else's."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="athlete", email="athlete@secfit.no")
+        self.other = get_user_model().objects.create(username="other", email="other@secfit.no")
+        now = timezone.now()
+        for name, number in [("Squat", 8), ("Push-up", 20)]:
+            exercise = Exercise.objects.create(name=name, description="", unit="reps")
+            PersonalRecord.objects.create(
+                owner=self.user,
+                exercise=exercise,
+                best_number=number,
+                best_number_date=now,
+                best_volume=number * 3,
+                best_volume_date=now,
+            )
+        self.client = APIClient()
+        self.url = f"/api/users/{self.user.id}/records/"
+
+    def test_own_records(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [
+                (record["exercise_name"], record["best_number"], record["best_volume"])
+                for record in response.data["results"]
+            ],
+            [("Push-up", 20, 60), ("Squat", 8, 24)],
+        )
+
+    def test_other_users_records_are_forbidden(self):
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
@@ -3,7 +3,6 @@ from users import views
 from rest_framework.urlpatterns import format_suffix_patterns
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
-    TokenRefreshView,
 )
 
 urlpatterns = [
@@ -12,6 +11,20 @@ urlpatterns = [
     path("api/users/password-reset/", views.ResetPasswordEmailRequest.as_view(), name="reset-password"),
     path("api/users/verify/", views.VerifyEmail.as_view(), name="verify-email"),
     path("api/users/<int:pk>/", views.UserDetail.as_view(), name="user-detail"),
+    path("api/users/<int:pk>/athletes/", views.UserAthleteList.as_view(), name="user-athletes"),
+    path("api/users/<int:pk>/workouts/", views.UserWorkoutList.as_view(), name="user-workouts"),
+    path("api/users/<int:pk>/stats/", views.UserStats.as_view(), name="user-stats"),
+    path("api/users/<int:pk>/records/", views.UserRecordList.as_view(), name="user-records"),
+    path(
+        "api/users/<int:pk>/coach-files/",
+        views.UserCoachFileList.as_view(),
+        name="user-coach-files",
+    ),
+    path(
+        "api/users/<int:pk>/athlete-files/",
+        views.UserAthleteFileList.as_view(),
+        name="user-athlete-files",
+    ),
     path("api/users/two_factor/totp_uri/",
          views.TotpURI.as_view(), name="totp-uri"),
     path("api/users/two_factor/enable/",
@@ -20,6 +33,7 @@ urlpatterns = [
          views.LoginWithTOTP.as_view(), name="login-2fa"),
     path("api/users/<str:username>/",
          views.UserDetail.as_view(), name="user-detail"),
+    path("api/coach/dashboard/", views.CoachDashboard.as_view(), name="coach-dashboard"),
     path("api/offers/", views.OfferList.as_view(), name="offer-list"),
     path("api/offers/<int:pk>/", views.OfferDetail.as_view(), name="offer-detail"),
     path(
@@ -31,7 +45,7 @@ urlpatterns = [
         name="athletefile-detail",
     ),
     path("api/token/", views.LoginView.as_view(), name="token_obtain_pair"),
-    path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("api/token/refresh/", views.RefreshView.as_view(), name="token_refresh"),
     path("api/remember_me/", views.RememberMe.as_view(), name="remember_me"),
     path("media/users/<int:athlete_id>/<str:filename>", views.AthleteFileResponse.as_view(), name="media_athlete_file")
 ]
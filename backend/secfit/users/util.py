@@ -1,22 +1,37 @@
-from rest_framework_simplejwt.tokens import Token, BlacklistMixin
+from rest_framework_simplejwt.tokens import Token, RefreshToken
 from rest_framework_simplejwt.settings import api_settings
 from django.core.mail import send_mail
+from django.contrib.auth import get_user_model
 from django.contrib.sites.shortcuts import get_current_site
 from django.urls import reverse
 from datetime import timedelta
 import qrcode
 import pyotp
+from tasks.queue import task
+from .blacklist import CachedBlacklistMixin
 
 
 def send_email_verification_mail(user, request):
+    """Enqueues the email with a link for verifying the user's email address."""
+    deliver_email_verification_mail.delay(user.pk, _get_base_url(request))
+
+def send_reset_password_mail(user, request):
+    """Enqueues the email with a link for resetting the user's password."""
+    deliver_reset_password_mail.delay(user.pk, _get_base_url(request))
+
+@task()
+def deliver_email_verification_mail(user_id, base_url):
+    user = get_user_model().objects.get(pk=user_id)
     token = EmailVerificationToken.for_user(user)
-    url = _get_base_url(request) + '/verify-email.html?token=' + str(token)
+    url = base_url + '/verify-email.html?token=' + str(token)
     mail_body = "Hi, " + user.username + "! Click the link below to verify your email \n\n"+ url
     return send_mail('Verify your email', mail_body, None, [user.email], fail_silently=False)
 
-def send_reset_password_mail(user, request):
+@task()
+def deliver_reset_password_mail(user_id, base_url):
+    user = get_user_model().objects.get(pk=user_id)
     token = ResetPasswordToken.for_user(user)
-    url = _get_base_url(request) + '/change-password.html?token=' + str(token)
+    url = base_url + '/change-password.html?token=' + str(token)
     mail_body = ("Hi, " + user.username + "!\n Use the link below to change your password \n\n"+ url + 
                 "\n\nIf you did not request to reset your password, please disregard this email")
     return send_mail('Reset your password', mail_body, None, [user.email], fail_silently=False)
@@ -28,7 +43,7 @@ def _get_base_url(request):
     return _get_protocol(request) + get_current_site(request).domain
 
 
-class EmailVerificationToken(BlacklistMixin, Token):
+class EmailVerificationToken(CachedBlacklistMixin, Token):
     token_type = 'email_verification'
     lifetime = timedelta(hours=1)
     no_copy_claims = (
@@ -43,7 +58,7 @@ class EmailVerificationToken(BlacklistMixin, Token):
         'jti',
     )
 
-class ResetPasswordToken(BlacklistMixin, Token):
+class ResetPasswordToken(CachedBlacklistMixin, Token):
     token_type = 'reset_password'
     lifetime = timedelta(minutes=20)
     no_copy_claims = (
@@ -81,7 +96,7 @@ def generateSecret():
     return pyotp.random_base32()
 
 
-class TOTPVerificationToken(BlacklistMixin, Token):
+class TOTPVerificationToken(CachedBlacklistMixin, Token):
     token_type = 'TOTP_verification'
     lifetime = timedelta(minutes=5)
     no_copy_claims = (
@@ -95,3 +110,7 @@ class TOTPVerificationToken(BlacklistMixin, Token):
         api_settings.JTI_CLAIM,
         'jti',
     )
+
+
+class CachedRefreshToken(CachedBlacklistMixin, RefreshToken):
+    """RefreshToken whose blacklist check goes through the in-process Bloom filter."""
@@ -1,6 +1,6 @@
 import django
 from rest_framework import mixins, generics, status, views
-from workouts.mixins import CreateListModelMixin
+from workouts.mixins import CreateListModelMixin, MediaFileResponseMixin
 from rest_framework import permissions
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenViewBase
@@ -18,6 +18,11 @@ from users.serializers import (
     ResetPasswordEmailRequestSerializer,
     SetNewPasswordSerializer,
     LoginWithTOTPSerializer,
+    RefreshSerializer,
+    UserStatsQuerySerializer,
+    CoachDashboardAthleteSerializer,
+    CoachDashboardFormerAthleteSerializer,
+    CoachDashboardOfferSerializer,
 )
 from rest_framework.permissions import (
     AllowAny,
@@ -27,8 +32,12 @@ from rest_framework.permissions import (
 )
 
 from users.models import Offer, AthleteFile
+from workouts.models import Workout, VolumeRollup, PersonalRecord
+from workouts.serializers import WorkoutSerializer, PersonalRecordSerializer
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Q, Sum
+from rest_framework.reverse import reverse
+from rest_framework.exceptions import PermissionDenied
 from django.shortcuts import get_object_or_404
 from django.conf import settings
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -74,7 +83,7 @@ class UserList(mixins.ListModelMixin, generics.GenericAPIView):
             if status and status == "current":
                 qs = get_user_model().objects.filter(pk=self.request.user.pk)
 
-        return qs
+        return UserGetSerializer.setup_eager_loading(qs, self.request.user)
 
 
 class UserDetail(
@@ -85,10 +94,14 @@ class UserDetail(
 ):
     lookup_field_options = ["pk", "username"]
     serializer_class = UserSerializer
-    queryset = get_user_model().objects.all()
     permission_classes = [permissions.IsAuthenticated &
                           (IsCurrentUser | IsReadOnly)]
 
+    def get_queryset(self):
+        return UserGetSerializer.setup_eager_loading(
+            get_user_model().objects.all(), self.request.user
+        )
+
     def get_object(self):
         for field in self.lookup_field_options:
             if field in self.kwargs:
@@ -182,6 +195,217 @@ class OfferDetail(
         return []
 
 
+class UserAthleteList(mixins.ListModelMixin, generics.GenericAPIView):
+    """Class defining the web response for the paginated list of a user's athletes.
+
+    HTTP methods: GET
+    """
+
+    serializer_class = UserGetSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return UserGetSerializer.setup_eager_loading(
+            get_user_model().objects.filter(coach_id=self.kwargs["pk"]).order_by("id"),
+            self.request.user,
+        )
+
+
+class UserWorkoutList(mixins.ListModelMixin, generics.GenericAPIView):
+    """Class defining the web response for the paginated list of a user's workouts,
+    limited to the ones visible to the requesting user.
+
+    HTTP methods: GET
+    """
+
+    serializer_class = WorkoutSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return WorkoutSerializer.setup_eager_loading(
+            Workout.objects.visible_to(self.request.user).filter(owner_id=self.kwargs["pk"])
+        )
+
+
+class UserCoachFileList(mixins.ListModelMixin, generics.GenericAPIView):
+    """Class defining the web response for the paginated list of the files coaches have
+    uploaded for a user, limited to files the requesting user is the athlete or owner of.
+
+    HTTP methods: GET
+    """
+
+    serializer_class = AthleteFileSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    related_field = "athlete_id"
+
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return (
+            AthleteFile.objects.filter(**{self.related_field: self.kwargs["pk"]})
+            .filter(Q(athlete=self.request.user) | Q(owner=self.request.user))
+            .select_related("owner")
+            .order_by("id")
+        )
+
+
+class UserAthleteFileList(UserCoachFileList):
+    """Class defining the web response for the paginated list of the files a user has
+    uploaded for their athletes, limited to files the requesting user is the athlete or
+    owner of.
+
+    HTTP methods: GET
+    """
+
+    related_field = "owner_id"
+
+
+class UserStats(generics.GenericAPIView):
+    """Class defining the web response for a user's training volume per exercise and day
+    or week, read from the VolumeRollup tables.
+
+    Query parameters: period (day or week, default week), from and to (dates, default the
+    last 12 weeks) and exercise (id). Only volume from workouts the requesting user may
+    see is counted: all of them for the user, public and coach workouts for their coach,
+    and public workouts for everyone else.
+
+    HTTP methods: GET
+    """
+
+    serializer_class = UserStatsQuerySerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        query = self.get_serializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        user = get_object_or_404(get_user_model(), pk=pk)
+
+        if user == request.user:
+            visibilities = [Workout.PUBLIC, Workout.COACH, Workout.PRIVATE]
+        elif user.is_coached_by(request.user):
+            visibilities = [Workout.PUBLIC, Workout.COACH]
+        else:
+            visibilities = [Workout.PUBLIC]
+
+        rollups = VolumeRollup.objects.filter(
+            owner=user,
+            period=VolumeRollup.DAY if params["period"] == "day" else VolumeRollup.WEEK,
+            start__range=(params["from"], params["to"]),
+            visibility__in=visibilities,
+        )
+        if "exercise" in params:
+            rollups = rollups.filter(exercise_id=params["exercise"])
+        rows = (
+            rollups.values("start", "exercise", "exercise__name")
+            .annotate(
+                total_sets=Sum("sets"),
+                total_volume=Sum("volume"),
+                total_instances=Sum("instance_count"),
+            )
+            .order_by("start", "exercise")
+        )
+
+        return Response(
+            {
+                "period": params["period"],
+                "from": params["from"],
+                "to": params["to"],
+                "results": [
+                    {
+                        "start": row["start"],
+                        "exercise": reverse(
+                            "exercise-detail",
+                            kwargs={"pk": row["exercise"]},
+                            request=request,
+                        ),
+                        "exercise_name": row["exercise__name"],
+                        "sets": row["total_sets"],
+                        "volume": row["total_volume"],
+                        "instance_count": row["total_instances"],
+                    }
+                    for row in rows
+                ],
+            }
+        )
+
+
+class UserRecordList(mixins.ListModelMixin, generics.GenericAPIView):
+    """Class defining the web response for the paginated list of a user's personal records.
+    Records are computed from private workouts too, so users can only list their own.
+
+    HTTP methods: GET
+    """
+
+    serializer_class = PersonalRecordSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if self.kwargs["pk"] != request.user.pk:
+            raise PermissionDenied()
+        return self.list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return (
+            PersonalRecord.objects.filter(owner_id=self.kwargs["pk"])
+            .select_related("exercise")
+            .order_by("exercise__name")
+        )
+
+
+class CoachDashboard(generics.GenericAPIView):
+    """Class defining the web response for the dashboard of a coach: a summary of every
+    athlete with their last workout, this week's training volume and the files the coach
+    uploaded for them, the files the coach uploaded for former athletes, and the coach's
+    pending offers. The whole dashboard costs a fixed number of queries.
+
+    HTTP methods: GET
+    """
+
+    serializer_class = CoachDashboardAthleteSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        coach = request.user
+        athletes = CoachDashboardAthleteSerializer.setup_eager_loading(
+            get_user_model().objects.filter(coach=coach).order_by("username"), coach
+        )
+        former_athletes = CoachDashboardFormerAthleteSerializer.setup_eager_loading(
+            get_user_model()
+            .objects.filter(coach_files__owner=coach)
+            .exclude(coach=coach)
+            .distinct()
+            .order_by("username"),
+            coach,
+        )
+        offers = (
+            Offer.objects.filter(owner=coach, status=Offer.PENDING)
+            .select_related("recipient")
+            .order_by("-timestamp")
+        )
+        context = self.get_serializer_context()
+        return Response(
+            {
+                "athletes": CoachDashboardAthleteSerializer(
+                    athletes, many=True, context=context
+                ).data,
+                "former_athletes": CoachDashboardFormerAthleteSerializer(
+                    former_athletes, many=True, context=context
+                ).data,
+                "pending_offers": CoachDashboardOfferSerializer(
+                    offers, many=True, context=context
+                ).data,
+            }
+        )
+
+
 class AthleteFileList(
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
@@ -230,15 +454,14 @@ class AthleteFileDetail(
         return self.destroy(request, *args, **kwargs)
 
 class AthleteFileResponse(
+    MediaFileResponseMixin,
     views.APIView
 ):
     permission_classes = [permissions.IsAuthenticated & (IsAthlete | IsOwner | IsCoach)]
 
     def get(self, request, *args, **kwargs):
         obj = self.get_object()
-        
-        path = f'{settings.MEDIA_ROOT}/{obj.file}'
-        return FileResponse(open(path, 'rb'))
+        return self.file_response(request, obj)
 
     
     def get_object(self):
@@ -317,6 +540,14 @@ class LoginView(TokenViewBase):
     serializer_class = LoginSerializer
 
 
+class RefreshView(TokenViewBase):
+    """
+    Takes a refresh type JSON web token and returns an access type JSON web
+    token if the refresh token is valid and not blacklisted.
+    """
+    serializer_class = RefreshSerializer
+
+
 class SetNewPassword(generics.GenericAPIView):
 
     serializer_class = SetNewPasswordSerializer
@@ -3,9 +3,10 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Exercise, ExerciseInstance, Workout, WorkoutFile
+from .models import Exercise, ExerciseInstance, Workout, WorkoutFile, WorkoutFileThumbnail
 
 admin.site.register(Exercise)
 admin.site.register(ExerciseInstance)
 admin.site.register(Workout)
 admin.site.register(WorkoutFile)
+admin.site.register(WorkoutFileThumbnail)
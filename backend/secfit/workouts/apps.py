@@ -11,3 +11,6 @@ class WorkoutsConfig(AppConfig):
     """
 
     name = "workouts"
+
+    def ready(self):
+        from . import signals  # noqa: F401
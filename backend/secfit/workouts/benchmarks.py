@@ -0,0 +1,107 @@
+"""Seeds the synthetic users, exercises and workouts of the benchmark management commands.
+
+The commands seed inside a transaction that they roll back, so the rows never outlive a
+run. Seeded users have usernames starting with "benchmark" and emails in the .invalid
+top-level domain.
+"""
+import random
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from workouts.models import Exercise, ExerciseInstance, Workout, WorkoutFile
+
+
+def seed_user(role):
+    """Creates and returns a single user named after its role, e.g. benchmark-coach."""
+    return get_user_model().objects.create(
+        username=f"benchmark-{role}", email=f"benchmark-{role}@secfit.invalid"
+    )
+
+
+def seed_users(count, coach=None):
+    """Creates count users, coached by the given coach if any. Returns them by id."""
+    User = get_user_model()
+    User.objects.bulk_create(
+        (
+            User(
+                username=f"benchmark-user-{i}",
+                email=f"benchmark-user-{i}@secfit.invalid",
+                coach=coach,
+            )
+            for i in range(count)
+        ),
+        batch_size=10000,
+    )
+    return list(User.objects.filter(username__startswith="benchmark-user-").order_by("pk"))
+
+
+def seed_exercises(count, description=""):
+    """Creates count exercises counted in reps. Returns them."""
+    return [
+        Exercise.objects.create(name=f"Exercise {i}", description=description, unit="reps")
+        for i in range(count)
+    ]
+
+
+def seed_workouts(
+    owners,
+    count,
+    exercises=(),
+    instances=0,
+    files=0,
+    notes="",
+    visibilities=(Workout.PUBLIC,),
+):
+    """Creates count workouts, a minute apart, each owned by a random one of owners and
+    given a random one of visibilities.
+
+    Each workout gets instances exercise instances, cycling through exercises, and files
+    workout files that only exist as names.
+
+    Returns:
+        QuerySet: The workouts of the owners
+    """
+    owner_ids = [owner.pk for owner in owners]
+    now = timezone.now()
+    Workout.objects.bulk_create(
+        (
+            Workout(
+                name=f"Workout {i}",
+                date=now - timedelta(minutes=i),
+                notes=notes,
+                owner_id=random.choice(owner_ids),
+                visibility=random.choice(visibilities),
+            )
+            for i in range(count)
+        ),
+        batch_size=10000,
+    )
+    workouts = Workout.objects.filter(owner_id__in=owner_ids)
+    if instances:
+        ExerciseInstance.objects.bulk_create(
+            (
+                ExerciseInstance(
+                    workout=workout,
+                    exercise=exercises[i % len(exercises)],
+                    sets=3,
+                    number=10,
+                )
+                for workout in workouts
+                for i in range(instances)
+            ),
+            batch_size=5000,
+        )
+    if files:
+        WorkoutFile.objects.bulk_create(
+            (
+                WorkoutFile(
+                    workout=workout,
+                    owner_id=workout.owner_id,
+                    file=f"workouts/{workout.id}/{i}.jpg",
+                )
+                for workout in workouts
+                for i in range(files)
+            ),
+            batch_size=5000,
+        )
+    return workouts
@@ -0,0 +1,57 @@
+"""Versioning of the cached exercise catalog.
+
+The catalog version is a counter in the shared cache that is bumped whenever an Exercise
+is saved or deleted. Cached catalogs and their ETags are keyed by the version, so bumping
+it invalidates them in every process at once.
+
+A process-local cache cannot carry the version to the other processes, so with one the
+catalog is not cached and is instead identified by a hash of its content.
+"""
+import hashlib
+import json
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from secfit.caches import bump_version, get_version, is_shared_cache
+
+VERSION_KEY = "exercise-catalog-version"
+
+# Seconds a rendered catalog is kept, as a bound on memory rather than for freshness
+CATALOG_TIMEOUT = 60 * 60 * 24
+
+
+def get_catalog_version():
+    """Returns the current catalog version, creating it if the cache has none, or None if
+    the cache is not shared by every process.
+    """
+    if not is_shared_cache():
+        return None
+    return get_version("default", VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalidates every cached catalog by moving to the next version."""
+    bump_version("default", VERSION_KEY)
+
+
+def get_cached_catalog(version, base_url, build):
+    """Returns the catalog of the given version, building and caching it on a miss.
+
+    Args:
+        version: Catalog version from get_catalog_version()
+        base_url: Scheme and host the catalog's hyperlinks are built for
+        build: Function returning the serialized catalog
+    """
+    key = f"exercise-catalog:{version}:{base_url}"
+    catalog = cache.get(key)
+    if catalog is None:
+        catalog = build()
+        cache.set(key, catalog, CATALOG_TIMEOUT)
+    return catalog
+
+
+def get_catalog_digest(catalog):
+    """Returns a hash of a serialized catalog, which versions it when the cache is not
+    shared.
+    """
+    content = json.dumps(catalog, cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
@@ -0,0 +1,157 @@
+"""Caching of the first page of each user's workout feed.
+
+A cached page is keyed by the user, the ordering, and two versions kept in the feed
+cache: the version of the user's own feed, and the version of the public feed shared by
+every user. The signal receivers in workouts.signals bump exactly the versions whose
+feeds a change shows up in: the owner's, the owner's coach's for coach workouts, and the
+public one for public workouts. Versions are bumped once the change is committed, so a
+page read before the commit is never stored under the new version.
+
+Pages are cached until they are invalidated when the feed cache is shared by every
+process. A process-local cache is only used when a single web process serves every
+request, since a change would only invalidate the pages of the process that made it.
+Pages are then kept for LOCAL_FEED_TIMEOUT, which bounds how long changes made by other
+processes, such as management commands, take to show up. With several web processes and
+a process-local cache, feeds are built for every request and nothing is invalidated.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from secfit import metrics
+from secfit.caches import bump_version, get_versions, is_shared_cache
+from workouts.models import Workout
+
+# Alias of the feed cache in settings.CACHES
+FEED_CACHE = "feed"
+
+PUBLIC_VERSION_KEY = "workout-feed-version:public"
+
+# Default of invalidate_workout_feeds() for a coach that is not known yet
+UNKNOWN = object()
+
+# Seconds a page is kept in a shared cache, as a bound on memory rather than for freshness
+FEED_TIMEOUT = 60 * 5
+
+# Seconds a page is kept in a process-local cache, as a bound on the staleness of changes
+# made outside the web process
+LOCAL_FEED_TIMEOUT = 30
+
+
+def _cache():
+    return caches[FEED_CACHE]
+
+
+def is_feed_cached():
+    """Returns whether feed pages are cached, which needs a shared feed cache or a single
+    web process.
+    """
+    return is_shared_cache(FEED_CACHE) or settings.WEB_CONCURRENCY == 1
+
+
+def get_feed_timeout():
+    """Returns the seconds a page is kept in the feed cache."""
+    return FEED_TIMEOUT if is_shared_cache(FEED_CACHE) else LOCAL_FEED_TIMEOUT
+
+
+def _user_version_key(user_id):
+    return f"workout-feed-version:user:{user_id}"
+
+
+def get_feed_versions(user_id):
+    """Returns the public and the user's feed version, creating them if missing."""
+    return get_versions(FEED_CACHE, [PUBLIC_VERSION_KEY, _user_version_key(user_id)])
+
+
+def invalidate_feeds(user_ids=(), public=False):
+    """Invalidates the cached feeds of the given users, and of every user if public is
+    set, once the current transaction commits.
+
+    Args:
+        user_ids: Ids of the users whose feeds changed. None entries are ignored
+        public: Whether a public workout changed
+    """
+    if not is_feed_cached():
+        return
+    keys = {_user_version_key(user_id) for user_id in user_ids if user_id is not None}
+    if public:
+        keys.add(PUBLIC_VERSION_KEY)
+
+    def bump():
+        for key in keys:
+            bump_version(FEED_CACHE, key)
+
+    if keys:
+        transaction.on_commit(bump)
+
+
+def invalidate_workout_feeds(owner_id, visibilities, coach_id=UNKNOWN):
+    """Invalidates the feeds a workout of the given owner and visibilities shows up in.
+
+    Args:
+        owner_id: Id of the workout's owner
+        visibilities: Visibilities the workout had before and after the change
+        coach_id: Id of the owner's coach or None, looked up if needed and not given
+    """
+    user_ids = [owner_id]
+    if Workout.COACH in visibilities:
+        if coach_id is UNKNOWN:
+            coach_id = (
+                get_user_model()
+                .objects.filter(pk=owner_id)
+                .values_list("coach_id", flat=True)
+                .first()
+            )
+        user_ids.append(coach_id)
+    invalidate_feeds(user_ids, public=Workout.PUBLIC in visibilities)
+
+
+def invalidate_feeds_of_workouts(workout_ids=(), workout_file_ids=()):
+    """Invalidates the feeds showing the given workouts, or the workouts of the given
+    files, once the current transaction commits.
+
+    The workouts are looked up at the commit rather than now, so the signal receivers
+    calling this cost no query while the change is written. Workouts deleted by then
+    need no invalidation of their own, their deletion has one.
+    """
+    if not is_feed_cached():
+        return
+    workout_ids = list(workout_ids)
+    workout_file_ids = list(workout_file_ids)
+
+    def invalidate():
+        workouts = (
+            Workout.objects.filter(Q(pk__in=workout_ids) | Q(files__in=workout_file_ids))
+            .values("owner_id", "owner__coach_id", "visibility")
+            .distinct()
+        )
+        for workout in workouts:
+            invalidate_workout_feeds(
+                workout["owner_id"], {workout["visibility"]}, workout["owner__coach_id"]
+            )
+
+    transaction.on_commit(invalidate)
+
+
+def get_cached_feed(user_id, ordering, base_url, build):
+    """Returns the first feed page of a user, building and caching it on a miss.
+
+    Args:
+        user_id: Id of the user the feed is for
+        ordering: Value of the ordering query parameter, "" for the default ordering
+        base_url: Scheme and host the page's hyperlinks are built for
+        build: Function returning the serialized page
+    """
+    if not is_feed_cached():
+        return build()
+    public_version, user_version = get_feed_versions(user_id)
+    key = f"workout-feed:{user_id}:{public_version}:{user_version}:{ordering}:{base_url}"
+    page = _cache().get(key)
+    if page is None:
+        metrics.FEED_CACHE.labels(result="miss").inc()
+        page = build()
+        _cache().set(key, page, get_feed_timeout())
+    else:
+        metrics.FEED_CACHE.labels(result="hit").inc()
+    return page
@@ -0,0 +1,57 @@
+"""Keeps the tables derived from exercise instances up to date.
+
+Writers take a snapshot of the exercise instances they are about to change, make the
+change, take a snapshot of the result, and pass both to apply_exercise_instance_change().
+The workout bulk writes send no signals, so this is called explicitly from the serializers
+and views that write exercise instances.
+"""
+from collections import namedtuple
+from workouts.records import update_personal_records
+from workouts.rollups import apply_volume_change
+
+# What the derived tables need to know about one exercise instance
+ExerciseInstanceState = namedtuple(
+    "ExerciseInstanceState",
+    ["owner_id", "date", "visibility", "exercise_id", "sets", "number"],
+)
+
+
+def snapshot(workout, exercise_instances):
+    """Returns the state of the given exercise instances of a workout.
+
+    The state is copied, so it stays valid when the instances or the workout are
+    changed afterwards.
+    """
+    return [
+        ExerciseInstanceState(
+            workout.owner_id,
+            workout.date,
+            workout.visibility,
+            exercise_instance.exercise_id,
+            exercise_instance.sets,
+            exercise_instance.number,
+        )
+        for exercise_instance in exercise_instances
+    ]
+
+
+def snapshot_instances(exercise_instances):
+    """Returns the state of exercise instances that may belong to different workouts."""
+    return [
+        state
+        for exercise_instance in exercise_instances
+        for state in snapshot(exercise_instance.workout, [exercise_instance])
+    ]
+
+
+def apply_exercise_instance_change(before, after):
+    """Updates the volume rollups and personal records for a change of exercise instances.
+
+    Must be called inside a transaction.
+
+    Args:
+        before (list): Snapshot of the changed exercise instances before the write
+        after (list): Snapshot of the same exercise instances after the write
+    """
+    apply_volume_change(before, after)
+    update_personal_records(before, after)
@@ -0,0 +1,23 @@
+"""Management command computing the personal records from the existing workout history
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from workouts.records import rebuild_personal_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Replaces every personal record with one computed from all exercise instances. "
+        "Run it once after migrating, and after exercise instances were changed outside "
+        "the API, such as in the admin; otherwise the records are maintained incrementally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=2000, help="Rows read and written at a time"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_personal_records(options["batch_size"])
+        self.stdout.write(f"Wrote {count} personal records")
@@ -0,0 +1,57 @@
+"""Management command measuring the bytes saved by compressing typical API responses
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIClient
+from workouts.benchmarks import seed_exercises, seed_user, seed_workouts
+
+ENCODINGS = ["identity", "gzip", "br"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a user with workouts inside a transaction that is rolled back, and reports "
+        "the size of typical API responses per content coding."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workouts", type=int, default=200)
+        parser.add_argument("--instances", type=int, default=5, help="Per workout")
+        parser.add_argument("--exercises", type=int, default=100)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = seed_user("athlete")
+            seed_workouts(
+                [user],
+                options["workouts"],
+                exercises=seed_exercises(
+                    options["exercises"],
+                    description="Keep your back straight and breathe out on the way up",
+                ),
+                instances=options["instances"],
+                notes="Warm up, then intervals, finish with stretching",
+            )
+            client = APIClient(SERVER_NAME="localhost")
+            client.force_authenticate(user=user)
+            for url in [
+                "/api/workouts/",
+                "/api/exercises/?catalog=full",
+                f"/api/users/{user.id}/",
+            ]:
+                sizes = {}
+                for encoding in ENCODINGS:
+                    response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+                    assert response.status_code == 200, response.status_code
+                    sizes[response.get("Content-Encoding", "identity")] = len(
+                        response.content
+                    )
+                self.stdout.write(
+                    f"{url}: "
+                    + ", ".join(
+                        f"{response_encoding} {size} bytes "
+                        f"({100 - size * 100 / sizes['identity']:.0f}% saved)"
+                        for response_encoding, size in sizes.items()
+                    )
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,66 @@
+"""Management command comparing the old and the new query plan of the workout feed
+"""
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from workouts.benchmarks import seed_users, seed_workouts
+from workouts.models import Workout
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds synthetic workouts inside a transaction that is rolled back, and compares "
+        "the plan and latency of the OR/DISTINCT feed query with the UNION feed query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workouts", type=int, default=1000000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            coach = self.seed(options["workouts"], options["users"])
+            queries = {
+                "or-distinct": lambda: Workout.objects.filter(
+                    Q(visibility="PU")
+                    | Q(owner=coach)
+                    | (Q(visibility="CO") & Q(owner__coach=coach))
+                ).distinct(),
+                "union": lambda: Workout.objects.visible_to(coach),
+            }
+            for name, queryset in queries.items():
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(queryset().order_by("-date")[:10].explain())
+                self.report("first page", options["runs"], lambda: list(queryset()[:10]))
+                self.report("count", options["runs"], lambda: queryset().count())
+            transaction.set_rollback(True)
+
+    def seed(self, workouts, users):
+        """Creates users, of which the first coaches a tenth of the others, and workouts
+        spread randomly over them. Returns the coach.
+        """
+        users = seed_users(users)
+        coach = users[0]
+        get_user_model().objects.filter(
+            pk__in=[user.pk for user in users[1 : len(users) // 10]]
+        ).update(coach=coach)
+        seed_workouts(
+            users,
+            workouts,
+            visibilities=[Workout.PUBLIC, Workout.COACH, Workout.PRIVATE],
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        return coach
+
+    def report(self, label, runs, query):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - start)
+        self.stdout.write(f"{label}: median {statistics.median(timings) * 1000:.1f} ms")
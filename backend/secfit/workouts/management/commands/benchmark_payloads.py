@@ -0,0 +1,57 @@
+"""Management command measuring the payload size and latency of endpoints with relations
+"""
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIClient
+from users.models import AthleteFile
+from workouts.benchmarks import seed_exercises, seed_user, seed_users, seed_workouts
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a user with a long history inside a transaction that is rolled back, and "
+        "reports the response size and median latency of the exercise list and user detail."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workouts", type=int, default=2000)
+        parser.add_argument("--instances", type=int, default=5, help="Per workout")
+        parser.add_argument("--athletes", type=int, default=50)
+        parser.add_argument("--files", type=int, default=500)
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.seed(options)
+            client = APIClient(SERVER_NAME="localhost")
+            client.force_authenticate(user=user)
+            for url in ["/api/exercises/", f"/api/users/{user.username}/"]:
+                timings = []
+                for _ in range(options["runs"]):
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    timings.append(time.perf_counter() - start)
+                    assert response.status_code == 200, response.content
+                self.stdout.write(
+                    f"{url}: {len(response.content)} bytes, "
+                    f"median {statistics.median(timings) * 1000:.1f} ms"
+                )
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        """Creates a coach with athletes, files, and workouts of exercises. Returns the coach."""
+        coach = seed_user("coach")
+        athlete = seed_users(options["athletes"], coach=coach)[0]
+        AthleteFile.objects.bulk_create(
+            AthleteFile(athlete=athlete, owner=coach, file=f"users/{athlete.id}/{i}.pdf")
+            for i in range(options["files"])
+        )
+        seed_workouts(
+            [coach],
+            options["workouts"],
+            exercises=seed_exercises(10),
+            instances=options["instances"],
+        )
+        return coach
@@ -0,0 +1,55 @@
+"""Management command comparing the encode time and size of a page of workouts per renderer
+"""
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from secfit.renderers import MessagePackRenderer, OrjsonRenderer
+from workouts.benchmarks import seed_exercises, seed_user, seed_workouts
+from workouts.serializers import WorkoutSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Serializes a page of workouts seeded inside a transaction that is rolled back, and "
+        "reports the median encode time and response size of each renderer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--instances", type=int, default=10, help="Per workout")
+        parser.add_argument("--files", type=int, default=2, help="Per workout")
+        parser.add_argument("--runs", type=int, default=50)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            workouts = seed_workouts(
+                [seed_user("athlete")],
+                options["page_size"],
+                exercises=seed_exercises(10),
+                instances=options["instances"],
+                files=options["files"],
+                notes="Warm up, then intervals – finish with stretching",
+            )
+            request = Request(
+                APIRequestFactory().get("/api/workouts/", SERVER_NAME="localhost")
+            )
+            workouts = WorkoutSerializer.setup_eager_loading(workouts)
+            data = WorkoutSerializer(
+                workouts, many=True, context={"request": request}
+            ).data
+            transaction.set_rollback(True)
+
+        for renderer in [JSONRenderer(), OrjsonRenderer(), MessagePackRenderer()]:
+            timings = []
+            for _ in range(options["runs"]):
+                start = time.perf_counter()
+                content = renderer.render(data, renderer.media_type, {})
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                f"{type(renderer).__name__}: {len(content)} bytes, "
+                f"median {statistics.median(timings) * 1000:.2f} ms"
+            )
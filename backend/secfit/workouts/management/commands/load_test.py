@@ -0,0 +1,119 @@
+"""Management command for load testing a running SecFit server
+"""
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+def child_pids(pid):
+    """Returns the pids of the direct children of a process, read from /proc."""
+    children = []
+    for tid in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{tid}/children") as file:
+            children += [int(child) for child in file.read().split()]
+    return children
+
+
+def rss_bytes(pid):
+    """Returns the resident set size of a process in bytes, read from /proc, or 0 if the
+    process has exited.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except FileNotFoundError:
+        pass
+    return 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends GET requests to a url from many concurrent clients and reports throughput "
+        "and latency. Given the pid of the gunicorn master with --server-pid, it also "
+        "samples the resident memory of every worker during the run and reports how many "
+        "concurrent clients were served per GiB. Run it against the same server in WSGI "
+        "and ASGI mode with the same concurrency to compare them at a fixed memory budget. "
+        "Memory is read from /proc, so the server must run on the same Linux host."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url")
+        parser.add_argument("--token", help="JWT access token sent as a Bearer token")
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--read-delay",
+            type=float,
+            default=0,
+            help="Seconds to wait between 64 KiB reads, to simulate slow clients",
+        )
+        parser.add_argument(
+            "--server-pid", type=int, help="Pid of the gunicorn master process"
+        )
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options["token"]:
+            headers["Authorization"] = f"Bearer {options['token']}"
+
+        worker_pids = []
+        if options["server_pid"]:
+            try:
+                worker_pids = child_pids(options["server_pid"])
+            except FileNotFoundError:
+                raise CommandError(f"No process with pid {options['server_pid']}")
+        peak_rss = {pid: rss_bytes(pid) for pid in worker_pids}
+        running = threading.Event()
+        running.set()
+
+        def sample_memory():
+            while running.is_set():
+                for pid in worker_pids:
+                    peak_rss[pid] = max(peak_rss[pid], rss_bytes(pid))
+                time.sleep(0.05)
+
+        def fetch(_):
+            start = time.perf_counter()
+            try:
+                with requests.get(
+                    options["url"], headers=headers, stream=True, timeout=120
+                ) as response:
+                    for _ in response.iter_content(64 * 1024):
+                        if options["read_delay"]:
+                            time.sleep(options["read_delay"])
+                    ok = response.ok
+            except requests.RequestException:
+                ok = False
+            return ok, time.perf_counter() - start
+
+        sampler = threading.Thread(target=sample_memory, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            results = list(executor.map(fetch, range(options["requests"])))
+        elapsed = time.perf_counter() - start
+        running.clear()
+        sampler.join()
+
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for ok, _ in results if not ok)
+        self.stdout.write(
+            f"{len(results)} requests in {elapsed:.2f} s "
+            f"({len(results) / elapsed:.1f} req/s), {errors} errors\n"
+            f"latency p50 {statistics.median(latencies) * 1000:.0f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms, "
+            f"max {latencies[-1] * 1000:.0f} ms"
+        )
+        if worker_pids:
+            total = sum(peak_rss.values())
+            self.stdout.write(
+                f"{len(worker_pids)} workers, peak RSS "
+                f"{total / len(worker_pids) / 2 ** 20:.1f} MiB per worker, "
+                f"{options['concurrency'] / (total / 2 ** 30):.0f} concurrent clients per GiB"
+            )
@@ -0,0 +1,21 @@
+# Generated by Django 3.1 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0004_delete_rememberme'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['visibility', '-date'], name='workout_visibility_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['owner', '-date'], name='workout_owner_date_idx'),
+        ),
+    ]
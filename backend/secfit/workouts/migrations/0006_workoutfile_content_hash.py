@@ -0,0 +1,35 @@
+# Generated by Django 3.1 on 2026-10-18 10:09
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_existing_files(apps, schema_editor):
+    WorkoutFile = apps.get_model("workouts", "WorkoutFile")
+    for workout_file in WorkoutFile.objects.exclude(file=""):
+        try:
+            with workout_file.file.open("rb") as file:
+                sha256 = hashlib.sha256()
+                for chunk in file.chunks():
+                    sha256.update(chunk)
+        except FileNotFoundError:
+            continue
+        workout_file.content_hash = sha256.hexdigest()
+        workout_file.save(update_fields=["content_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0005_workout_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workoutfile',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(hash_existing_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.1 on 2026-10-18 10:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import workouts.mixins
+import workouts.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0006_workoutfile_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkoutFileThumbnail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('width', models.PositiveIntegerField()),
+                ('format', models.CharField(max_length=10)),
+                ('file', models.FileField(upload_to=workouts.models.thumbnail_directory_path)),
+                ('content_hash', models.CharField(blank=True, editable=False, max_length=64)),
+                ('workout_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thumbnails', to='workouts.workoutfile')),
+            ],
+            options={
+                'ordering': ['width', 'format'],
+            },
+            bases=(workouts.mixins.ContentHashMixin, models.Model),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 3.1 on 2026-10-18 10:25
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncWeek
+import django.db.models.deletion
+
+
+def build_rollups(apps, schema_editor):
+    ExerciseInstance = apps.get_model("workouts", "ExerciseInstance")
+    VolumeRollup = apps.get_model("workouts", "VolumeRollup")
+    for period, trunc in [("d", TruncDate), ("w", TruncWeek)]:
+        rows = (
+            ExerciseInstance.objects.annotate(
+                start=trunc("workout__date", output_field=models.DateField())
+            )
+            .values("workout__owner", "start", "exercise", "workout__visibility")
+            .annotate(
+                total_sets=Sum("sets"),
+                total_volume=Sum(F("sets") * F("number")),
+                total_count=Count("id"),
+            )
+            .order_by()
+        )
+        VolumeRollup.objects.bulk_create(
+            (
+                VolumeRollup(
+                    owner_id=row["workout__owner"],
+                    period=period,
+                    start=row["start"],
+                    exercise_id=row["exercise"],
+                    visibility=row["workout__visibility"],
+                    sets=row["total_sets"],
+                    volume=row["total_volume"],
+                    instance_count=row["total_count"],
+                )
+                for row in rows.iterator()
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('workouts', '0007_workoutfilethumbnail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VolumeRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('d', 'Day'), ('w', 'Week')], max_length=1)),
+                ('start', models.DateField()),
+                ('visibility', models.CharField(choices=[('PU', 'Public'), ('CO', 'Coach'), ('PR', 'Private')], max_length=2)),
+                ('sets', models.BigIntegerField(default=0)),
+                ('volume', models.BigIntegerField(default=0)),
+                ('instance_count', models.IntegerField(default=0)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='volume_rollups', to='workouts.exercise')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='volume_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='volumerollup',
+            constraint=models.UniqueConstraint(fields=('owner', 'period', 'start', 'exercise', 'visibility'), name='volume_rollup_key'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.1 on 2026-10-18 10:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('workouts', '0008_volumerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonalRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('best_number', models.IntegerField()),
+                ('best_number_date', models.DateTimeField()),
+                ('best_volume', models.BigIntegerField()),
+                ('best_volume_date', models.DateTimeField()),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to='workouts.exercise')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='personalrecord',
+            constraint=models.UniqueConstraint(fields=('owner', 'exercise'), name='personal_record_key'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.1 on 2026-10-18 10:31
+
+from django.db import migrations
+
+# Indexed tables with their searched columns and tsvector weights
+SEARCH_FIELDS = {
+    "workouts_workout": [("name", "A"), ("notes", "B")],
+    "workouts_exercise": [("name", "A"), ("description", "B")],
+}
+
+
+def postgresql_sql(table, fields):
+    vector = " || ".join(
+        f"setweight(to_tsvector('english'::regconfig, coalesce({column}, '')), '{weight}')"
+        for column, weight in fields
+    )
+    return [f"CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} USING GIN (({vector}))"]
+
+
+def sqlite_sql(table, fields):
+    fts = f"{table}_fts"
+    columns = ", ".join(column for column, _ in fields)
+    new = ", ".join(f"new.{column}" for column, _ in fields)
+    old = ", ".join(f"old.{column}" for column, _ in fields)
+    delete = f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old});"
+    insert = f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, "
+        f"content='{table}', content_rowid='id', tokenize='porter unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} "
+        f"BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} "
+        f"BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {columns} ON {table} "
+        f"BEGIN {delete} {insert} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, fields in SEARCH_FIELDS.items():
+        if vendor == "postgresql":
+            statements = postgresql_sql(table, fields)
+        elif vendor == "sqlite":
+            statements = sqlite_sql(table, fields)
+        else:
+            statements = []
+        for statement in statements:
+            schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in SEARCH_FIELDS:
+        if vendor == "postgresql":
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_idx")
+        elif vendor == "sqlite":
+            for trigger in ["insert", "delete", "update"]:
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0009_personalrecord'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -1,6 +1,18 @@
 """
 Mixins for the workouts application
 """
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+# Single byte range, e.g. "bytes=0-499", "bytes=500-" or "bytes=-500"
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
 
 
 class CreateListModelMixin(object):
@@ -24,3 +36,163 @@ class CreateListModelMixin(object):
         if isinstance(kwargs.get("data", {}), list):
             kwargs["many"] = True
         return super(CreateListModelMixin, self).get_serializer(*args, **kwargs)
+
+
+class ContentHashMixin(object):
+    """Model mixin that keeps a SHA-256 hash of the model's `file` in `content_hash`.
+
+    The hash is computed whenever a new file is uploaded, and is used as the ETag when the
+    file is served.
+    """
+
+    def save(self, *args, **kwargs):
+        if self.file and not self.file._committed:
+            self.content_hash = file_content_hash(self.file)
+        super(ContentHashMixin, self).save(*args, **kwargs)
+
+
+def file_content_hash(file):
+    """Returns the hex SHA-256 digest of a file's content.
+
+    Args:
+        file (File): An uploaded or stored file
+
+    Returns:
+        str: Hex digest of the content
+    """
+    sha256 = hashlib.sha256()
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class MediaFileResponseMixin(object):
+    """Mixin for views that serve an uploaded file after checking permissions.
+
+    Responses carry an ETag (the stored content hash), Last-Modified and a short-lived
+    private Cache-Control header. A file may be replaced by an upload with the same name,
+    so clients revalidate with a conditional request once max-age has passed, which is
+    answered with 304 Not Modified while the file is unchanged. A single byte range may be
+    requested with the Range header, guarded by an entity tag or date in If-Range.
+
+    If settings.MEDIA_ACCEL_REDIRECT_PREFIX is set, the file is not read by Django at all.
+    The response only carries an X-Accel-Redirect header pointing to the internal nginx
+    location with that prefix, and nginx sends the file (including ranges and conditional
+    requests) itself.
+    """
+
+    cache_max_age = 60 * 5
+    range_chunk_size = 64 * 1024
+
+    def file_response(self, request, obj):
+        """Returns the response for a GET or HEAD of the file of obj.
+
+        Args:
+            request (Request): The current request
+            obj (Model): The object whose `file` is served
+
+        Returns:
+            HttpResponse: 200, 206, 304, 412 or 416 response
+        """
+        if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+            return self.accel_redirect_response(obj)
+
+        path = os.path.join(settings.MEDIA_ROOT, obj.file.name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise Http404("Media does not exist")
+        etag = f'"{obj.content_hash}"' if obj.content_hash else None
+        last_modified = int(stat.st_mtime)
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = self.range_response(
+                request, path, stat.st_size, etag, last_modified
+            )
+
+        if etag:
+            response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["Accept-Ranges"] = "bytes"
+        patch_cache_control(
+            response, private=True, max_age=self.cache_max_age, must_revalidate=True
+        )
+        return response
+
+    def accel_redirect_response(self, obj):
+        """Returns an empty response telling nginx to serve the file of obj from its internal
+        media location.
+        """
+        content_type = mimetypes.guess_type(obj.file.name)[0] or "application/octet-stream"
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(
+            obj.file.name
+        )
+        patch_cache_control(
+            response, private=True, max_age=self.cache_max_age, must_revalidate=True
+        )
+        return response
+
+    def range_response(self, request, path, size, etag, last_modified):
+        """Returns the requested byte range of the file, or the whole file if no valid range
+        was requested or the If-Range validator does not match.
+
+        A syntactically invalid range, such as one whose last byte precedes its first, is
+        ignored as RFC 7233 requires. Only a valid range starting beyond the end of the file
+        is answered with 416 Range Not Satisfiable.
+        """
+        match = RANGE_PATTERN.match(request.META.get("HTTP_RANGE", "").strip())
+        if (
+            not match
+            or not any(match.groups())
+            or not self.if_range_matches(request, etag, last_modified)
+        ):
+            return FileResponse(open(path, "rb"))
+
+        first, last = match.groups()
+        if first and last and int(first) > int(last):
+            return FileResponse(open(path, "rb"))
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start = max(size - int(last), 0)
+            end = size - 1
+        if start > end:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        response = StreamingHttpResponse(
+            self.read_range(path, start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return response
+
+    def if_range_matches(self, request, etag, last_modified):
+        """Returns whether the If-Range header is absent or names the current file, either
+        by its entity tag or by its exact Last-Modified date. Weak entity tags never match.
+        """
+        if_range = request.META.get("HTTP_IF_RANGE", "").strip()
+        if not if_range:
+            return True
+        if if_range.startswith(('"', "W/")):
+            return etag is not None and if_range == etag
+        return parse_http_date_safe(if_range) == last_modified
+
+    def read_range(self, path, start, length):
+        with open(path, "rb") as file:
+            file.seek(start)
+            while length > 0:
+                chunk = file.read(min(self.range_chunk_size, length))
+                if not chunk:
+                    break
+                length -= len(chunk)
+                yield chunk
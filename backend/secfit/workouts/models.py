@@ -7,6 +7,8 @@ from django.db import models
 from django.core.files.storage import FileSystemStorage
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from .mixins import ContentHashMixin
+from .thumbnails import create_thumbnails
 from .validators import ImageValidator
 
 
@@ -26,6 +28,39 @@ class OverwriteStorage(FileSystemStorage):
             os.remove(os.path.join(settings.MEDIA_ROOT, name))
 
 
+class WorkoutQuerySet(models.QuerySet):
+    """QuerySet for workouts with the visibility rules used by the feed."""
+
+    def visible_to(self, user):
+        """Returns the workouts the given user is allowed to see.
+
+        A workout is visible to a user if any of the following hold:
+        - The workout has public visibility
+        - The owner of the workout is the user
+        - The workout has coach visibility and the user is the owner's coach
+
+        Each rule is its own index-friendly subquery, and the three are combined with
+        a UNION instead of ORing them over a join and deduplicating with DISTINCT.
+
+        Args:
+            user (User): The requesting user
+
+        Returns:
+            QuerySet: Workouts visible to the user
+        """
+        public = self.model.objects.filter(visibility=Workout.PUBLIC)
+        owned = self.model.objects.filter(owner=user)
+        coached = self.model.objects.filter(
+            visibility=Workout.COACH, owner__coach=user
+        )
+        visible_ids = (
+            public.order_by()
+            .values("pk")
+            .union(owned.order_by().values("pk"), coached.order_by().values("pk"))
+        )
+        return self.filter(pk__in=visible_ids)
+
+
 # Create your models here.
 class Workout(models.Model):
     """Django model for a workout that users can log.
@@ -62,8 +97,16 @@ class Workout(models.Model):
         max_length=2, choices=VISIBILITY_CHOICES, default=COACH
     )
 
+    objects = WorkoutQuerySet.as_manager()
+
     class Meta:
         ordering = ["-date"]
+        indexes = [
+            models.Index(
+                fields=["visibility", "-date"], name="workout_visibility_date_idx"
+            ),
+            models.Index(fields=["owner", "-date"], name="workout_owner_date_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -112,6 +155,87 @@ class ExerciseInstance(models.Model):
     number = models.IntegerField()
 
 
+class VolumeRollup(models.Model):
+    """Django model for the training volume of a user in one exercise over a day or a week.
+
+    Rows are kept up to date incrementally by workouts.rollups whenever exercise instances
+    are written through the API, so statistics are read with one range scan over the
+    unique index instead of aggregating the full history. Volume is split by the
+    visibility of the workouts it came from, so each reader only sees what they may see.
+
+    Attributes:
+        owner:          The user whose workouts are counted
+        exercise:       The exercise type
+        period:         Length of the period: Day or Week
+        start:          First day of the period. Weeks start on Monday
+        visibility:     Visibility of the counted workouts
+        sets:           Total number of sets
+        volume:         Total of sets × number
+        instance_count: Number of exercise instances counted
+    """
+
+    DAY = "d"
+    WEEK = "w"
+    PERIOD_CHOICES = [(DAY, "Day"), (WEEK, "Week")]
+
+    owner = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="volume_rollups"
+    )
+    exercise = models.ForeignKey(
+        Exercise, on_delete=models.CASCADE, related_name="volume_rollups"
+    )
+    period = models.CharField(max_length=1, choices=PERIOD_CHOICES)
+    start = models.DateField()
+    visibility = models.CharField(max_length=2, choices=Workout.VISIBILITY_CHOICES)
+    sets = models.BigIntegerField(default=0)
+    volume = models.BigIntegerField(default=0)
+    instance_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "period", "start", "exercise", "visibility"],
+                name="volume_rollup_key",
+            )
+        ]
+
+
+class PersonalRecord(models.Model):
+    """Django model for the personal records of a user in one exercise.
+
+    Kept up to date incrementally by workouts.records whenever exercise instances are
+    written through the API, so records are read without scanning the user's history.
+    Writes made in the admin or with the ORM are not tracked; run the
+    backfill_personal_records command after them.
+
+    Attributes:
+        owner:            The user holding the records
+        exercise:         The exercise type
+        best_number:      Highest number in a single exercise instance
+        best_number_date: Date of the first workout with best_number
+        best_volume:      Highest sets × number in a single exercise instance
+        best_volume_date: Date of the first workout with best_volume
+    """
+
+    owner = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="personal_records"
+    )
+    exercise = models.ForeignKey(
+        Exercise, on_delete=models.CASCADE, related_name="personal_records"
+    )
+    best_number = models.IntegerField()
+    best_number_date = models.DateTimeField()
+    best_volume = models.BigIntegerField()
+    best_volume_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "exercise"], name="personal_record_key"
+            )
+        ]
+
+
 def workout_directory_path(instance, filename):
     """Return path for which workout files should be uploaded on the web server
 
@@ -125,17 +249,67 @@ def workout_directory_path(instance, filename):
     return f"workouts/{instance.workout.id}/{filename}"
 
 
-class WorkoutFile(models.Model):
+class WorkoutFile(ContentHashMixin, models.Model):
     """Django model for file associated with a workout. Basically a wrapper.
 
     Attributes:
-        workout: The workout for which this file has been uploaded
-        owner:   The user who uploaded the file
-        file:    The actual file that's being uploaded
+        workout:      The workout for which this file has been uploaded
+        owner:        The user who uploaded the file
+        file:         The actual file that's being uploaded
+        content_hash: SHA-256 hash of the file, used as its ETag
     """
 
     workout = models.ForeignKey(Workout, on_delete=models.CASCADE, related_name="files")
     owner = models.ForeignKey(
         get_user_model(), on_delete=models.CASCADE, related_name="workout_files"
     )
-    file = models.FileField(upload_to=workout_directory_path, validators=[ImageValidator])
\ No newline at end of file
+    file = models.FileField(upload_to=workout_directory_path, validators=[ImageValidator])
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        new_file = bool(self.file) and not self.file._committed
+        super().save(*args, **kwargs)
+        if new_file:
+            create_thumbnails(self)
+
+
+def thumbnail_directory_path(instance, filename):
+    """Return path for which thumbnails should be stored on the web server, which is next
+    to the original file
+
+    Args:
+        instance (WorkoutFileThumbnail): WorkoutFileThumbnail instance
+        filename (str): Name of the thumbnail
+
+    Returns:
+        str: Path where the thumbnail is stored
+    """
+    return workout_directory_path(instance.workout_file, filename)
+
+
+class WorkoutFileThumbnail(ContentHashMixin, models.Model):
+    """Django model for a downscaled copy of a WorkoutFile image, generated on upload.
+
+    Attributes:
+        workout_file: The original file
+        width:        Width of the thumbnail in pixels
+        format:       Image format of the thumbnail (webp or jpeg)
+        file:         The thumbnail itself
+        content_hash: SHA-256 hash of the thumbnail, used as its ETag
+    """
+
+    workout_file = models.ForeignKey(
+        WorkoutFile, on_delete=models.CASCADE, related_name="thumbnails"
+    )
+    width = models.PositiveIntegerField()
+    format = models.CharField(max_length=10)
+    file = models.FileField(upload_to=thumbnail_directory_path)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    class Meta:
+        ordering = ["width", "format"]
+
+    @property
+    def workout(self):
+        """The workout of the original file, which decides who may view the thumbnail"""
+        return self.workout_file.workout
@@ -1,6 +1,7 @@
 """Contains custom parsers for serializers from the workouts Django app
 """
 import json
+from django.conf import settings
 from rest_framework import parsers
 
 # Thanks to https://stackoverflow.com/a/50514630
@@ -36,3 +37,27 @@ class MultipartJsonParser(parsers.MultiPartParser):
             new_files["files"].append({"file": file})
 
         return parsers.DataAndFiles(data, new_files)
+
+
+class NDJSONParser(parsers.BaseParser):
+    """Parser for newline-delimited JSON (one JSON document per line).
+
+    The body is not read up front. Instead a generator over the decoded lines is returned,
+    so the view can handle one record at a time while the upload is still being read. A
+    line that is not valid in the request's encoding is yielded as the UnicodeDecodeError
+    raised for it, so the view can report it without giving up on the following lines.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        return self.decode_lines(stream, encoding)
+
+    def decode_lines(self, stream, encoding):
+        for line in stream:
+            try:
+                yield line.decode(encoding)
+            except UnicodeDecodeError as error:
+                yield error
@@ -35,7 +35,7 @@ class IsCoachAndVisibleToCoach(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        return obj.owner.coach == request.user and (
+        return obj.owner.is_coached_by(request.user) and (
             obj.visibility == "PU" or obj.visibility == "CO"
         )
 
@@ -44,7 +44,7 @@ class IsUserAllowedToViewWorkoutFile(permissions.BasePermission):
         workout = obj.workout
         return (
             workout.visibility == "PU"
-            or (workout.visibility == "CO" and workout.owner.coach == request.user)
+            or (workout.visibility == "CO" and workout.owner.is_coached_by(request.user))
             or workout.owner == request.user
         )
 
@@ -55,7 +55,7 @@ class IsCoachOfWorkoutAndVisibleToCoach(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        return obj.workout.owner.coach == request.user and (
+        return obj.workout.owner.is_coached_by(request.user) and (
             obj.workout.visibility == "PU" or obj.workout.visibility == "CO"
         )
 
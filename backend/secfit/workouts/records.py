@@ -0,0 +1,192 @@
+"""Incremental maintenance of the PersonalRecord table.
+
+A write that can only improve records, such as logging a new workout, updates them from
+the written exercise instances alone. A write that lowers or removes an exercise instance
+that may hold a record recomputes that record from the user's history of the exercise,
+which is the only case that needs to read old instances.
+
+Only writes through the API update the records. Exercise instances changed or deleted
+any other way, such as in the admin or with the ORM, leave the records of their owner
+stale until the backfill_personal_records command rebuilds them.
+"""
+from functools import reduce
+from operator import or_
+from django.db.models import F, Q
+from workouts.models import ExerciseInstance, PersonalRecord
+
+
+def best_of(states):
+    """Finds the best number and volume per user and exercise in a snapshot.
+
+    Args:
+        states: Snapshot of exercise instances, see workouts.history
+
+    Returns:
+        dict: Maps (owner_id, exercise_id) to {"number": (value, date),
+        "volume": (value, date)}. Ties go to the earliest date.
+    """
+    best = {}
+    for state in states:
+        _consider(
+            best,
+            (state.owner_id, state.exercise_id),
+            state.sets,
+            state.number,
+            state.date,
+        )
+    return best
+
+
+def _consider(best, key, sets, number, date):
+    candidates = {"number": (number, date), "volume": (sets * number, date)}
+    current = best.setdefault(key, candidates)
+    for kind, candidate in candidates.items():
+        if _beats(candidate, current[kind]):
+            current[kind] = candidate
+
+
+def _beats(candidate, record):
+    return candidate[0] > record[0] or (
+        candidate[0] == record[0] and candidate[1] < record[1]
+    )
+
+
+def _new_record(key, best):
+    owner_id, exercise_id = key
+    return PersonalRecord(
+        owner_id=owner_id,
+        exercise_id=exercise_id,
+        best_number=best["number"][0],
+        best_number_date=best["number"][1],
+        best_volume=best["volume"][0],
+        best_volume_date=best["volume"][1],
+    )
+
+
+def update_personal_records(before, after):
+    """Updates the personal records touched by a change of exercise instances.
+
+    Must be called inside a transaction, after the change has been written.
+
+    Args:
+        before (list): Snapshot of the changed exercise instances before the write
+        after (list): Snapshot of the same exercise instances after the write
+    """
+    before_best = best_of(before)
+    after_best = best_of(after)
+    keys = set(before_best) | set(after_best)
+    if not keys:
+        return
+
+    def lock_records(keys):
+        return {
+            (record.owner_id, record.exercise_id): record
+            for record in PersonalRecord.objects.select_for_update().filter(
+                reduce(
+                    or_, (Q(owner_id=owner, exercise_id=exercise) for owner, exercise in keys)
+                )
+            )
+        }
+
+    records = lock_records(keys)
+    missing = [key for key in after_best if key not in records]
+    if missing:
+        # A record inserted by a concurrent write in the meantime is kept, and is then
+        # improved below like any other existing record.
+        PersonalRecord.objects.bulk_create(
+            [_new_record(key, after_best[key]) for key in missing], ignore_conflicts=True
+        )
+        records.update(lock_records(missing))
+
+    changed, recompute = [], []
+    for key in keys:
+        record = records.get(key)
+        old = before_best.get(key)
+        new = after_best.get(key)
+        if (
+            record is not None
+            and old is not None
+            and (
+                old["number"][0] >= record.best_number
+                or old["volume"][0] >= record.best_volume
+            )
+        ):
+            # The change may have lowered or removed an instance holding the record
+            recompute.append(key)
+        elif new is None or record is None:
+            continue
+        else:
+            improved = False
+            if _beats(new["number"], (record.best_number, record.best_number_date)):
+                record.best_number, record.best_number_date = new["number"]
+                improved = True
+            if _beats(new["volume"], (record.best_volume, record.best_volume_date)):
+                record.best_volume, record.best_volume_date = new["volume"]
+                improved = True
+            if improved:
+                changed.append(record)
+
+    PersonalRecord.objects.bulk_update(
+        changed, ["best_number", "best_number_date", "best_volume", "best_volume_date"]
+    )
+    for owner_id, exercise_id in recompute:
+        recompute_personal_record(records[(owner_id, exercise_id)])
+
+
+def recompute_personal_record(record):
+    """Recomputes a personal record from the user's history of the exercise, and deletes
+    it if no exercise instance is left.
+
+    Args:
+        record (PersonalRecord): The record to recompute
+    """
+    instances = ExerciseInstance.objects.filter(
+        workout__owner_id=record.owner_id, exercise_id=record.exercise_id
+    )
+    best_number = (
+        instances.order_by("-number", "workout__date")
+        .values_list("number", "workout__date")
+        .first()
+    )
+    if best_number is None:
+        record.delete()
+        return
+    best_volume = (
+        instances.annotate(volume=F("sets") * F("number"))
+        .order_by("-volume", "workout__date")
+        .values_list("volume", "workout__date")
+        .first()
+    )
+    record.best_number, record.best_number_date = best_number
+    record.best_volume, record.best_volume_date = best_volume
+    record.save()
+
+
+def rebuild_personal_records(batch_size=2000):
+    """Replaces every personal record with one computed from the full history.
+
+    The history is read in a single pass over the exercise instances.
+
+    Args:
+        batch_size (int): Exercise instances fetched, and records inserted, at a time
+
+    Returns:
+        int: Number of personal records written
+    """
+    states = (
+        ExerciseInstance.objects.order_by()
+        .values_list(
+            "workout__owner_id", "workout__date", "exercise_id", "sets", "number"
+        )
+        .iterator(chunk_size=batch_size)
+    )
+    best = {}
+    for owner_id, date, exercise_id, sets, number in states:
+        _consider(best, (owner_id, exercise_id), sets, number, date)
+
+    PersonalRecord.objects.all().delete()
+    PersonalRecord.objects.bulk_create(
+        (_new_record(key, values) for key, values in best.items()),
+        batch_size=batch_size,
+    )
+    return len(best)
@@ -0,0 +1,105 @@
+"""Incremental maintenance of the VolumeRollup tables.
+
+apply_volume_change() turns snapshots of the exercise instances before and after a write
+into per-row contributions and adds the difference to the affected rollup rows. Missing
+rows are inserted while ignoring conflicts, and rows are locked and incremented in the
+database, so concurrent writes to the same user's rollups neither fail on the unique key
+nor lose increments.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+from django.db.models import F, Q
+from django.utils import timezone
+from workouts.models import VolumeRollup
+
+
+def rollup_periods(date):
+    """Returns the (period, start) pairs a workout at the given time counts towards."""
+    day = timezone.localdate(date)
+    return [
+        (VolumeRollup.DAY, day),
+        (VolumeRollup.WEEK, day - timedelta(days=day.weekday())),
+    ]
+
+
+def volume_contributions(states):
+    """Computes what exercise instances add to the rollups.
+
+    Args:
+        states: Snapshot of the exercise instances, see workouts.history
+
+    Returns:
+        dict: Maps rollup keys (owner_id, period, start, exercise_id, visibility) to
+        [sets, volume, instance_count]
+    """
+    contributions = defaultdict(lambda: [0, 0, 0])
+    for state in states:
+        for period, start in rollup_periods(state.date):
+            totals = contributions[
+                (state.owner_id, period, start, state.exercise_id, state.visibility)
+            ]
+            totals[0] += state.sets
+            totals[1] += state.sets * state.number
+            totals[2] += 1
+    return contributions
+
+
+def apply_volume_change(before, after):
+    """Adds the difference between two snapshots of exercise instances to the rollup rows.
+
+    Must be called inside a transaction. Rows that no longer count any exercise instance
+    are deleted.
+
+    Args:
+        before (list): Snapshot of the exercise instances before the write
+        after (list): Snapshot of the same exercise instances after the write
+    """
+    before = volume_contributions(before)
+    after = volume_contributions(after)
+    deltas = {}
+    for key in set(before) | set(after):
+        old = before.get(key, (0, 0, 0))
+        new = after.get(key, (0, 0, 0))
+        delta = [n - o for n, o in zip(new, old)]
+        if any(delta):
+            deltas[key] = delta
+    if not deltas:
+        return
+
+    fields = ["owner_id", "period", "start", "exercise_id", "visibility"]
+
+    def lock_rows(keys):
+        return {
+            tuple(getattr(row, field) for field in fields): row
+            for row in VolumeRollup.objects.select_for_update().filter(
+                reduce(or_, (Q(**dict(zip(fields, key))) for key in keys))
+            )
+        }
+
+    rows = lock_rows(deltas)
+    missing = [key for key in deltas if key not in rows]
+    if missing:
+        # Missing rows are created empty and then incremented like the others. A row
+        # inserted by a concurrent write in the meantime is kept, and both add to it.
+        VolumeRollup.objects.bulk_create(
+            [VolumeRollup(**dict(zip(fields, key))) for key in missing],
+            ignore_conflicts=True,
+        )
+        rows.update(lock_rows(missing))
+
+    changed, emptied = [], []
+    for key, (sets, volume, instance_count) in deltas.items():
+        row = rows[key]
+        if row.instance_count + instance_count <= 0:
+            emptied.append(row.pk)
+            continue
+        row.sets = F("sets") + sets
+        row.volume = F("volume") + volume
+        row.instance_count = F("instance_count") + instance_count
+        changed.append(row)
+
+    VolumeRollup.objects.bulk_update(changed, ["sets", "volume", "instance_count"])
+    if emptied:
+        VolumeRollup.objects.filter(pk__in=emptied).delete()
@@ -0,0 +1,124 @@
+"""Relevance-ranked full-text search over workouts and exercises.
+
+The indexes themselves are created by migration 0010_search_index: on PostgreSQL a GIN
+index over a weighted tsvector expression of the searched columns, and on SQLite an FTS5
+table per model that triggers keep in sync with the rows. search() filters a queryset
+through the index of the database it runs on and orders it by relevance, so any
+visibility rules already applied to the queryset still hold. SearchMixin applies it to
+the q query parameter of a list view.
+
+SQLite drops the triggers whenever a migration rebuilds the indexed table, so such a
+migration must recreate them, see 0010_search_index.
+"""
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from workouts.models import Exercise, Workout
+from workouts.serializers import SearchQuerySerializer
+
+# Searched columns of each model with their weight, A being the most relevant
+SEARCH_FIELDS = {
+    Workout: [("name", "A"), ("notes", "B")],
+    Exercise: [("name", "A"), ("description", "B")],
+}
+
+SEARCH_CONFIG = "english"
+
+# bm25() column weights matching the tsvector weights used on PostgreSQL
+FTS_WEIGHTS = {"A": 10.0, "B": 1.0}
+
+
+def search_vector_sql(model):
+    """Returns the weighted tsvector expression indexed for a model on PostgreSQL."""
+    return " || ".join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, "
+        f"coalesce({column}, '')), '{weight}')"
+        for column, weight in SEARCH_FIELDS[model]
+    )
+
+
+def fts_table(model):
+    """Returns the name of the FTS5 table indexing a model on SQLite."""
+    return f"{model._meta.db_table}_fts"
+
+
+def fts_query(terms):
+    """Quotes search terms as FTS5 strings, so the user's input cannot be parsed as
+    query syntax. Consecutive strings must all match.
+    """
+    return " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def search(queryset, query):
+    """Filters a queryset to the rows matching a search query, best match first.
+
+    Args:
+        queryset (QuerySet): Workouts or exercises to search
+        query (str): Words that must all occur in the searched fields
+
+    Returns:
+        QuerySet: The matching rows annotated with their rank, higher is better
+    """
+    terms = query.split()
+    if not terms:
+        return queryset.none()
+
+    model = queryset.model
+    table = model._meta.db_table
+    vendor = connections[queryset.db].vendor
+
+    if vendor == "postgresql":
+        vector = search_vector_sql(model)
+        tsquery = f"plainto_tsquery('{SEARCH_CONFIG}'::regconfig, %s)"
+        matches = RawSQL(
+            f"SELECT id FROM {table} WHERE {vector} @@ {tsquery}", [query]
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank({vector}, {tsquery}) FROM {table} AS search "
+            f"WHERE search.id = {table}.id",
+            [query],
+            output_field=FloatField(),
+        )
+    elif vendor == "sqlite":
+        fts = fts_table(model)
+        weights = ", ".join(
+            str(FTS_WEIGHTS[weight]) for _, weight in SEARCH_FIELDS[model]
+        )
+        match = fts_query(terms)
+        matches = RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", [match])
+        # bm25() is lower for better matches
+        rank = RawSQL(
+            f"SELECT -bm25({fts}, {weights}) FROM {fts} "
+            f"WHERE {fts} MATCH %s AND rowid = {table}.id",
+            [match],
+            output_field=FloatField(),
+        )
+    else:
+        # No index on other databases, fall back to a scan without ranking
+        for term in terms:
+            condition = Q()
+            for column, _ in SEARCH_FIELDS[model]:
+                condition |= Q(**{f"{column}__icontains": term})
+            queryset = queryset.filter(condition)
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+
+    return queryset.filter(pk__in=matches).annotate(rank=rank)
+
+
+class SearchMixin(object):
+    """Mixin for list views that narrow their queryset to the results of a full-text
+    search given in the q query parameter, best match first.
+    """
+
+    def search(self, queryset):
+        """Searches the given queryset with the request's query.
+
+        Args:
+            queryset (QuerySet): Rows the requesting user may see
+
+        Returns:
+            QuerySet: The matching rows ordered by relevance
+        """
+        query = SearchQuerySerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        return search(queryset, query.validated_data["q"]).order_by("-rank", "-id")
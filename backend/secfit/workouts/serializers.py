@@ -1,52 +1,221 @@
 """Serializers for the workouts application
 """
+from django.db import transaction
+from django.db.models import (
+    Count,
+    Manager,
+    Prefetch,
+    QuerySet,
+    prefetch_related_objects,
+)
+from django.utils.module_loading import import_string
 from rest_framework import serializers
-from rest_framework.serializers import HyperlinkedRelatedField
-from workouts.models import Workout, Exercise, ExerciseInstance, WorkoutFile
+from rest_framework.serializers import HyperlinkedRelatedField, LIST_SERIALIZER_KWARGS
+from secfit.serializers import TimedSerializerMixin
+from workouts.history import apply_exercise_instance_change, snapshot
+from workouts.models import (
+    Workout,
+    Exercise,
+    ExerciseInstance,
+    WorkoutFile,
+    WorkoutFileThumbnail,
+    PersonalRecord,
+)
+
+
+class CachedHyperlinkedRelatedField(HyperlinkedRelatedField):
+    """HyperlinkedRelatedField that looks up each distinct hyperlink only once.
+
+    The field instance is shared by every item of a nested list, so a workout whose exercise
+    instances refer to the same exercise many times only queries for it once.
+    """
+
+    def get_object(self, view_name, view_args, view_kwargs):
+        key = (view_name, tuple(view_args), tuple(sorted(view_kwargs.items())))
+        cache = self.__dict__.setdefault("_object_cache", {})
+        if key not in cache:
+            cache[key] = super().get_object(view_name, view_args, view_kwargs)
+        return cache[key]
+
+
+class RelatedCountField(serializers.Field):
+    """Read-only number of objects in a reverse relation.
+
+    Views annotate their querysets with the count under the field's name, so listing many
+    objects costs no extra queries. Objects without the annotation, such as one that was
+    just created, fall back to a COUNT query on the relation.
+
+    Args:
+        relation: Name of the reverse relation to count
+    """
+
+    def __init__(self, relation, **kwargs):
+        self.relation = relation
+        kwargs["read_only"] = True
+        kwargs["source"] = "*"
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        count = getattr(instance, self.field_name, None)
+        if count is None:
+            count = getattr(instance, self.relation).count()
+        return count
 
 
-class ExerciseInstanceSerializer(serializers.HyperlinkedModelSerializer):
+class ExpandableListSerializer(serializers.ListSerializer):
+    """ListSerializer that prefetches the relations its child expands, so expanding them
+    costs one query per relation rather than one per row.
+    """
+
+    def to_representation(self, data):
+        paths = self.child.get_expanded_fields().keys()
+        if paths:
+            iterable = data.all() if isinstance(data, Manager) else data
+            if isinstance(iterable, QuerySet):
+                data = iterable.prefetch_related(*paths)
+            else:
+                data = list(iterable)
+                prefetch_related_objects(data, *paths)
+        return super().to_representation(data)
+
+
+class ExpandableFieldsMixin(object):
+    """Mixin for serializers whose responses can be shaped by query parameters.
+
+    ?fields=id,name leaves out every other field, and ?expand=owner replaces the hyperlink
+    of a relation listed in expandable_fields with the related object, serialized by the
+    given serializer. Only the serializer a view renders its response with reads the
+    parameters, nested serializers are left as they are.
+
+    Attributes:
+        expandable_fields: Maps field names to the dotted path of the serializer of the
+            related object, imported when first expanded to avoid circular imports
+    """
+
+    expandable_fields = {}
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # Same as Serializer.many_init, with ExpandableListSerializer as the list class
+        allow_empty = kwargs.pop("allow_empty", None)
+        list_kwargs = {
+            key: value for key, value in kwargs.items() if key in LIST_SERIALIZER_KWARGS
+        }
+        if allow_empty is not None:
+            list_kwargs["allow_empty"] = allow_empty
+        list_kwargs["child"] = cls(*args, **kwargs)
+        return ExpandableListSerializer(*args, **list_kwargs)
+
+    def get_query_param_names(self, param):
+        """Returns the comma-separated names in a query parameter, or None if it does not
+        apply to this serializer.
+        """
+        root = self.parent if isinstance(self.parent, serializers.ListSerializer) else self
+        if root.parent is not None or "view" not in self.context:
+            return None
+        value = self.context["request"].query_params.get(param)
+        if value is None:
+            return None
+        return {name.strip() for name in value.split(",") if name.strip()}
+
+    def get_expanded_fields(self):
+        """Returns the expanded fields requested for this serializer, by name."""
+        if "_expanded_fields" not in self.__dict__:
+            expanded = {}
+            for name in self.get_query_param_names("expand") or ():
+                if name in self.expandable_fields and name in self.fields:
+                    field = import_string(self.expandable_fields[name])(read_only=True)
+                    field.bind(name, self)
+                    expanded[name] = field
+            self._expanded_fields = expanded
+        return self._expanded_fields
+
+    @property
+    def _readable_fields(self):
+        if "_fieldset" not in self.__dict__:
+            self._fieldset = self.get_query_param_names("fields")
+        expanded = self.get_expanded_fields()
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if self._fieldset is not None and name not in self._fieldset:
+                continue
+            yield expanded.get(name, field)
+
+
+class ExerciseInstanceSerializer(
+    TimedSerializerMixin, ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer
+):
     """Serializer for an ExerciseInstance. Hyperlinks are used for relationships by default.
 
     Serialized fields: url, id, exercise, sets, number, workout
 
     Attributes:
+        exercise:   The exercise type of this instance, represented by a hyperlink
         workout:    The associated workout for this instance, represented by a hyperlink
     """
 
+    exercise = CachedHyperlinkedRelatedField(
+        queryset=Exercise.objects.all(), view_name="exercise-detail"
+    )
     workout = HyperlinkedRelatedField(
         queryset=Workout.objects.all(), view_name="workout-detail", required=False
     )
+    expandable_fields = {
+        "exercise": "workouts.serializers.ExerciseCatalogSerializer",
+        "workout": "workouts.serializers.WorkoutSummarySerializer",
+    }
 
     class Meta:
         model = ExerciseInstance
         fields = ["url", "id", "exercise", "sets", "number", "workout"]
 
 
-class WorkoutFileSerializer(serializers.HyperlinkedModelSerializer):
+class WorkoutFileThumbnailSerializer(serializers.ModelSerializer):
+    """Serializer for a WorkoutFileThumbnail.
+
+    Serialized fields: width, format, file
+    """
+
+    class Meta:
+        model = WorkoutFileThumbnail
+        fields = ["width", "format", "file"]
+
+
+class WorkoutFileSerializer(
+    TimedSerializerMixin, ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer
+):
     """Serializer for a WorkoutFile. Hyperlinks are used for relationships by default.
 
-    Serialized fields: url, id, owner, file, workout
+    Serialized fields: url, id, owner, file, workout, thumbnails
 
     Attributes:
         owner:      The owner (User) of the WorkoutFile, represented by a username. ReadOnly
         workout:    The associate workout for this WorkoutFile, represented by a hyperlink
+        thumbnails: Downscaled WebP and JPEG copies of the image. ReadOnly
     """
 
     owner = serializers.ReadOnlyField(source="owner.username")
     workout = HyperlinkedRelatedField(
         queryset=Workout.objects.all(), view_name="workout-detail", required=False
     )
+    thumbnails = WorkoutFileThumbnailSerializer(many=True, read_only=True)
+    expandable_fields = {
+        "owner": "users.serializers.UserSummarySerializer",
+        "workout": "workouts.serializers.WorkoutSummarySerializer",
+    }
 
     class Meta:
         model = WorkoutFile
-        fields = ["url", "id", "owner", "file", "workout"]
+        fields = ["url", "id", "owner", "file", "workout", "thumbnails"]
 
     def create(self, validated_data):
         return WorkoutFile.objects.create(**validated_data)
 
 
-class WorkoutSerializer(serializers.HyperlinkedModelSerializer):
+class WorkoutSerializer(
+    TimedSerializerMixin, ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer
+):
     """Serializer for a Workout. Hyperlinks are used for relationships by default.
 
     This serializer specifies nested serialization since a workout consists of WorkoutFiles
@@ -64,6 +233,7 @@ class WorkoutSerializer(serializers.HyperlinkedModelSerializer):
     owner_username = serializers.SerializerMethodField()
     exercise_instances = ExerciseInstanceSerializer(many=True, required=True)
     files = WorkoutFileSerializer(many=True, required=False)
+    expandable_fields = {"owner": "users.serializers.UserSummarySerializer"}
 
     class Meta:
         model = Workout
@@ -81,11 +251,34 @@ class WorkoutSerializer(serializers.HyperlinkedModelSerializer):
         ]
         extra_kwargs = {"owner": {"read_only": True}}
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Joins and prefetches every relation this serializer reads, so that rendering
+        a page of workouts costs the same number of queries regardless of its size.
+
+        Args:
+            queryset (QuerySet): Workouts to be serialized
+
+        Returns:
+            QuerySet: The same workouts with owners joined and children prefetched
+        """
+        return queryset.select_related("owner").prefetch_related(
+            "exercise_instances",
+            Prefetch(
+                "files",
+                queryset=WorkoutFile.objects.select_related("owner").prefetch_related(
+                    "thumbnails"
+                ),
+            ),
+        )
+
+    @transaction.atomic
     def create(self, validated_data):
         """Custom logic for creating ExerciseInstances, WorkoutFiles, and a Workout.
 
         This is needed to iterate over the files and exercise instances, since this serializer is
-        nested.
+        nested. The exercise instances are inserted with a single bulk query, and then
+        added to the user's volume rollups and personal records.
 
         Args:
             validated_data: Validated files and exercise_instances
@@ -100,8 +293,11 @@ class WorkoutSerializer(serializers.HyperlinkedModelSerializer):
 
         workout = Workout.objects.create(**validated_data)
 
-        for exercise_instance_data in exercise_instances_data:
-            ExerciseInstance.objects.create(workout=workout, **exercise_instance_data)
+        exercise_instances = ExerciseInstance.objects.bulk_create(
+            ExerciseInstance(workout=workout, **exercise_instance_data)
+            for exercise_instance_data in exercise_instances_data
+        )
+        apply_exercise_instance_change([], snapshot(workout, exercise_instances))
         for file_data in files_data:
             WorkoutFile.objects.create(
                 workout=workout, owner=workout.owner, file=file_data.get("file")
@@ -109,11 +305,15 @@ class WorkoutSerializer(serializers.HyperlinkedModelSerializer):
 
         return workout
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Custom logic for updating a Workout with its ExerciseInstances and Workouts.
 
-        This is needed because each object in both exercise_instances and files must be iterated
-        over and handled individually.
+        This is needed because each object in both exercise_instances and files must be matched
+        with the existing objects. Exercise instances are matched by position: changed ones are
+        written with one bulk update, new ones with one bulk insert, and removed ones with one
+        delete, so the number of queries does not grow with the number of instances. The
+        change is then applied to the user's volume rollups and personal records.
 
         Args:
             instance (Workout): Current Workout object
@@ -123,7 +323,8 @@ class WorkoutSerializer(serializers.HyperlinkedModelSerializer):
             Workout: Updated Workout instance
         """
         exercise_instances_data = validated_data.pop("exercise_instances")
-        exercise_instances = instance.exercise_instances
+        exercise_instances = list(instance.exercise_instances.all())
+        history_before = snapshot(instance, exercise_instances)
 
         instance.name = validated_data.get("name", instance.name)
         instance.notes = validated_data.get("notes", instance.notes)
@@ -136,54 +337,72 @@ class WorkoutSerializer(serializers.HyperlinkedModelSerializer):
         # This updates existing exercise instances without adding or deleting object.
         # zip() will yield n 2-tuples, where n is
         # min(len(exercise_instance), len(exercise_instance_data))
+        changed_exercise_instances = []
         for exercise_instance, exercise_instance_data in zip(
-            exercise_instances.all(), exercise_instances_data
+            exercise_instances, exercise_instances_data
         ):
-            exercise_instance.exercise = exercise_instance_data.get(
-                "exercise", exercise_instance.exercise
-            )
-            exercise_instance.number = exercise_instance_data.get(
-                "number", exercise_instance.number
-            )
-            exercise_instance.sets = exercise_instance_data.get(
-                "sets", exercise_instance.sets
-            )
-            exercise_instance.save()
+            changed = False
+            for field in ["exercise", "number", "sets"]:
+                if field not in exercise_instance_data:
+                    continue
+                attname = ExerciseInstance._meta.get_field(field).attname
+                value = exercise_instance_data[field]
+                if field == "exercise":
+                    value = value.pk
+                if getattr(exercise_instance, attname) != value:
+                    setattr(exercise_instance, attname, value)
+                    changed = True
+            if changed:
+                changed_exercise_instances.append(exercise_instance)
+        ExerciseInstance.objects.bulk_update(
+            changed_exercise_instances, ["exercise", "number", "sets"]
+        )
 
         # If new exercise instances have been added to the workout, then create them
-        if len(exercise_instances_data) > len(exercise_instances.all()):
-            for i in range(len(exercise_instances.all()), len(exercise_instances_data)):
-                exercise_instance_data = exercise_instances_data[i]
-                ExerciseInstance.objects.create(
-                    workout=instance, **exercise_instance_data
-                )
+        added_exercise_instances_data = exercise_instances_data[len(exercise_instances):]
+        added_exercise_instances = ExerciseInstance.objects.bulk_create(
+            ExerciseInstance(workout=instance, **exercise_instance_data)
+            for exercise_instance_data in added_exercise_instances_data
+        )
         # Else if exercise instances have been removed from the workout, then delete them
-        elif len(exercise_instances_data) < len(exercise_instances.all()):
-            for i in range(len(exercise_instances_data), len(exercise_instances.all())):
-                exercise_instances.all()[i].delete()
+        removed_ids = [
+            exercise_instance.id
+            for exercise_instance in exercise_instances[len(exercise_instances_data):]
+        ]
+        if removed_ids:
+            ExerciseInstance.objects.filter(id__in=removed_ids).delete()
+
+        # The bulk queries send no signals, so the rollups and records are updated here.
+        # A changed date or visibility moves all of the workout's volume to other rollups.
+        apply_exercise_instance_change(
+            history_before,
+            snapshot(
+                instance,
+                exercise_instances[: len(exercise_instances_data)]
+                + added_exercise_instances,
+            ),
+        )
 
         # Handle WorkoutFiles
 
         if "files" in validated_data:
             files_data = validated_data.pop("files")
-            files = instance.files
+            files = list(instance.files.all())
 
-            for file, file_data in zip(files.all(), files_data):
+            for file, file_data in zip(files, files_data):
                 file.file = file_data.get("file", file.file)
                 file.save()
 
             # If new files have been added, creating new WorkoutFiles
-            if len(files_data) > len(files.all()):
-                for i in range(len(files.all()), len(files_data)):
-                    WorkoutFile.objects.create(
-                        workout=instance,
-                        owner=instance.owner,
-                        file=files_data[i].get("file"),
-                    )
+            for file_data in files_data[len(files):]:
+                WorkoutFile.objects.create(
+                    workout=instance,
+                    owner=instance.owner,
+                    file=file_data.get("file"),
+                )
             # Else if files have been removed, delete WorkoutFiles
-            elif len(files_data) < len(files.all()):
-                for i in range(len(files_data), len(files.all())):
-                    files.all()[i].delete()
+            for file in files[len(files_data):]:
+                file.delete()
 
         return instance
 
@@ -199,22 +418,90 @@ class WorkoutSerializer(serializers.HyperlinkedModelSerializer):
         return obj.owner.username
 
 
-class ExerciseSerializer(serializers.HyperlinkedModelSerializer):
+class ExerciseSerializer(
+    TimedSerializerMixin, ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer
+):
     """Serializer for an Exercise. Hyperlinks are used for relationships by default.
 
-    Serialized fields: url, id, name, description, unit, instances
+    Serialized fields: url, id, name, description, unit, instance_count, instances_url
 
     Attributes:
-        instances:  Associated exercise instances with this Exercise type. Hyperlinks.
+        instance_count: Number of exercise instances with this Exercise type
+        instances_url:  Hyperlink to the paginated list of those exercise instances
     """
 
-    instances = serializers.HyperlinkedRelatedField(
-        many=True, view_name="exerciseinstance-detail", read_only=True
-    )
+    instance_count = RelatedCountField("instances")
+    instances_url = serializers.HyperlinkedIdentityField(view_name="exercise-instances")
 
     class Meta:
         model = Exercise
-        fields = ["url", "id", "name", "description", "unit", "instances"]
+        fields = [
+            "url",
+            "id",
+            "name",
+            "description",
+            "unit",
+            "instance_count",
+            "instances_url",
+        ]
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Annotates the queryset with the counts used by RelatedCountField."""
+        return queryset.annotate(instance_count=Count("instances"))
+
+
+class ExerciseCatalogSerializer(ExerciseSerializer):
+    """Serializer for an Exercise in the cached catalog. Leaves out instance_count, which
+    changes with every saved workout and would otherwise invalidate the catalog.
+
+    Serialized fields: url, id, name, description, unit, instances_url
+    """
+
+    class Meta(ExerciseSerializer.Meta):
+        fields = ["url", "id", "name", "description", "unit", "instances_url"]
+
 
+class WorkoutSummarySerializer(TimedSerializerMixin, serializers.HyperlinkedModelSerializer):
+    """Serializer for a Workout expanded inline in another object, without its nested
+    exercise instances and files.
 
+    Serialized fields: url, id, name, date, visibility
+    """
+
+    class Meta:
+        model = Workout
+        fields = ["url", "id", "name", "date", "visibility"]
+
+
+class PersonalRecordSerializer(
+    TimedSerializerMixin, ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer
+):
+    """Serializer for a PersonalRecord. Hyperlinks are used for relationships by default.
+
+    Serialized fields: exercise, exercise_name, best_number, best_number_date, best_volume,
+    best_volume_date
+    """
+
+    exercise_name = serializers.ReadOnlyField(source="exercise.name")
+    expandable_fields = {"exercise": "workouts.serializers.ExerciseCatalogSerializer"}
+
+    class Meta:
+        model = PersonalRecord
+        fields = [
+            "exercise",
+            "exercise_name",
+            "best_number",
+            "best_number_date",
+            "best_volume",
+            "best_volume_date",
+        ]
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    """Validates the query parameters of a full-text search.
+
+    Serialized fields: q
+    """
 
+    q = serializers.CharField(max_length=200)
@@ -0,0 +1,108 @@
+"""Contains signal receivers for the workouts application
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from workouts.catalog import bump_catalog_version
+from workouts.feed import (
+    invalidate_feeds,
+    invalidate_feeds_of_workouts,
+    invalidate_workout_feeds,
+    is_feed_cached,
+)
+from workouts.models import (
+    Exercise,
+    ExerciseInstance,
+    Workout,
+    WorkoutFile,
+    WorkoutFileThumbnail,
+)
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def invalidate_exercise_catalog(sender, instance, **kwargs):
+    """Moves the cached exercise catalog to a new version when an exercise changes."""
+    bump_catalog_version()
+
+
+@receiver(pre_save, sender=Workout)
+def remember_workout_visibility(sender, instance, **kwargs):
+    """Reads the visibility a workout is saved over from the database, so a change of
+    visibility can invalidate the feeds the workout is leaving.
+    """
+    instance._saved_visibility = None
+    if is_feed_cached() and instance.pk is not None:
+        instance._saved_visibility = (
+            Workout.objects.filter(pk=instance.pk)
+            .values_list("visibility", flat=True)
+            .first()
+        )
+
+
+@receiver(pre_save, sender=get_user_model())
+def remember_user_coach(sender, instance, update_fields=None, **kwargs):
+    """Reads the coach a user is saved over from the database, so a change of coach can
+    invalidate the feeds of both coaches.
+    """
+    instance._saved_coach_id = instance.coach_id
+    if (
+        is_feed_cached()
+        and instance.pk is not None
+        and (update_fields is None or {"coach", "coach_id"} & set(update_fields))
+    ):
+        instance._saved_coach_id = (
+            get_user_model()
+            .objects.filter(pk=instance.pk)
+            .values_list("coach_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Workout)
+@receiver(post_delete, sender=Workout)
+def invalidate_feeds_of_workout(sender, instance, **kwargs):
+    """Invalidates the feeds a saved or deleted workout shows up or showed up in."""
+    # The coach is looked up rather than read from a cached owner, which may be stale
+    invalidate_workout_feeds(
+        instance.owner_id,
+        {instance.visibility, getattr(instance, "_saved_visibility", None)},
+    )
+    instance._saved_visibility = None
+
+
+@receiver(post_save, sender=ExerciseInstance)
+@receiver(post_delete, sender=ExerciseInstance)
+@receiver(post_save, sender=WorkoutFile)
+@receiver(post_delete, sender=WorkoutFile)
+def invalidate_feeds_of_workout_child(sender, instance, **kwargs):
+    """Invalidates the feeds showing the workout of a saved or deleted exercise instance
+    or file.
+    """
+    invalidate_feeds_of_workouts(workout_ids=[instance.workout_id])
+
+
+@receiver(post_save, sender=WorkoutFileThumbnail)
+@receiver(post_delete, sender=WorkoutFileThumbnail)
+def invalidate_feeds_of_thumbnail(sender, instance, **kwargs):
+    """Invalidates the feeds showing the workout of a saved or deleted thumbnail, which
+    are generated after their file is saved.
+    """
+    invalidate_feeds_of_workouts(workout_file_ids=[instance.workout_file_id])
+
+
+@receiver(post_delete, sender=WorkoutFileThumbnail)
+def delete_thumbnail_file(sender, instance, **kwargs):
+    """Deletes the stored file of a deleted thumbnail, such as when the thumbnails of a
+    replaced image are generated again.
+    """
+    instance.file.delete(save=False)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_feeds_of_coaches(sender, instance, **kwargs):
+    """Invalidates the feeds of the old and the new coach when a user's coach changes,
+    since coach workouts of the user leave one feed and enter the other.
+    """
+    if instance.coach_id != instance._saved_coach_id:
+        invalidate_feeds([instance._saved_coach_id, instance.coach_id])
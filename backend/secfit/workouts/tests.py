@@ -1,6 +1,985 @@
 """
 Tests for the workouts application.
 """
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import IntegrityError
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import brotli
+from PIL import Image
+import msgpack
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from unittest import mock
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from secfit import metrics
+from secfit.middleware import CompressionMiddleware
+from secfit.testing import SharedCacheMixin
+from workouts.models import (
+    Exercise,
+    ExerciseInstance,
+    PersonalRecord,
+    VolumeRollup,
+    Workout,
+    WorkoutFile,
+)
+from workouts.feed import LOCAL_FEED_TIMEOUT, get_feed_timeout
+from workouts.serializers import WorkoutFileSerializer, WorkoutSerializer
+from workouts.views import WorkoutBulkImport
 
-# Create your tests here.
+
+class WorkoutFixturesMixin:
+    """TestCase mixin logging in an athlete who can be given public workouts, each with
+    three exercise instances and a file, or post workouts of their own through the API.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        self.exercise = Exercise.objects.create(
+            name="Push-up", description="Push the floor away", unit="reps"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def workout_data(self, date, visibility, instances):
+        """Returns the request body of a workout with an exercise instance of the
+        athlete's exercise per (sets, number) pair in instances.
+        """
+        return {
+            "name": "Program",
+            "date": date,
+            "notes": "Easy",
+            "visibility": visibility,
+            "exercise_instances": [
+                {
+                    "exercise": f"http://testserver/api/exercises/{self.exercise.id}/",
+                    "sets": sets,
+                    "number": number,
+                }
+                for sets, number in instances
+            ],
+        }
+
+    def create_workout(self, date, visibility, instances):
+        """Posts a workout as the athlete and returns the response data."""
+        response = self.client.post(
+            "/api/workouts/",
+            self.workout_data(date, visibility, instances),
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def create_workouts(self, count):
+        for i in range(count):
+            workout = Workout.objects.create(
+                name=f"Workout {i}",
+                date=timezone.now(),
+                notes="",
+                owner=self.user,
+                visibility=Workout.PUBLIC,
+            )
+            for _ in range(3):
+                ExerciseInstance.objects.create(
+                    workout=workout, exercise=self.exercise, sets=3, number=10
+                )
+            WorkoutFile.objects.create(
+                workout=workout, owner=self.user, file=f"workouts/{workout.id}/a.jpg"
+            )
+
+
+class WorkoutListQueryCountTestCase(WorkoutFixturesMixin, TestCase):
+    """Rendering workouts must cost a fixed number of queries, however many rows
+    or nested exercise instances and files the page contains.
+    """
+
+    def test_list_query_count_is_constant(self):
+        # count, page with owners, exercise instances, files with their owners, thumbnails
+        self.create_workouts(1)
+        with self.assertNumQueries(5):
+            response = self.client.get("/api/workouts/")
+        self.assertEqual(response.status_code, 200)
+
+        self.create_workouts(9)
+        with self.assertNumQueries(5):
+            response = self.client.get("/api/workouts/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_detail_query_count(self):
+        self.create_workouts(1)
+        workout = Workout.objects.get()
+        # workout with owner, exercise instances, files with their owners, thumbnails
+        with self.assertNumQueries(4):
+            response = self.client.get(f"/api/workouts/{workout.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["exercise_instances"]), 3)
+
+
+class WorkoutWriteQueryCountTestCase(WorkoutFixturesMixin, TestCase):
+    """Saving a workout must not cost a query per nested exercise instance."""
+
+    def test_create_and_update_query_count(self):
+        data = self.workout_data(
+            "2021-03-01T10:00:00Z", Workout.PUBLIC, [(3, i) for i in range(50)]
+        )
+        # includes locking, inserting and incrementing the volume rollups, and locking,
+        # inserting and locking again the personal records
+        with self.assertNumQueries(14):
+            response = self.client.post("/api/workouts/", data, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(ExerciseInstance.objects.count(), 50)
+
+        workout_id = response.data["id"]
+        data["exercise_instances"][0]["number"] = 100
+        data["exercise_instances"] = data["exercise_instances"][:40]
+        # includes locking and updating the volume rollups, recomputing the personal
+        # record whose instances were removed, and loading the removed instances for
+        # their delete signals
+        with self.assertNumQueries(18):
+            response = self.client.put(
+                f"/api/workouts/{workout_id}/", data, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ExerciseInstance.objects.count(), 40)
+        self.assertEqual(response.data["exercise_instances"][0]["number"], 100)
+
+
+class VolumeRollupTestCase(WorkoutFixturesMixin, TestCase):
+    """The volume rollups must follow every write of exercise instances through the API,
+    including changes of a workout's date or visibility.
+    """
+
+    def rollups(self):
+        return {
+            (row.period, row.start.isoformat(), row.visibility): (
+                row.sets,
+                row.volume,
+                row.instance_count,
+            )
+            for row in VolumeRollup.objects.filter(owner=self.user, exercise=self.exercise)
+        }
+
+    def create_program(self, date="2021-03-03T10:00:00Z"):
+        return self.create_workout(date, Workout.PUBLIC, [(3, 10), (3, 20)])
+
+    def test_create_adds_to_existing_rows(self):
+        self.create_program()
+        totals = (6, 90, 2)
+        self.assertEqual(
+            self.rollups(),
+            {
+                ("d", "2021-03-03", Workout.PUBLIC): totals,
+                ("w", "2021-03-01", Workout.PUBLIC): totals,
+            },
+        )
+
+        # Same week, another day
+        self.create_program("2021-03-05T10:00:00Z")
+        self.assertEqual(
+            self.rollups(),
+            {
+                ("d", "2021-03-03", Workout.PUBLIC): totals,
+                ("d", "2021-03-05", Workout.PUBLIC): totals,
+                ("w", "2021-03-01", Workout.PUBLIC): (12, 180, 4),
+            },
+        )
+
+    def test_update_moves_volume(self):
+        workout = self.create_program()
+        data = self.workout_data("2021-03-10T10:00:00Z", Workout.PRIVATE, [(3, 15)])
+        response = self.client.put(
+            f"/api/workouts/{workout['id']}/", data, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.rollups(),
+            {
+                ("d", "2021-03-10", Workout.PRIVATE): (3, 45, 1),
+                ("w", "2021-03-08", Workout.PRIVATE): (3, 45, 1),
+            },
+        )
+
+    def test_exercise_instance_update_and_delete(self):
+        workout = self.create_program()
+        first, second = sorted(workout["exercise_instances"], key=lambda i: i["number"])
+        response = self.client.patch(first["url"], {"number": 30}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.rollups()[("w", "2021-03-01", Workout.PUBLIC)], (6, 150, 2)
+        )
+
+        self.assertEqual(self.client.delete(second["url"]).status_code, 204)
+        self.assertEqual(
+            self.rollups()[("w", "2021-03-01", Workout.PUBLIC)], (3, 90, 1)
+        )
+
+    def test_delete_removes_empty_rows(self):
+        first = self.create_program()
+        second = self.create_program()
+        self.assertEqual(
+            self.client.delete(f"/api/workouts/{first['id']}/").status_code, 204
+        )
+        self.assertEqual(
+            self.rollups()[("w", "2021-03-01", Workout.PUBLIC)], (6, 90, 2)
+        )
+
+        self.assertEqual(
+            self.client.delete(f"/api/workouts/{second['id']}/").status_code, 204
+        )
+        self.assertEqual(self.rollups(), {})
+
+
+class PersonalRecordTestCase(WorkoutFixturesMixin, TestCase):
+    """Personal records must hold the best number and volume of the user's history,
+    going to the earliest workout on ties, and be recomputed when the instance holding
+    a record is lowered or deleted.
+    """
+
+    def record(self):
+        record = PersonalRecord.objects.get(owner=self.user, exercise=self.exercise)
+        return (
+            record.best_number,
+            record.best_number_date.date().isoformat(),
+            record.best_volume,
+            record.best_volume_date.date().isoformat(),
+        )
+
+    def test_records_follow_writes(self):
+        first = self.create_workout(
+            "2021-03-01T10:00:00Z", Workout.PRIVATE, [(3, 10), (1, 20)]
+        )
+        self.assertEqual(self.record(), (20, "2021-03-01", 30, "2021-03-01"))
+
+        # Ties keep the earlier workout, improvements move the record
+        self.create_workout("2021-03-02T10:00:00Z", Workout.PRIVATE, [(2, 20), (5, 8)])
+        self.assertEqual(self.record(), (20, "2021-03-01", 40, "2021-03-02"))
+
+        # Deleting the workout holding the number record recomputes it
+        self.assertEqual(
+            self.client.delete(f"/api/workouts/{first['id']}/").status_code, 204
+        )
+        self.assertEqual(self.record(), (20, "2021-03-02", 40, "2021-03-02"))
+
+        second = Workout.objects.get()
+        instance = second.exercise_instances.get(number=20)
+        response = self.client.patch(
+            f"/api/exercise-instances/{instance.id}/", {"number": 5}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.record(), (8, "2021-03-02", 40, "2021-03-02"))
+
+        self.assertEqual(
+            self.client.delete(f"/api/workouts/{second.id}/").status_code, 204
+        )
+        self.assertFalse(PersonalRecord.objects.exists())
+
+    def test_backfill_matches_incremental_records(self):
+        self.create_workout("2021-03-01T10:00:00Z", Workout.PRIVATE, [(3, 10), (1, 20)])
+        self.create_workout("2021-03-02T10:00:00Z", Workout.PRIVATE, [(2, 20), (5, 8)])
+        record = self.record()
+        PersonalRecord.objects.all().delete()
+        call_command("backfill_personal_records", stdout=io.StringIO())
+        self.assertEqual(self.record(), record)
+
+
+class WorkoutExportTestCase(TestCase):
+    """The export contains every visible workout, including those without exercise
+    instances, in both formats.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        exercise = Exercise.objects.create(
+            name="=HYPERLINK()", description="", unit="reps"
+        )
+        self.workout = Workout.objects.create(
+            name="-2 sets", date=timezone.now(), notes="", owner=self.user
+        )
+        for number in [10, 12]:
+            ExerciseInstance.objects.create(
+                workout=self.workout, exercise=exercise, sets=3, number=number
+            )
+        self.empty_workout = Workout.objects.create(
+            name="Rest", date=timezone.now(), notes="@notes", owner=self.user
+        )
+        other = get_user_model().objects.create(username="other", email="o@secfit.no")
+        Workout.objects.create(
+            name="Hidden",
+            date=timezone.now(),
+            notes="",
+            owner=other,
+            visibility=Workout.PRIVATE,
+        )
+
+    def export(self, export_type):
+        response = self.client.get("/api/workouts/export/", {"type": export_type})
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.export("csv"))))
+        self.assertEqual(rows[0][0], "workout_id")
+        rows_by_workout = {}
+        for row in rows[1:]:
+            rows_by_workout.setdefault(int(row[0]), []).append(row)
+        self.assertEqual(set(rows_by_workout), {self.workout.id, self.empty_workout.id})
+
+        self.assertEqual(
+            [(row[1], row[6], row[9]) for row in rows_by_workout[self.workout.id]],
+            [("'-2 sets", "'=HYPERLINK()", "10"), ("'-2 sets", "'=HYPERLINK()", "12")],
+        )
+        (row,) = rows_by_workout[self.empty_workout.id]
+        self.assertEqual(
+            row[1:], ["Rest", row[2], "athlete", Workout.COACH, "'@notes", "", "", "", ""]
+        )
+
+    def test_ndjson(self):
+        records = {
+            record["id"]: record
+            for record in map(json.loads, self.export("ndjson").splitlines())
+        }
+        self.assertEqual(set(records), {self.workout.id, self.empty_workout.id})
+        self.assertEqual(records[self.workout.id]["name"], "-2 sets")
+        self.assertEqual(
+            [
+                exercise_instance["number"]
+                for exercise_instance in records[self.workout.id]["exercise_instances"]
+            ],
+            [10, 12],
+        )
+        self.assertEqual(records[self.empty_workout.id]["exercise_instances"], [])
+
+    def test_unknown_type_is_rejected(self):
+        response = self.client.get("/api/workouts/export/", {"type": "xlsx"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("type", response.data)
+
+
+class WorkoutBulkImportTestCase(TestCase):
+    """Every line of an NDJSON import is reported on, and lines or batches that fail do
+    not take the rest of the import down with them.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def workout_line(self, name):
+        return json.dumps(
+            {
+                "name": name,
+                "date": "2021-03-01T10:00:00Z",
+                "notes": "Easy",
+                "visibility": Workout.PRIVATE,
+                "exercise_instances": [],
+            }
+        ).encode()
+
+    def post(self, lines):
+        return self.client.post(
+            "/api/workouts/bulk/",
+            b"\n".join(lines),
+            content_type="application/x-ndjson",
+        )
+
+    def test_invalid_lines_are_reported(self):
+        response = self.post(
+            [
+                self.workout_line("First"),
+                b"{not json",
+                b"",
+                b'{"name": "\xff"}',
+                json.dumps({"name": "No date"}).encode(),
+                self.workout_line("Second"),
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["invalid"], 3)
+        self.assertEqual(
+            [(result["line"], result["status"]) for result in response.data["results"]],
+            [(1, "created"), (2, "invalid"), (4, "invalid"), (5, "invalid"), (6, "created")],
+        )
+        self.assertIn("encoding", response.data["results"][2]["errors"]["non_field_errors"][0])
+        self.assertEqual(
+            sorted(Workout.objects.values_list("name", flat=True)), ["First", "Second"]
+        )
+
+    def test_failed_batch_is_reported_and_others_are_kept(self):
+        create = WorkoutSerializer.create
+
+        def create_or_fail(serializer, validated_data):
+            if validated_data["name"] == "Broken":
+                raise IntegrityError("broken workout")
+            return create(serializer, validated_data)
+
+        lines = [self.workout_line(name) for name in ["A", "B", "C", "Broken", "E"]]
+        with mock.patch.object(WorkoutBulkImport, "batch_size", 2), mock.patch.object(
+            WorkoutSerializer, "create", create_or_fail
+        ):
+            response = self.post(lines)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual(response.data["failed"], 2)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["created", "created", "failed", "failed", "created"],
+        )
+        self.assertEqual(
+            sorted(Workout.objects.values_list("name", flat=True)), ["A", "B", "E"]
+        )
+
+
+class MediaFileResponseTestCase(TestCase):
+    """Workout files are served with validators, conditional responses and byte ranges."""
+
+    content = b"0123456789"
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name, MEDIA_ACCEL_REDIRECT_PREFIX=""
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        workout = Workout.objects.create(
+            name="Intervals", date=timezone.now(), notes="", owner=self.user
+        )
+        name = f"workouts/{workout.id}/notes.txt"
+        os.makedirs(os.path.join(media_root.name, f"workouts/{workout.id}"))
+        with open(os.path.join(media_root.name, name), "wb") as file:
+            file.write(self.content)
+        WorkoutFile.objects.create(
+            workout=workout, owner=self.user, file=name, content_hash="abc"
+        )
+        self.url = f"/media/{name}"
+
+    def get(self, **headers):
+        response = self.client.get(self.url, **headers)
+        body = b"".join(response.streaming_content) if response.streaming else b""
+        return response, body
+
+    def test_full_response(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+        self.assertEqual(response["ETag"], '"abc"')
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("must-revalidate", response["Cache-Control"])
+
+        response, _ = self.get(HTTP_IF_NONE_MATCH='"abc"')
+        self.assertEqual(response.status_code, 304)
+
+    def test_ranges(self):
+        for header, content_range, expected in [
+            ("bytes=2-4", "bytes 2-4/10", b"234"),
+            ("bytes=7-", "bytes 7-9/10", b"789"),
+            ("bytes=-3", "bytes 7-9/10", b"789"),
+            ("bytes=8-100", "bytes 8-9/10", b"89"),
+        ]:
+            with self.subTest(header):
+                response, body = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response["Content-Range"], content_range)
+                self.assertEqual(body, expected)
+
+    def test_invalid_range_is_ignored(self):
+        for header in ["bytes=5-3", "bytes=1-2,4-5", "items=0-1", "bytes=-"]:
+            with self.subTest(header):
+                response, body = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(body, self.content)
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.get(HTTP_RANGE="bytes=10-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_if_range(self):
+        last_modified = self.get()[0]["Last-Modified"]
+        for if_range, status in [
+            ('"abc"', 206),
+            ('"stale"', 200),
+            ('W/"abc"', 200),
+            (last_modified, 206),
+            ("Thu, 01 Jan 2015 00:00:00 GMT", 200),
+        ]:
+            with self.subTest(if_range):
+                response, _ = self.get(HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE=if_range)
+                self.assertEqual(response.status_code, status)
+
+
+class ThumbnailTestCase(TestCase):
+    """Uploaded images get WebP and JPEG thumbnails next to them, which are replaced with
+    their files when the image is.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        self.workout = Workout.objects.create(
+            name="Intervals", date=timezone.now(), notes="", owner=self.user
+        )
+
+    def image(self, name, size, pillow_format):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, (200, 50, 50)).save(buffer, format=pillow_format)
+        return ContentFile(buffer.getvalue(), name=name)
+
+    def upload(self, file):
+        return WorkoutFile.objects.create(workout=self.workout, owner=self.user, file=file)
+
+    def stored_files(self):
+        directory = os.path.join(self.media_root.name, f"workouts/{self.workout.id}")
+        return sorted(os.listdir(directory))
+
+    def test_thumbnails_of_png(self):
+        workout_file = self.upload(self.image("photo.png", (1000, 500), "PNG"))
+        thumbnails = list(workout_file.thumbnails.all())
+        self.assertEqual(
+            [(thumbnail.width, thumbnail.format) for thumbnail in thumbnails],
+            [(320, "jpeg"), (320, "webp"), (640, "jpeg"), (640, "webp")],
+        )
+        for thumbnail in thumbnails:
+            self.assertEqual(
+                os.path.dirname(thumbnail.file.name), f"workouts/{self.workout.id}"
+            )
+            with thumbnail.file.open("rb") as file:
+                image = Image.open(file)
+                self.assertEqual(image.format.lower(), thumbnail.format)
+                self.assertEqual(image.size, (thumbnail.width, thumbnail.width // 2))
+
+        data = WorkoutFileSerializer(
+            workout_file, context={"request": RequestFactory().get("/")}
+        ).data
+        self.assertEqual(
+            [(thumbnail["width"], thumbnail["format"]) for thumbnail in data["thumbnails"]],
+            [(320, "jpeg"), (320, "webp"), (640, "jpeg"), (640, "webp")],
+        )
+        self.assertTrue(data["thumbnails"][0]["file"].endswith("/photo_320w.jpg"))
+
+    def test_small_bmp_is_reencoded_at_its_own_width(self):
+        workout_file = self.upload(self.image("photo.bmp", (100, 60), "BMP"))
+        self.assertEqual(
+            list(workout_file.thumbnails.values_list("width", "format")),
+            [(100, "jpeg"), (100, "webp")],
+        )
+
+    def test_non_image_gets_no_thumbnails(self):
+        workout_file = self.upload(ContentFile(b"not an image", name="notes.png"))
+        self.assertFalse(workout_file.thumbnails.exists())
+
+    def test_replaced_image_leaves_no_thumbnail_files(self):
+        workout_file = self.upload(self.image("photo.png", (1000, 500), "PNG"))
+        workout_file.file = self.image("other.png", (400, 200), "PNG")
+        workout_file.save()
+        self.assertEqual(
+            self.stored_files(),
+            ["other.png", "other_320w.jpg", "other_320w.webp", "photo.png"],
+        )
+
+
+class ExerciseCatalogTestCase(SharedCacheMixin, TestCase):
+    """The full exercise catalog must be revalidated without queries until an exercise
+    changes, with an ETag per media type.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        for i in range(15):
+            Exercise.objects.create(name=f"Exercise {i}", description="", unit="reps")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_catalog_is_cached_and_revalidated(self):
+        response = self.client.get("/api/exercises/?catalog=full")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 15)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                "/api/exercises/?catalog=full", HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/exercises/?catalog=full")
+        self.assertEqual(response.status_code, 200)
+
+        Exercise.objects.create(name="Pull-up", description="", unit="reps")
+        response = self.client.get(
+            "/api/exercises/?catalog=full", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["count"], 16)
+
+    def test_etag_depends_on_media_type(self):
+        response = self.client.get("/api/exercises/?catalog=full")
+        self.assertIn("Accept", response["Vary"].split(", "))
+        etag = response["ETag"]
+
+        response = self.client.get(
+            "/api/exercises/?catalog=full",
+            HTTP_ACCEPT="application/msgpack",
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(msgpack.unpackb(response.content)["count"], 15)
+
+    def test_process_local_cache_is_not_used(self):
+        with override_settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        ):
+            etag = self.client.get("/api/exercises/?catalog=full")["ETag"]
+            # The catalog is built again and identified by its content
+            with self.assertNumQueries(1):
+                response = self.client.get(
+                    "/api/exercises/?catalog=full", HTTP_IF_NONE_MATCH=etag
+                )
+            self.assertEqual(response.status_code, 304)
+
+            Exercise.objects.filter(name="Exercise 0").update(name="Squat")
+            response = self.client.get(
+                "/api/exercises/?catalog=full", HTTP_IF_NONE_MATCH=etag
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+
+
+class SearchTestCase(TestCase):
+    """Search must rank name matches first and only return workouts the user may see."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username="athlete", email="athlete@secfit.no"
+        )
+        self.other = get_user_model().objects.create(
+            username="other", email="other@secfit.no"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_workout(self, name, notes, owner=None, visibility=Workout.PUBLIC):
+        return Workout.objects.create(
+            name=name,
+            date=timezone.now(),
+            notes=notes,
+            owner=owner or self.user,
+            visibility=visibility,
+        )
+
+    def test_workouts_are_ranked_and_visible(self):
+        in_notes = self.create_workout("Legs", "Finished with a long run")
+        in_name = self.create_workout("Morning run", "Easy pace")
+        self.create_workout("Run hidden", "", owner=self.other, visibility=Workout.PRIVATE)
+        public = self.create_workout("Swim", "No running today", owner=self.other)
+
+        response = self.client.get("/api/workouts/search/", {"q": "run"})
+        self.assertEqual(response.status_code, 200)
+        ids = [workout["id"] for workout in response.data["results"]]
+        self.assertEqual(ids[0], in_name.id)
+        self.assertEqual(sorted(ids[1:]), sorted([in_notes.id, public.id]))
+
+        in_name.name = "Morning swim"
+        in_name.notes = ""
+        in_name.save()
+        response = self.client.get("/api/workouts/search/", {"q": "morning run"})
+        self.assertEqual(response.data["count"], 0)
+
+    def test_query_is_required(self):
+        response = self.client.get("/api/workouts/search/")
+        self.assertEqual(response.status_code, 400)
+
+    def test_exercises(self):
+        Exercise.objects.create(name="Plank", description="Hold a push-up position", unit="s")
+        push_up = Exercise.objects.create(name="Push-up", description="", unit="reps")
+        response = self.client.get("/api/exercises/search/", {"q": 'push "up'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["results"][0]["id"], push_up.id)
+
+
+class ExpandableFieldsTestCase(WorkoutFixturesMixin, TestCase):
+    """?fields= must trim the response and ?expand= must inline relations without a query
+    per row.
+    """
+
+    def test_fields_trims_response(self):
+        self.create_workouts(2)
+        response = self.client.get("/api/workouts/", {"fields": "id,name"})
+        self.assertEqual(response.status_code, 200)
+        for workout in response.data["results"]:
+            self.assertEqual(set(workout), {"id", "name"})
+
+    def test_expand_is_prefetched(self):
+        self.create_workouts(1)
+        with self.assertNumQueries(5):
+            response = self.client.get("/api/workouts/", {"expand": "owner"})
+        self.assertEqual(response.data["results"][0]["owner"]["username"], "athlete")
+
+        # count, page, and one query per expanded relation
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                "/api/exercise-instances/", {"expand": "exercise,workout"}
+            )
+        self.create_workouts(4)
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                "/api/exercise-instances/", {"expand": "exercise,workout"}
+            )
+        instance = response.data["results"][0]
+        self.assertEqual(instance["exercise"]["name"], "Push-up")
+        self.assertIn("name", instance["workout"])
+        # nested serializers are not expanded
+        response = self.client.get("/api/workouts/", {"expand": "exercise"})
+        exercise = response.data["results"][0]["exercise_instances"][0]["exercise"]
+        self.assertTrue(exercise.startswith("http://testserver/api/exercises/"))
+
+
+class RendererTestCase(WorkoutFixturesMixin, TestCase):
+    """The orjson and MessagePack renderers must encode the same document as DRF's
+    JSONRenderer.
+    """
+
+    def test_renderers_match_json_renderer(self):
+        self.create_workouts(3)
+        Workout.objects.update(notes="Intervals \u2028 – stretch")
+        response = self.client.get("/api/workouts/")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+        response = self.client.get("/api/workouts/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(
+            msgpack.unpackb(response.content),
+            self.client.get("/api/workouts/").json(),
+        )
+
+    def test_json_is_parsed(self):
+        response = self.client.post(
+            "/api/workouts/",
+            '{"name": "Run", "date": "2021-03-01T10:00:00Z", "notes": "Easy",'
+            ' "visibility": "PU", "exercise_instances": []}',
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post(
+            "/api/workouts/", "{", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class CompressionTestCase(WorkoutFixturesMixin, TestCase):
+    """Large API responses must be compressed with the best coding the client accepts."""
+
+    def test_negotiated_compression(self):
+        self.create_workouts(10)
+        plain = self.client.get("/api/workouts/")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+
+        response = self.client.get("/api/workouts/", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+        response = self.client.get(
+            "/api/workouts/", HTTP_ACCEPT_ENCODING="gzip, br;q=0"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get("/api/exercises/", HTTP_ACCEPT_ENCODING="br")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_streaming_responses_are_not_compressed(self):
+        self.create_workouts(10)
+        response = self.client.get(
+            "/api/workouts/export/", {"type": "ndjson"}, HTTP_ACCEPT_ENCODING="br"
+        )
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_excluded_responses(self):
+        body = json.dumps(["workout"] * 1000)
+
+        def compress(path, status=200, **headers):
+            response = HttpResponse(body, content_type="application/json", status=status)
+            for header, value in headers.items():
+                response[header] = value
+            request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING="br")
+            return CompressionMiddleware(lambda request: response)(request)
+
+        self.assertEqual(compress("/api/workouts/")["Content-Encoding"], "br")
+        # Partial content must keep the byte offsets of the identity representation
+        self.assertFalse(compress("/api/workouts/", 206).has_header("Content-Encoding"))
+        response = compress("/api/workouts/", **{"Content-Range": "bytes 0-9/7002"})
+        self.assertFalse(response.has_header("Content-Encoding"))
+        response = compress("/api/workouts/", **{"Content-Encoding": "gzip"})
+        self.assertEqual(response.content, body.encode())
+        # Tokens are not compressed next to reflected input, against BREACH
+        for path in ["/api/token/", "/api/token/refresh/", "/api/remember_me/"]:
+            self.assertFalse(compress(path).has_header("Content-Encoding"))
+
+
+class FeedCacheTestCase(SharedCacheMixin, TransactionTestCase):
+    """The first feed page must be served from a shared cache, or a local one when a
+    single web process serves every request, until a change that shows up in it is
+    committed, and only then.
+    """
+
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.coach = User.objects.create(username="coach", email="coach@secfit.no")
+        self.athlete = User.objects.create(username="athlete", email="athlete@secfit.no")
+        self.other = User.objects.create(username="other", email="other@secfit.no")
+        self.exercise = Exercise.objects.create(name="Push-up", description="", unit="reps")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.coach)
+
+    def create_workout(self, owner, visibility):
+        return Workout.objects.create(
+            name="Workout", date=timezone.now(), notes="", owner=owner, visibility=visibility
+        )
+
+    def assertCached(self, cached, count):
+        hits = metrics.FEED_CACHE.labels(result="hit")._value.get()
+        response = self.client.get("/api/workouts/", {"ordering": "-date"})
+        self.assertEqual(response.data["count"], count)
+        self.assertEqual(metrics.FEED_CACHE.labels(result="hit")._value.get() - hits, cached)
+
+    def test_feed_is_cached_and_invalidated(self):
+        workout = self.create_workout(self.athlete, Workout.COACH)
+        self.assertCached(False, 0)
+        self.assertCached(True, 0)
+
+        # a private workout of someone else does not show up in the feed
+        self.create_workout(self.other, Workout.PRIVATE)
+        self.assertCached(True, 0)
+
+        self.create_workout(self.other, Workout.PUBLIC)
+        self.assertCached(False, 1)
+        self.assertCached(True, 1)
+
+        # becoming the athlete's coach reveals their coach workouts
+        self.client.put(
+            f"/api/users/{self.coach.id}/", {"athletes": [self.athlete.id]}, format="json"
+        )
+        self.assertCached(False, 2)
+
+        ExerciseInstance.objects.create(
+            workout=workout, exercise=self.exercise, sets=3, number=10
+        )
+        response = self.client.get("/api/workouts/", {"ordering": "-date"})
+        self.assertEqual(len(response.data["results"][1]["exercise_instances"]), 1)
+
+        workout.visibility = Workout.PRIVATE
+        workout.save()
+        self.assertCached(False, 1)
+
+        # uncacheable requests bypass the cache
+        self.assertEqual(
+            self.client.get("/api/workouts/", {"ordering": "notes"}).data["count"], 1
+        )
+
+    def test_changes_are_compared_with_the_database(self):
+        self.client.put(
+            f"/api/users/{self.coach.id}/", {"athletes": [self.athlete.id]}, format="json"
+        )
+        workout = self.create_workout(self.athlete, Workout.COACH)
+        self.assertCached(False, 1)
+
+        # An instance that was not loaded from the database, as a serializer may build
+        # one, still invalidates the feeds the workout leaves
+        Workout(
+            pk=workout.pk,
+            name="Workout",
+            date=workout.date,
+            notes="",
+            owner=self.athlete,
+            visibility=Workout.PRIVATE,
+        ).save()
+        self.assertCached(False, 0)
+
+        self.create_workout(self.athlete, Workout.COACH)
+        self.assertCached(False, 1)
+        athlete = get_user_model().objects.get(pk=self.athlete.pk)
+        get_user_model().objects.filter(pk=self.athlete.pk).update(coach=None)
+        get_user_model().objects.filter(pk=self.athlete.pk).update(coach=self.coach)
+        # The coach saved is the one in the database, so nothing changes
+        athlete.save()
+        self.assertCached(True, 1)
+        athlete.coach = None
+        athlete.save(update_fields=["coach"])
+        self.assertCached(False, 0)
+
+    def process_local_caches(self, web_concurrency):
+        return override_settings(
+            CACHES={
+                alias: {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": f"{alias}-{self.id()}",
+                }
+                for alias in ["default", "feed"]
+            },
+            WEB_CONCURRENCY=web_concurrency,
+        )
+
+    def test_process_local_cache_is_not_used_by_several_processes(self):
+        for web_concurrency in [None, 2]:
+            with self.process_local_caches(web_concurrency):
+                self.create_workout(self.other, Workout.PUBLIC)
+                self.assertCached(False, Workout.objects.count())
+                self.assertCached(False, Workout.objects.count())
+
+    def test_process_local_cache_is_used_by_a_single_process(self):
+        with self.process_local_caches(1):
+            self.assertEqual(get_feed_timeout(), LOCAL_FEED_TIMEOUT)
+            self.create_workout(self.other, Workout.PUBLIC)
+            self.assertCached(False, 1)
+            self.assertCached(True, 1)
+
+            self.create_workout(self.other, Workout.PUBLIC)
+            self.assertCached(False, 2)
@@ -0,0 +1,67 @@
+"""Generation of downscaled derivatives (thumbnails) of uploaded workout images
+"""
+import os
+from io import BytesIO
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Widths (in pixels) of the generated thumbnails
+THUMBNAIL_WIDTHS = [320, 640, 1280]
+
+# Pillow format name and file extension of each generated thumbnail format
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", ".webp"),
+    "jpeg": ("JPEG", ".jpg"),
+}
+THUMBNAIL_QUALITY = 80
+
+
+def create_thumbnails(workout_file):
+    """Replaces the thumbnails of a WorkoutFile with new ones generated from its image.
+
+    A WebP and a JPEG thumbnail is stored next to the original for every width in
+    THUMBNAIL_WIDTHS that is narrower than the image. Images narrower than all of them get a
+    single re-encoded copy at their own width. Files that Pillow cannot read get none.
+
+    Args:
+        workout_file (WorkoutFile): The saved WorkoutFile
+    """
+    workout_file.thumbnails.all().delete()
+    try:
+        with workout_file.file.open("rb") as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            image.load()
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = "transparency" in image.info or image.mode in ("LA", "PA")
+            image = image.convert("RGBA" if has_alpha else "RGB")
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return
+
+    widths = [width for width in THUMBNAIL_WIDTHS if width < image.width] or [image.width]
+    stem = os.path.splitext(os.path.basename(workout_file.file.name))[0]
+    for width in widths:
+        height = max(round(image.height * width / image.width), 1)
+        resized = image.resize((width, height), Image.LANCZOS)
+        for format_name, (pillow_format, extension) in THUMBNAIL_FORMATS.items():
+            thumbnail = workout_file.thumbnails.model(
+                workout_file=workout_file, width=width, format=format_name
+            )
+            thumbnail.file.save(
+                f"{stem}_{width}w{extension}",
+                ContentFile(encode(resized, pillow_format)),
+                save=False,
+            )
+            thumbnail.save()
+
+
+def encode(image, pillow_format):
+    """Encodes an RGB or RGBA image in the given Pillow format and returns the bytes.
+    Transparent areas are flattened onto white for JPEG.
+    """
+    if pillow_format == "JPEG" and image.mode == "RGBA":
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, format=pillow_format, quality=THUMBNAIL_QUALITY)
+    return buffer.getvalue()
@@ -11,17 +11,42 @@ urlpatterns = format_suffix_patterns(
     [
         path("", views.api_root),
         path("api/workouts/", views.WorkoutList.as_view(), name="workout-list"),
+        path(
+            "api/workouts/export/",
+            views.WorkoutExport.as_view(),
+            name="workout-export",
+        ),
+        path(
+            "api/workouts/search/",
+            views.WorkoutSearch.as_view(),
+            name="workout-search",
+        ),
+        path(
+            "api/workouts/bulk/",
+            views.WorkoutBulkImport.as_view(),
+            name="workout-bulk-import",
+        ),
         path(
             "api/workouts/<int:pk>/",
             views.WorkoutDetail.as_view(),
             name="workout-detail",
         ),
         path("api/exercises/", views.ExerciseList.as_view(), name="exercise-list"),
+        path(
+            "api/exercises/search/",
+            views.ExerciseSearch.as_view(),
+            name="exercise-search",
+        ),
         path(
             "api/exercises/<int:pk>/",
             views.ExerciseDetail.as_view(),
             name="exercise-detail",
         ),
+        path(
+            "api/exercises/<int:pk>/instances/",
+            views.ExerciseInstancesOfExercise.as_view(),
+            name="exercise-instances",
+        ),
         path(
             "api/exercise-instances/",
             views.ExerciseInstanceList.as_view(),
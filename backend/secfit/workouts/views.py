@@ -3,14 +3,15 @@
 from rest_framework import generics, mixins, views
 from rest_framework import permissions
 
-from rest_framework.parsers import (
-    JSONParser,
-)
+from secfit.parsers import OrjsonParser
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework import status
 from rest_framework.reverse import reverse
-from django.db.models import Q
+from django.db.models import Prefetch, Q, prefetch_related_objects
 from rest_framework import filters
-from workouts.parsers import MultipartJsonParser
+from workouts.parsers import MultipartJsonParser, NDJSONParser
 from workouts.permissions import (
     IsOwner,
     IsCoachAndVisibleToCoach,
@@ -21,15 +22,33 @@ from workouts.permissions import (
     IsWorkoutPublic,
     IsUserAllowedToViewWorkoutFile
 )
-from workouts.mixins import CreateListModelMixin
-from workouts.models import Workout, Exercise, ExerciseInstance, WorkoutFile
-from workouts.serializers import WorkoutSerializer, ExerciseSerializer
+from workouts.mixins import CreateListModelMixin, MediaFileResponseMixin
+from workouts.search import SearchMixin
+from workouts.catalog import get_catalog_digest, get_catalog_version, get_cached_catalog
+from workouts.feed import get_cached_feed
+from workouts.history import (
+    apply_exercise_instance_change,
+    snapshot,
+    snapshot_instances,
+)
+from workouts.models import (
+    Workout,
+    Exercise,
+    ExerciseInstance,
+    WorkoutFile,
+    WorkoutFileThumbnail,
+)
+from workouts.serializers import WorkoutSerializer, ExerciseSerializer, ExerciseCatalogSerializer
 from workouts.serializers import ExerciseInstanceSerializer, WorkoutFileSerializer
 from django.core.exceptions import PermissionDenied
 from rest_framework_simplejwt.tokens import RefreshToken
+import csv
 import json
-from django.http import FileResponse, Http404
+from itertools import islice
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.db import DatabaseError, transaction
 
 @api_view(["GET"])
 def api_root(request, format=None):
@@ -55,6 +74,9 @@ class WorkoutList(
     """Class defining the web response for the creation of a Workout, or displaying a list
     of Workouts
 
+    The first page, with no query parameters other than a valid ordering, is cached per
+    user and ordering until a change to a workout in it, see workouts.feed.
+
     HTTP methods: GET, POST
     """
 
@@ -64,13 +86,34 @@ class WorkoutList(
     ]  # User must be authenticated to create/view workouts
     parser_classes = [
         MultipartJsonParser,
-        JSONParser,
+        OrjsonParser,
     ]  # For parsing JSON and Multi-part requests
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ["name", "date", "owner__username"]
 
     def get(self, request, *args, **kwargs):
-        return self.list(request, *args, **kwargs)
+        ordering = self.get_cached_ordering(request)
+        if ordering is None:
+            return self.list(request, *args, **kwargs)
+        data = get_cached_feed(
+            request.user.pk,
+            ordering,
+            request.build_absolute_uri("/"),
+            lambda: self.list(request, *args, **kwargs).data,
+        )
+        return Response(data)
+
+    def get_cached_ordering(self, request):
+        """Returns the ordering of a request for a cacheable first page, or None if the
+        page is not cached. Only valid orderings are cached, so keys stay bounded.
+        """
+        if set(request.query_params) - {"ordering"}:
+            return None
+        ordering = request.query_params.get("ordering", "")
+        for field in filter(None, ordering.split(",")):
+            if field.strip().lstrip("-") not in self.ordering_fields:
+                return None
+        return ordering
 
     def post(self, request, *args, **kwargs):
         return self.create(request, *args, **kwargs)
@@ -81,17 +124,258 @@ class WorkoutList(
     def get_queryset(self):
         qs = Workout.objects.none()
         if self.request.user:
-            # A workout should be visible to the requesting user if any of the following hold:
-            # - The workout has public visibility
-            # - The owner of the workout is the requesting user
-            # - The workout has coach visibility and the requesting user is the owner's coach
-            qs = Workout.objects.filter(
-                Q(visibility="PU")
-                | Q(owner=self.request.user)
-                | (Q(visibility="CO") & Q(owner__coach=self.request.user))
-            ).distinct()
+            qs = Workout.objects.visible_to(self.request.user)
 
-        return qs
+        return WorkoutSerializer.setup_eager_loading(qs)
+
+
+class WorkoutSearch(SearchMixin, mixins.ListModelMixin, generics.GenericAPIView):
+    """Class defining the web response for a full-text search of the workouts the user
+    may see, by name and notes.
+
+    Query parameters: q (words that must all occur). Results are ordered by relevance.
+
+    HTTP methods: GET
+    """
+
+    serializer_class = WorkoutSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        qs = self.search(Workout.objects.visible_to(self.request.user))
+        return WorkoutSerializer.setup_eager_loading(qs)
+
+
+class Echo:
+    """File-like object that returns what is written to it instead of buffering it, so
+    csv.writer can be used to produce the rows of a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+class WorkoutExport(WorkoutList):
+    """Class defining the web response for exporting every Workout visible to the user,
+    with its ExerciseInstances, as CSV (one row per exercise instance, or a single row with
+    empty exercise columns for a workout without any) or NDJSON (one workout per line).
+    Select the format with ?type=csv or ?type=ndjson.
+
+    The workouts are read with a server-side iterator and streamed to the client, and the
+    exercise instances are prefetched per chunk of workouts, so the export is neither
+    paginated nor held in memory.
+
+    HTTP methods: GET
+    """
+
+    http_method_names = ["get", "head", "options"]
+    chunk_size = 2000
+    export_types = ["csv", "ndjson"]
+    csv_header = [
+        "workout_id",
+        "workout_name",
+        "date",
+        "owner",
+        "visibility",
+        "notes",
+        "exercise",
+        "unit",
+        "sets",
+        "number",
+    ]
+    # Leading characters that make spreadsheet applications evaluate a cell as a formula
+    csv_formula_prefixes = ("=", "+", "-", "@", "\t", "\r")
+
+    def get(self, request, *args, **kwargs):
+        export_type = request.query_params.get("type", "csv")
+        if export_type not in self.export_types:
+            raise ValidationError(
+                {"type": [f"Expected one of {', '.join(self.export_types)}."]}
+            )
+
+        workouts = self.iterate_workouts(
+            Workout.objects.filter(pk__in=self.get_queryset().order_by().values("pk"))
+            .select_related("owner")
+            .order_by("-date", "id")
+        )
+        if export_type == "ndjson":
+            response = StreamingHttpResponse(
+                self.ndjson_lines(workouts), content_type="application/x-ndjson"
+            )
+        else:
+            response = StreamingHttpResponse(
+                self.csv_rows(workouts), content_type="text/csv"
+            )
+        response["Content-Disposition"] = f'attachment; filename="workouts.{export_type}"'
+        return response
+
+    def iterate_workouts(self, workouts):
+        """Yields the workouts of a queryset from a server-side iterator, with their
+        exercise instances prefetched one chunk of workouts at a time.
+        """
+        iterator = workouts.iterator(chunk_size=self.chunk_size)
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                return
+            prefetch_related_objects(
+                chunk,
+                Prefetch(
+                    "exercise_instances",
+                    queryset=ExerciseInstance.objects.select_related("exercise").order_by(
+                        "id"
+                    ),
+                ),
+            )
+            yield from chunk
+
+    def csv_rows(self, workouts):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.csv_header)
+        for workout in workouts:
+            columns = [
+                workout.id,
+                self.csv_cell(workout.name),
+                workout.date.isoformat(),
+                self.csv_cell(workout.owner.username),
+                workout.visibility,
+                self.csv_cell(workout.notes),
+            ]
+            exercise_instances = workout.exercise_instances.all()
+            if not exercise_instances:
+                yield writer.writerow(columns + ["", "", "", ""])
+            for exercise_instance in exercise_instances:
+                yield writer.writerow(
+                    columns
+                    + [
+                        self.csv_cell(exercise_instance.exercise.name),
+                        self.csv_cell(exercise_instance.exercise.unit),
+                        exercise_instance.sets,
+                        exercise_instance.number,
+                    ]
+                )
+
+    def csv_cell(self, value):
+        """Returns a text cell quoted so spreadsheet applications do not run it as a
+        formula.
+        """
+        if value.startswith(self.csv_formula_prefixes):
+            return "'" + value
+        return value
+
+    def ndjson_lines(self, workouts):
+        for workout in workouts:
+            record = {
+                "id": workout.id,
+                "name": workout.name,
+                "date": workout.date.isoformat(),
+                "notes": workout.notes,
+                "owner_username": workout.owner.username,
+                "visibility": workout.visibility,
+                "exercise_instances": [
+                    {
+                        "exercise": exercise_instance.exercise.name,
+                        "unit": exercise_instance.exercise.unit,
+                        "sets": exercise_instance.sets,
+                        "number": exercise_instance.number,
+                    }
+                    for exercise_instance in workout.exercise_instances.all()
+                ],
+            }
+            yield json.dumps(record) + "\n"
+
+
+class WorkoutBulkImport(generics.GenericAPIView):
+    """Class defining the web response for importing many Workouts in one request.
+
+    The body is newline-delimited JSON with one workout per line, in the same format as
+    accepted by WorkoutList. It is read and validated one line at a time, valid workouts are
+    inserted in batched transactions, and the response reports the outcome of every line.
+    A batch that fails to save is rolled back and reported as failed, while the batches
+    before and after it are kept.
+
+    HTTP methods: POST
+    """
+
+    serializer_class = WorkoutSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [NDJSONParser]
+    batch_size = 100
+
+    def post(self, request, *args, **kwargs):
+        results = []
+        batch = []
+        for line_number, line in enumerate(request.data, start=1):
+            if isinstance(line, UnicodeDecodeError):
+                results.append(
+                    self.line_error(line_number, "invalid", f"Invalid encoding: {line}")
+                )
+                continue
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError as error:
+                results.append(
+                    self.line_error(line_number, "invalid", f"Invalid JSON: {error}")
+                )
+                continue
+
+            serializer = self.get_serializer(data=data)
+            if not serializer.is_valid():
+                results.append(
+                    {"line": line_number, "status": "invalid", "errors": serializer.errors}
+                )
+                continue
+
+            batch.append((line_number, serializer))
+            if len(batch) >= self.batch_size:
+                results.extend(self.save_batch(batch))
+                batch = []
+        results.extend(self.save_batch(batch))
+
+        results.sort(key=lambda result: result["line"])
+        counts = {"created": 0, "invalid": 0, "failed": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        return Response({**counts, "results": results}, status=status.HTTP_200_OK)
+
+    def line_error(self, line_number, line_status, message):
+        """Returns the status report of a line that was not imported."""
+        return {
+            "line": line_number,
+            "status": line_status,
+            "errors": {"non_field_errors": [message]},
+        }
+
+    def save_batch(self, batch):
+        """Saves a batch of validated workouts in a single transaction.
+
+        Args:
+            batch (list): (line number, validated WorkoutSerializer) pairs
+
+        Returns:
+            list: The status report of each line in the batch. If saving fails, the
+                batch is rolled back and every line in it is reported as failed.
+        """
+        try:
+            with transaction.atomic():
+                return [
+                    {
+                        "line": line_number,
+                        "status": "created",
+                        "id": serializer.save(owner=self.request.user).id,
+                    }
+                    for line_number, serializer in batch
+                ]
+        except DatabaseError as error:
+            return [
+                self.line_error(line_number, "failed", f"Could not be saved: {error}")
+                for line_number, _ in batch
+            ]
 
 
 class WorkoutDetail(
@@ -105,13 +389,13 @@ class WorkoutDetail(
     HTTP methods: GET, PUT, DELETE
     """
 
-    queryset = Workout.objects.all()
+    queryset = WorkoutSerializer.setup_eager_loading(Workout.objects.all())
     serializer_class = WorkoutSerializer
     permission_classes = [
         permissions.IsAuthenticated
         & (IsOwner | (IsReadOnly & (IsCoachAndVisibleToCoach | IsPublic)))
     ]
-    parser_classes = [MultipartJsonParser, JSONParser]
+    parser_classes = [MultipartJsonParser, OrjsonParser]
 
     def get(self, request, *args, **kwargs):
         return self.retrieve(request, *args, **kwargs)
@@ -122,7 +406,14 @@ class WorkoutDetail(
     def delete(self, request, *args, **kwargs):
         return self.destroy(request, *args, **kwargs)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        history = snapshot(instance, instance.exercise_instances.all())
+        instance.delete()
+        apply_exercise_instance_change(history, [])
+
 class WorkoutFileResponse(
+    MediaFileResponseMixin,
     views.APIView
 ):
     permission_classes = [
@@ -131,24 +422,22 @@ class WorkoutFileResponse(
 
     def get(self, request, *args, **kwargs):
         obj = self.get_object()
-        
-        path = f'{settings.MEDIA_ROOT}/{obj.file}'
-        return FileResponse(open(path, 'rb'))
+        return self.file_response(request, obj)
 
     
     def get_object(self):
         """
-        Returns the object the view is displaying.
-
-        You may want to override this if you need to provide non-standard
-        queryset lookups.  Eg if objects are referenced using multiple
-        keyword arguments in the url conf.
+        Returns the object the view is displaying: the WorkoutFile, or the
+        WorkoutFileThumbnail, stored at the path given in the url.
         """
-        try:
-            obj = WorkoutFile.objects.get(
-                Q(workout=self.kwargs['workout_id']) & Q(file=f'workouts/{self.kwargs["workout_id"]}/{self.kwargs["filename"]}')
-            )
-        except:
+        path = f'workouts/{self.kwargs["workout_id"]}/{self.kwargs["filename"]}'
+        obj = (
+            WorkoutFile.objects.filter(workout=self.kwargs["workout_id"], file=path).first()
+            or WorkoutFileThumbnail.objects.select_related("workout_file__workout")
+            .filter(workout_file__workout=self.kwargs["workout_id"], file=path)
+            .first()
+        )
+        if obj is None:
             raise Http404("Media does not exist")
 
         self.check_object_permissions(self.request, obj)
@@ -161,20 +450,75 @@ class ExerciseList(
     """Class defining the web response for the creation of an Exercise, or
     a list of Exercises.
 
+    With ?catalog=full the whole catalog is returned unpaginated and without
+    instance counts. It is cached server-side per catalog version and served
+    with a strong ETag per media type, so clients revalidate it with a 304 until
+    an exercise is saved or deleted.
+
     HTTP methods: GET, POST
     """
 
-    queryset = Exercise.objects.all()
+    queryset = ExerciseSerializer.setup_eager_loading(Exercise.objects.all())
     serializer_class = ExerciseSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
+        if request.query_params.get("catalog") == "full":
+            return self.catalog(request)
         return self.list(request, *args, **kwargs)
 
+    def catalog(self, request):
+        data = None
+        version = get_catalog_version()
+        if version is None:
+            # Without a shared cache the catalog is built for every request
+            data = self.build_catalog(request)
+            version = get_catalog_digest(data)
+        # JSON and MessagePack renderings are different representations
+        etag = f'"exercise-catalog-{version}-{request.accepted_renderer.format}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            if data is None:
+                data = get_cached_catalog(
+                    version,
+                    request.build_absolute_uri("/"),
+                    lambda: self.build_catalog(request),
+                )
+            response = Response(data)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ["Accept"])
+        return response
+
+    def build_catalog(self, request):
+        exercises = ExerciseCatalogSerializer(
+            Exercise.objects.order_by("id"), many=True, context={"request": request}
+        ).data
+        return {"count": len(exercises), "results": exercises}
+
     def post(self, request, *args, **kwargs):
         return self.create(request, *args, **kwargs)
 
 
+class ExerciseSearch(SearchMixin, mixins.ListModelMixin, generics.GenericAPIView):
+    """Class defining the web response for a full-text search of the exercises, by name
+    and description.
+
+    Query parameters: q (words that must all occur). Results are ordered by relevance.
+
+    HTTP methods: GET
+    """
+
+    serializer_class = ExerciseSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return ExerciseSerializer.setup_eager_loading(self.search(Exercise.objects.all()))
+
+
 class ExerciseDetail(
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
@@ -186,7 +530,7 @@ class ExerciseDetail(
     HTTP methods: GET, PUT, PATCH, DELETE
     """
 
-    queryset = Exercise.objects.all()
+    queryset = ExerciseSerializer.setup_eager_loading(Exercise.objects.all())
     serializer_class = ExerciseSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -203,6 +547,26 @@ class ExerciseDetail(
         return self.destroy(request, *args, **kwargs)
 
 
+class ExerciseInstancesOfExercise(mixins.ListModelMixin, generics.GenericAPIView):
+    """Class defining the web response for the paginated list of the instances of an
+    Exercise, limited to the workouts visible to the user.
+
+    HTTP methods: GET
+    """
+
+    serializer_class = ExerciseInstanceSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return ExerciseInstance.objects.filter(
+            exercise_id=self.kwargs["pk"],
+            workout__in=Workout.objects.visible_to(self.request.user).values("pk"),
+        ).order_by("id")
+
+
 class ExerciseInstanceList(
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
@@ -220,6 +584,14 @@ class ExerciseInstanceList(
     def post(self, request, *args, **kwargs):
         return self.create(request, *args, **kwargs)
 
+    @transaction.atomic
+    def perform_create(self, serializer):
+        serializer.save()
+        exercise_instances = serializer.instance
+        if not isinstance(exercise_instances, list):
+            exercise_instances = [exercise_instances]
+        apply_exercise_instance_change([], snapshot_instances(exercise_instances))
+
     def get_queryset(self):
         qs = ExerciseInstance.objects.none()
         if self.request.user:
@@ -240,6 +612,7 @@ class ExerciseInstanceDetail(
     mixins.DestroyModelMixin,
     generics.GenericAPIView,
 ):
+    queryset = ExerciseInstance.objects.select_related("workout")
     serializer_class = ExerciseInstanceSerializer
     permission_classes = [
         permissions.IsAuthenticated
@@ -261,6 +634,20 @@ class ExerciseInstanceDetail(
     def delete(self, request, *args, **kwargs):
         return self.destroy(request, *args, **kwargs)
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        history_before = snapshot_instances([serializer.instance])
+        serializer.save()
+        apply_exercise_instance_change(
+            history_before, snapshot_instances([serializer.instance])
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        history = snapshot_instances([instance])
+        instance.delete()
+        apply_exercise_instance_change(history, [])
+
 
 class WorkoutFileList(
     mixins.ListModelMixin,
@@ -272,7 +659,7 @@ class WorkoutFileList(
     queryset = WorkoutFile.objects.all()
     serializer_class = WorkoutFileSerializer
     permission_classes = [permissions.IsAuthenticated & IsOwnerOfWorkout]
-    parser_classes = [MultipartJsonParser, JSONParser]
+    parser_classes = [MultipartJsonParser, OrjsonParser]
 
     def get(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
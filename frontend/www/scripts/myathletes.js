@@ -1,38 +1,25 @@
-async function displayCurrentRoster() {
+async function getDashboard() {
+    let response = await sendRequest("GET", `${HOST}/api/coach/dashboard/`);
+    if (!response.ok) {
+        let data = await response.json();
+        let alert = createAlert("Could not retrieve athletes!", data);
+        document.body.prepend(alert);
+        return {"athletes": [], "former_athletes": [], "pending_offers": []};
+    }
+    return await response.json();
+}
+
+async function displayCurrentRoster(dashboard) {
     let templateFilledAthlete = document.querySelector("#template-filled-athlete");
     let templateEmptyAthlete = document.querySelector("#template-empty-athlete");
     let controls = document.querySelector("#controls");
 
-    let currentUser = await getCurrentUser();
-    for (let athleteUrl of currentUser.athletes) {
-        let response = await sendRequest("GET", athleteUrl);
-        let athlete = await response.json();
-
+    for (let athlete of dashboard.athletes) {
         createFilledRow(templateFilledAthlete, athlete.username, controls, false);
     }
-    
-    let status = "p";   // pending
-    let category = "sent";  
-    let response = await sendRequest("GET", `${HOST}/api/offers/?status=${status}&category=${category}`);
-    if (!response.ok) {
-        let data = await response.json();
-        let alert = createAlert("Could not retrieve offers!", data);
-        document.body.prepend(alert);
-    } else {
-        let offers = await response.json();
-
-        for (let offer of offers.results) {
-
-            // This code block fixes some CORS issues when enabling HTTPS
-            let host = `${HOST}`;
-            if(host.includes('https')){
-                offer.recipient = ('https' + offer.recipient.substring(4))
-            }
 
-            let response = await sendRequest("GET", offer.recipient);
-            let recipient = await response.json();
-            createFilledRow(templateFilledAthlete, `${recipient.username} (pending)`, controls, true);
-        }
+    for (let offer of dashboard.pending_offers) {
+        createFilledRow(templateFilledAthlete, `${offer.recipient_username} (pending)`, controls, true);
     }
 
     let emptyClone = templateEmptyAthlete.content.cloneNode(true);
@@ -58,41 +45,22 @@ function createFilledRow(templateFilledAthlete, inputValue, controls, disabled)
     controls.appendChild(filledDiv);
 }
 
-async function displayFiles() {
-    let user = await getCurrentUser();
-
+async function displayFiles(dashboard) {
     let templateAthlete = document.querySelector("#template-athlete-tab");
     let templateFiles = document.querySelector("#template-files");
     let templateFile = document.querySelector("#template-file");
     let listTab = document.querySelector("#list-tab");
     let navTabContent = document.querySelector("#nav-tabContent");
 
-    for (let fileUrl of user.athlete_files) {
-        let response = await sendRequest("GET", fileUrl);
-        let file = await response.json();
-
-        response = await sendRequest("GET", file.athlete);
-        let athlete = await response.json();
-
-        let tabPanel = document.querySelector(`#tab-contents-${athlete.username}`)
-        if (!tabPanel) {
-            tabPanel = createTabContents(templateAthlete, athlete, listTab, templateFiles, navTabContent);
-        } 
+    for (let athlete of dashboard.athletes) {
+        let tabPanel = createTabContents(templateAthlete, athlete, listTab, templateFiles, navTabContent);
 
         let divFiles = tabPanel.querySelector(".uploaded-files");
-        let aFile = await createFileLink(templateFile, file.file);
-
-        divFiles.appendChild(aFile);
-    }
-
-    for (let athleteUrl of user.athletes) {
-        let response = await sendRequest("GET", athleteUrl);
-        let athlete = await response.json();
-
-        let tabPanel = document.querySelector(`#tab-contents-${athlete.username}`)
-        if (!tabPanel) {
-            tabPanel = createTabContents(templateAthlete, athlete, listTab, templateFiles, navTabContent);
+        for (let file of athlete.files) {
+            let aFile = await createFileLink(templateFile, file.file);
+            divFiles.appendChild(aFile);
         }
+
         let uploadBtn = document.querySelector(`#btn-upload-${athlete.username}`);
         uploadBtn.disabled = false;
         uploadBtn.addEventListener("click", async (event) => await uploadFiles(event, athlete));
@@ -101,7 +69,18 @@ async function displayFiles() {
         fileInput.disabled = false;
     }
 
-    if (user.athlete_files.length == 0 && user.athletes.length == 0) {
+    // Files uploaded for former athletes stay visible, but no new ones can be added
+    for (let athlete of dashboard.former_athletes) {
+        let tabPanel = createTabContents(templateAthlete, athlete, listTab, templateFiles, navTabContent);
+
+        let divFiles = tabPanel.querySelector(".uploaded-files");
+        for (let file of athlete.files) {
+            let aFile = await createFileLink(templateFile, file.file);
+            divFiles.appendChild(aFile);
+        }
+    }
+
+    if (dashboard.athletes.length == 0 && dashboard.former_athletes.length == 0) {
         let p = document.createElement("p");
         p.innerText = "There are currently no athletes or uploaded files.";
         document.querySelector("#list-files-div").append(p);
@@ -223,8 +202,9 @@ async function uploadFiles(event, athlete) {
 }
 
 window.addEventListener("DOMContentLoaded", async () => {
-    await displayCurrentRoster();
-    await displayFiles();
+    let dashboard = await getDashboard();
+    await displayCurrentRoster(dashboard);
+    await displayFiles(dashboard);
     
     let buttonSubmitRoster = document.querySelector("#button-submit-roster");
     buttonSubmitRoster.addEventListener("click", async () => await submitRoster())
@@ -119,9 +119,7 @@ async function displayFiles() {
     let listTab = document.querySelector("#list-tab");
     let navTabContent = document.querySelector("#nav-tabContent");
 
-    for (let fileUrl of user.coach_files) {
-        let response = await sendRequest("GET", fileUrl);
-        let file = await response.json();
+    for (let file of await fetchAllPages(user.coach_files_url)) {
         let divFiles = null;
 
         if (!document.querySelector(`#list-${file.owner}-list`)) {
@@ -149,7 +147,7 @@ async function displayFiles() {
         listTab.firstElementChild.click();
     }
 
-    if (user.coach_files.length == 0) {
+    if (user.coach_file_count == 0) {
         let p = document.createElement("p");
         p.innerText = "There are currently no files uploaded for this user.";
         document.querySelector("#list-files-div").append(p);
@@ -98,6 +98,22 @@ async function sendRequest(method, orig_url, body, contentType="application/json
 
   return response;
 }
+
+async function fetchAllPages(url) {
+  // Follows the "next" links of a paginated list and returns the results of every page
+  let results = [];
+  while (url) {
+    let response = await sendRequest("GET", url);
+    if (!response.ok) {
+      console.log("COULD NOT RETRIEVE " + url);
+      break;
+    }
+    let data = await response.json();
+    results.push(...data.results);
+    url = data.next;
+  }
+  return results;
+}
 function set_protocol(orig_url) {
   let host = `${HOST}`;
   let url = orig_url
@@ -159,11 +175,6 @@ async function getCurrentUser() {
         if(user.coach){
           user.coach = ('https' + user.coach.substring(4))
         }
-        if(user.athletes.length > 0){
-          for(let i = 0; i < user.athletes.length, i++;){
-            user.athletes[i] = ('https' + user.athletes[i].substring(4))
-          }
-        }
       }
 
   }
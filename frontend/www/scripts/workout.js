@@ -48,7 +48,7 @@ async function retrieveWorkout(id) {
         // create exercises
 
         // fetch exercise types
-        let exerciseTypeResponse = await sendRequest("GET", `${HOST}/api/exercises/`);
+        let exerciseTypeResponse = await sendRequest("GET", `${HOST}/api/exercises/?catalog=full`);
         let exerciseTypes = await exerciseTypeResponse.json();
 
         //TODO: This should be in its own method.
@@ -215,7 +215,7 @@ function handleCancelDuringWorkoutCreate() {
 async function createBlankExercise() {
     let form = document.querySelector("#form-workout");
 
-    let exerciseTypeResponse = await sendRequest("GET", `${HOST}/api/exercises/`);
+    let exerciseTypeResponse = await sendRequest("GET", `${HOST}/api/exercises/?catalog=full`);
     let exerciseTypes = await exerciseTypeResponse.json();
 
     let exerciseTemplate = document.querySelector("#template-exercise");
@@ -299,22 +299,22 @@ async function createComment(workoutid) {
     }
 }
 
-async function retrieveComments(workoutid) {
-    let response = await sendRequest("GET", `${HOST}/api/comments/`);
+async function retrieveComments(url) {
+    // Shows one page of comments, and offers the next page behind the "more" button
+    let moreCommentsButton = document.querySelector("#btn-more-comments");
+    let response = await sendRequest("GET", url);
     if (!response.ok) {
         let data = await response.json();
         let alert = createAlert("Could not retrieve comments!", data);
         document.body.prepend(alert);
-    } else {
-        let data = await response.json();
-        let comments = data.results;
-        for (let comment of comments) {
-            let splitArray = comment.workout.split("/");
-            if (splitArray[splitArray.length - 2] == workoutid) {
-                addComment(comment.owner, comment.content, comment.timestamp, true);
-            }
-        }
+        return;
+    }
+    let data = await response.json();
+    for (let comment of data.results) {
+        addComment(comment.owner, comment.content, comment.timestamp, true);
     }
+    moreCommentsButton.onclick = async () => await retrieveComments(data.next);
+    moreCommentsButton.classList.toggle("hide", !data.next);
 }
 
 window.addEventListener("DOMContentLoaded", async () => {
@@ -336,7 +336,7 @@ window.addEventListener("DOMContentLoaded", async () => {
     if (urlParams.has('id')) {
         const id = urlParams.get('id');
         let workoutData = await retrieveWorkout(id);
-        await retrieveComments(id);
+        await retrieveComments(`${HOST}/api/workouts/${id}/comments/`);
         postCommentButton.addEventListener("click", (async (id) => await createComment(id)).bind(undefined, id));
         
         if (set_protocol(workoutData["owner"]) == set_protocol(currentUser.url)) {
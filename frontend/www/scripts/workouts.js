@@ -56,6 +56,7 @@ window.addEventListener("DOMContentLoaded", async () => {
     currentSort.innerText = (ordering.startsWith("-") ? "Descending" : "Ascending") + " " + ordering.replace("-", "");
 
     let currentUser = await getCurrentUser();
+    let athleteUrls = (await fetchAllPages(currentUser.athletes_url)).map((athlete) => athlete.url);
     // grab username
     if (ordering.includes("owner")) {
         ordering += "__username";
@@ -83,7 +84,7 @@ window.addEventListener("DOMContentLoaded", async () => {
                         }
                         break;
                     case "list-athlete-workouts-list":
-                        if (currentUser.athletes && currentUser.athletes.includes(workout.owner)) {
+                        if (athleteUrls.includes(workout.owner)) {
                             workoutAnchor.classList.remove('hide');
                         } else {
                             workoutAnchor.classList.add('hide');